@@ -9,6 +9,16 @@ def sigmoid(z):
     return 1 / (1 + np.exp(-z))
 
 
+# Sigmoid function applied in place to a numpy array, which gives the same values as 'sigmoid' without allocating any
+# new arrays. Returns the array.
+def sigmoid_in_place(z: np.ndarray):
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    z += 1
+    np.reciprocal(z, out=z)
+    return z
+
+
 # Derivative of logistic function.
 def sigmoid_prime(z):
     return z*(1-z)
@@ -2,152 +2,281 @@
 # This file is used for generating the clusters used for the RBFNN network. It uses the Edited-KNN, K-Means, and PAM
 # algorithms for finding "centers" for our network. These are then stored in files so that we can access them later
 # without having to re-run the algorithm. To see the files, they are stored under /rbf-data/.
+#
+# Every (algorithm, data set, fold) is an independent task, so the tasks are run on a pool of worker processes. Each
+# file is written atomically, and once all of a fold's files are saved, the fold is recorded in a manifest (along with
+# the size of each file). Folds in the manifest whose files are unchanged are skipped, so an interrupted run can simply
+# be started again without losing any finished folds. The centers themselves also go through the center cache (see
+# center_cache.py), so they are only ever found once for the same training data, algorithm, and k.
 
 from src.centers.edited_knn import EditedKNN
 from src.centers.k_means import KMeans
+from src.centers.mini_batch_k_means import MiniBatchKMeans, DEFAULT_MEMORY_BUDGET
 from src.centers.pam_nn import PamNN
+from src.centers.center_cache import CenterCache
+from src.centers import neighbor_index
 import src.data.data_set as d
+import src.util as util
+import numpy as np
+import multiprocessing
+import random
+import json
 import math
+import os
+import zlib
 
+# The directories of the original data sets and of the saved folds.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+RBF_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "rbf-data")
+
+# The name of the manifest file in RBF_DATA_DIR, which records the folds that were saved completely.
+MANIFEST_FILE_NAME = "manifest.json"
 
-# Saves the cross-folds for Edited-KNN on the specified data set. Each fold has a train, test, and center examples.
-def save_edited_knn_clusters(data, k, data_file_name):
-    folds = data.validation_folds(10)
-    for fold_i, fold in enumerate(folds):
-        print(fold_i)
-        test = fold['test']
-        train = fold['train']
-        eknn = EditedKNN(train, k)
-        centers = eknn.training_data
+# The suffixes of the files each fold is saved in.
+FOLD_SUFFIXES = ["-test.txt", "-train.txt", "-centers.txt"]
 
-        # We need to remove the centers from the original training data.
-        updated_train_data = train.copy()
-        for example in centers.data:
-            if example in updated_train_data.data:
-                updated_train_data.data.remove(example)
-
-        # Save each test, train, and center data to their respective files.
-        file_name = "../../rbf-data/" + data_file_name + "-eknn-fold-" + str(fold_i)
-        test.save_file(file_name + "-test.txt")
-        updated_train_data.save_file(file_name + "-train.txt")
-        centers.save_file(file_name + "-centers.txt")
-
-
-# Saves the cross-folds for K-Means on the specified data set. Each fold has a train, test, and center examples.
-def save_k_means(data, k, data_file_name):
-    folds = data.validation_folds(10)
-    for fold_i, fold in enumerate(folds):
-        print(fold_i)
-        test = fold['test']
-        train = fold['train']
-        kmeans = KMeans(train, k)
-        centers = test.copy()
-        centers.data = kmeans.centroids
-
-        # We don't need to worry about removing centers from the original training data since the clusters are not
-        # points from the data.
-
-        # Save each test, train, and center data to their respective files.
-        file_name = "../../rbf-data/"  + data_file_name + "-pam-fold-" + str(fold_i)
-        test.save_file(file_name + "-test.txt")
-        train.save_file(file_name + "-train.txt")
-        centers.save_file(file_name + "-centers.txt")
-
-
-# Saves the cross-folds for PAM on the specified data set. Each fold has a train, test, and center examples.
-def save_pam(data, k, data_file_name):
-    folds = data.validation_folds(10)
-    for fold_i, fold in enumerate(folds):
-        print(fold_i)
-        test = fold['test']
-        train = fold['train']
-        pam = PamNN(train, k)
-        centers = test.copy()
-        centers.data = pam.medoids
-
-        # We need to remove the centers from the original training data.
-        updated_train_data = train.copy()
-        for example in centers.data:
-            if example in updated_train_data.data:
-                updated_train_data.data.remove(example)
+# The names of the center algorithms, as used in the saved file names.
+EDITED_KNN = "eknn"
+K_MEANS = "kmeans"
+MINI_BATCH_K_MEANS = "mbkmeans"
+PAM = "pam"
 
-        # Save each test, train, and center data to their respective files.
-        file_name = "../../rbf-data/" + data_file_name + "-pam-fold-" + str(fold_i)
-        test.save_file(file_name + "-test.txt")
-        train.save_file(file_name + "-train.txt")
-        centers.save_file(file_name + "-centers.txt")
+# The neighbor index Edited-KNN searches with (see neighbor_index.py). On our data sets the brute force index is many
+# times faster than the KD-tree, whose traversal runs in Python for each query.
+EDITED_KNN_INDEX = neighbor_index.BRUTE_FORCE
+
+# The number of cross validation folds saved for each data set.
+NUM_FOLDS = 10
+
+# The default number of worker processes that tasks are run on.
+NUM_WORKERS = os.cpu_count() or 1
+
+# The data sets, by name, along with the function used to open them and the name of their file in DATA_DIR.
+DATA_SETS = {
+    "abalone": (d.get_abalone_data, "abalone.data"),
+    "car": (d.get_car_data, "car.data"),
+    "segmentation": (d.get_segmentation_data, "segmentation.data"),
+    "forestfires": (d.get_forest_fires_data, "forestfires.data"),
+    "machine": (d.get_machine_data, "machine.data"),
+    "winequality": (d.get_wine_data, "winequality.data"),
+}
+
+# The data sets each algorithm is run on. Edited-KNN needs classes, so it is only run on the classification data sets.
+ALGORITHM_DATA_SETS = {
+    EDITED_KNN: ["abalone", "car", "segmentation"],
+    K_MEANS: list(DATA_SETS),
+    MINI_BATCH_K_MEANS: list(DATA_SETS),
+    PAM: list(DATA_SETS),
+}
+
+# The k used by the clustering algorithms on the classification data sets. The regression data sets use a quarter of
+# their length instead.
+CLUSTERING_K = {"abalone": 2510, "car": 90, "segmentation": 43}
+
+# The data sets loaded by this process, by name, so each worker only loads each data set once.
+loaded_data_sets = {}
+
+
+# Returns a seed for the given name, which is the same in every process (unlike the built-in hash of a string).
+def get_seed(name):
+    return zlib.crc32(name.encode())
+
+
+# Returns the named data set. The data sets are shuffled when they are loaded, so the random number generator is seeded
+# from the data set's name first: every process then gets the same order, and so the same folds.
+def load_data_set(data_set_name):
+    if data_set_name not in loaded_data_sets:
+        opener, file_name = DATA_SETS[data_set_name]
+        random.seed(get_seed(data_set_name))
+        loaded_data_sets[data_set_name] = opener(os.path.join(DATA_DIR, file_name))
+    return loaded_data_sets[data_set_name]
+
+
+# Returns the k used by the algorithm on a data set with the given name and number of examples.
+def get_k(alg_name, data_set_name, num_examples):
+    if alg_name == EDITED_KNN:
+        return math.ceil(math.sqrt(num_examples))
+    return CLUSTERING_K.get(data_set_name, math.ceil(num_examples / 4))
+
+
+# Returns the start of the file names of a fold, which end in "-test.txt", "-train.txt", and "-centers.txt".
+def get_fold_file_name(data_set_name, alg_name, fold_i):
+    return os.path.join(RBF_DATA_DIR, data_set_name + "-" + alg_name + "-fold-" + str(fold_i))
+
+
+# Returns the start of the file names of the fold of an (algorithm, data set, fold) task.
+def get_task_file_name(task):
+    alg_name, data_set_name, fold_i = task
+    return get_fold_file_name(data_set_name, alg_name, fold_i)
+
+
+# Returns the manifest of the folds saved in the directory: a dictionary that maps the name of each fold that was saved
+# completely (such as "car-kmeans-fold-0") to the size in bytes of each of its files, by suffix.
+def load_manifest(rbf_data_dir):
+    try:
+        with open(os.path.join(rbf_data_dir, MANIFEST_FILE_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+# Saves the manifest of the folds saved in the directory atomically, like 'save_atomically'. Only the process that runs
+# the tasks writes the manifest, so the workers never overwrite each other's entries.
+def save_manifest(manifest, rbf_data_dir):
+    file_name = os.path.join(rbf_data_dir, MANIFEST_FILE_NAME)
+    temp_file_name = file_name + ".tmp-" + str(os.getpid())
+    with open(temp_file_name, "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+        file.write("\n")
+    os.replace(temp_file_name, file_name)
+
+
+# Returns the size in bytes of each of a fold's files, by suffix, given the start of their names.
+def get_fold_sizes(fold_file_name):
+    return {suffix: os.path.getsize(fold_file_name + suffix) for suffix in FOLD_SUFFIXES}
+
+
+# Whether a fold (given the start of its file names) was saved completely. A fold is only added to the manifest after
+# all of its files are saved, so it has to be in the manifest, and each of its files must still have the size it was
+# saved with: a file that was cut short (even at the end of a line) or replaced by part of another run is not accepted.
+# The manifest of the fold's directory is loaded unless it is given.
+def is_fold_complete(fold_file_name, manifest=None):
+    if manifest is None:
+        manifest = load_manifest(os.path.dirname(fold_file_name))
+    sizes = manifest.get(os.path.basename(fold_file_name))
+    if sizes is None or sorted(sizes) != sorted(FOLD_SUFFIXES):
+        return False
+    try:
+        return get_fold_sizes(fold_file_name) == sizes
+    except FileNotFoundError:
+        return False
+
+
+# Saves the data set to a file atomically: it is written to a temporary file which then replaces the file, so the file
+# is never left half written.
+def save_atomically(data_set, file_name):
+    temp_file_name = file_name + ".tmp-" + str(os.getpid())
+    data_set.save_file(temp_file_name)
+    os.replace(temp_file_name, file_name)
+
+
+# Finds the centers of the training data using the named algorithm, and returns them as a list of rows.
+def find_center_rows(alg_name, train, k):
+    if alg_name == EDITED_KNN:
+        return EditedKNN(train, k, EDITED_KNN_INDEX).training_data.get_data()
+    if alg_name == K_MEANS:
+        return KMeans(train, k).centroids
+    if alg_name == MINI_BATCH_K_MEANS:
+        # The training data is streamed to the algorithm in chunks that fit in the memory budget.
+        kmeans = MiniBatchKMeans.from_data_set(train, k, DEFAULT_MEMORY_BUDGET)
+        return kmeans.get_centroid_rows(train.attr_cols, train.num_cols)
+    if alg_name == PAM:
+        return PamNN(train, k).medoids
+    raise ValueError("Unknown center algorithm: " + str(alg_name))
+
+
+# Returns the test, train, and center data of one fold of a data set, using the named algorithm. The centers are taken
+# from the center cache if they have been found before for the same training data, algorithm, and k, and are otherwise
+# found and then added to the cache. When an algorithm uses data from the training set as the centers, those centers
+# are removed from the returned training data.
+def make_fold(alg_name, data_set_name, fold_i, cache=None):
+    if cache is None:
+        cache = CenterCache()
+    data = load_data_set(data_set_name)
+    fold = data.validation_folds(NUM_FOLDS)[fold_i]
+    # Each fold gets its own seed, so its centers don't depend on which worker finds them or what ran before.
+    seed = get_seed(alg_name + "-" + data_set_name + "-" + str(fold_i))
+    random.seed(seed)
+    np.random.seed(seed)
+    test = fold['test']
+    train = fold['train']
+    k = get_k(alg_name, data_set_name, data.get_len())
+    params = {'k': k}
+    if alg_name == MINI_BATCH_K_MEANS:
+        params['memory_budget'] = DEFAULT_MEMORY_BUDGET
+    # The indexes can break ties between equally distant neighbors differently, so Edited-KNN can keep different
+    # examples with each. The brute force index is left out of the key, like the default float type below.
+    if alg_name == EDITED_KNN and EDITED_KNN_INDEX != neighbor_index.BRUTE_FORCE:
+        params['index_type'] = EDITED_KNN_INDEX
+    # Centers found in float32 can differ from those found in float64, so they are cached separately. The default float
+    # type is left out, so it keeps the keys of centers that were cached before the float type could be changed.
+    if util.get_float_dtype() != np.float64:
+        params['dtype'] = util.get_float_dtype().name
+    centers = test.copy()
+    centers.data = cache.get_centers(train, alg_name, params, lambda: find_center_rows(alg_name, train, k))
+
+    # The clusters of K-Means are not points from the data, so only Edited-KNN and PAM need their centers removed.
+    if alg_name in (EDITED_KNN, PAM):
+        updated_train_data = train.copy()
+        updated_train_data.remove_examples(centers.data)
+        return test, updated_train_data, centers
+    return test, train, centers
+
+
+# Saves the test, train, and center data of one fold, given as an (algorithm, data set, fold) task. Returns the task
+# and the size of each of the fold's files (see 'get_fold_sizes'), to be recorded in the manifest.
+def save_fold_centers(task):
+    alg_name, data_set_name, fold_i = task
+    file_name = get_task_file_name(task)
+    # Save each test, train, and center data to their respective files.
+    for suffix, data_set in zip(FOLD_SUFFIXES, make_fold(alg_name, data_set_name, fold_i)):
+        save_atomically(data_set, file_name + suffix)
+    return task, get_fold_sizes(file_name)
+
+
+# Saves the folds of every algorithm on each of its data sets, running the tasks on a pool of num_workers processes.
+# Folds that were already saved completely (see 'is_fold_complete') are skipped. Every other fold is removed from the
+# manifest before any task starts, and is only added back once all of its files are saved again.
+def save_centers(alg_names, num_workers=NUM_WORKERS):
+    tasks = [(alg_name, data_set_name, fold_i) for alg_name in alg_names
+             for data_set_name in ALGORITHM_DATA_SETS[alg_name] for fold_i in range(NUM_FOLDS)]
+    manifest = load_manifest(RBF_DATA_DIR)
+    missing_tasks = [task for task in tasks if not is_fold_complete(get_task_file_name(task), manifest)]
+    for task in missing_tasks:
+        manifest.pop(os.path.basename(get_task_file_name(task)), None)
+    save_manifest(manifest, RBF_DATA_DIR)
+    print(str(len(tasks) - len(missing_tasks)) + "/" + str(len(tasks)) + " folds are already saved")
+    if num_workers > 1:
+        # The workers find the centers in the same float type as this process (see util.get_float_dtype).
+        with multiprocessing.Pool(num_workers, util.set_float_dtype, (util.get_float_dtype(),)) as pool:
+            # Tasks take very different amounts of time, so each worker takes one task at a time.
+            record_progress(pool.imap_unordered(save_fold_centers, missing_tasks, chunksize=1), manifest,
+                            len(missing_tasks))
+    else:
+        record_progress(map(save_fold_centers, missing_tasks), manifest, len(missing_tasks))
+
+
+# Adds each finished task's fold to the manifest as its result comes in (saving the manifest every time, so a fold is
+# never lost once it is done), and prints it.
+def record_progress(results, manifest, num_tasks):
+    for task_i, (task, sizes) in enumerate(results):
+        alg_name, data_set_name, fold_i = task
+        manifest[os.path.basename(get_task_file_name(task))] = sizes
+        save_manifest(manifest, RBF_DATA_DIR)
+        print(str(task_i + 1) + "/" + str(num_tasks) + " " + data_set_name + "-" + alg_name + " fold " + str(fold_i)
+              + " saved")
 
 
 # Runs the Edited-KNN algorithm on each data set.
-def run_eknn():
-    abalone_data = d.get_abalone_data("../../data/abalone.data")
-    abalone_k = math.ceil(math.sqrt(len(abalone_data.data)))
-    save_edited_knn_clusters(abalone_data, abalone_k, "abalone")
-
-    car_data = d.get_car_data("../../data/car.data")
-    car_k = math.ceil(math.sqrt(len(car_data.data)))
-    save_edited_knn_clusters(car_data, car_k, "car")
-
-    segmentation_data = d.get_segmentation_data("../../data/segmentation.data")
-    segmentation_k = math.ceil(math.sqrt(len(segmentation_data.data)))
-    save_edited_knn_clusters(segmentation_data, segmentation_k, "segmentation2")
+def run_eknn(num_workers=NUM_WORKERS):
+    save_centers([EDITED_KNN], num_workers)
 
 
 # Runs the K-Means algorithm on each data set.
-def run_kmeans():
-    abalone_data = d.get_abalone_data("../../data/abalone.data")
-    abalone_k = 2510
-    save_k_means(abalone_data, abalone_k, "abalone")
-
-    car_data = d.get_car_data("../../data/car.data")
-    car_k = 90
-    save_k_means(car_data, car_k, "car")
-
-    segmentation_data = d.get_segmentation_data("../../data/segmentation.data")
-    segmentation_k = 43
-    save_k_means(segmentation_data, segmentation_k, "segmentation")
+def run_kmeans(num_workers=NUM_WORKERS):
+    save_centers([K_MEANS], num_workers)
 
-    forest_fires_data = d.get_forest_fires_data("../../data/forestfires.data")
-    forest_fires_k = math.ceil(len(forest_fires_data.data) / 4)
-    save_k_means(forest_fires_data, forest_fires_k, "forestfires")
 
-    machine_data = d.get_machine_data("../../data/machine.data")
-    machine_k = math.ceil(len(machine_data.data) / 4)
-    save_k_means(machine_data, machine_k, "machine")
-
-    wine_data = d.get_wine_data("../../data/winequality.data")
-    wine_k = math.ceil(len(wine_data.data) / 4)
-    save_k_means(wine_data, wine_k, "winequality")
+# Runs the mini batch K-Means algorithm on each data set, with the same k values as K-Means.
+def run_mini_batch_kmeans(num_workers=NUM_WORKERS):
+    save_centers([MINI_BATCH_K_MEANS], num_workers)
 
 
 # Runs the PAM algorithm on each data set.
-def run_pam():
-    abalone_data = d.get_abalone_data("../../data/abalone.data")
-    abalone_k = 2510
-    save_pam(abalone_data, abalone_k, "abalone")
-
-    car_data = d.get_car_data("../../data/car.data")
-    car_k = 90
-    save_pam(car_data, car_k, "car")
-
-    segmentation_data = d.get_segmentation_data("../../data/segmentation.data")
-    segmentation_k = 43
-    save_pam(segmentation_data, segmentation_k, "segmentation")
-
-    forest_fires_data = d.get_forest_fires_data("../../data/forestfires.data")
-    forest_fires_k = math.ceil(len(forest_fires_data.data) / 4)
-    save_pam(forest_fires_data, forest_fires_k, "forestfires")
-
-    machine_data = d.get_machine_data("../../data/machine.data")
-    machine_k = math.ceil(len(machine_data.data) / 4)
-    save_pam(machine_data, machine_k, "machine")
-
-    wine_data = d.get_wine_data("../../data/winequality.data")
-    wine_k = math.ceil(len(wine_data.data) / 4)
-    save_pam(wine_data, wine_k, "winequality")
+def run_pam(num_workers=NUM_WORKERS):
+    save_centers([PAM], num_workers)
 
 
-# Runs all the algorithms and saves the results to /rbf-data/.
-run_eknn()
-run_kmeans()
-run_pam()
+# Runs all the algorithms and saves the results to /rbf-data/. All of the tasks share one pool of workers.
+if __name__ == "__main__":
+    save_centers([EDITED_KNN, K_MEANS, MINI_BATCH_K_MEANS, PAM])
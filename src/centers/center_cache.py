@@ -0,0 +1,105 @@
+# center_cache.py
+# A cache of center sets found by the center algorithms. Each center set is stored under a key that is the hash of
+# everything it was found from: the training rows, the attribute and class columns, the algorithm, and the algorithm's
+# parameters. So, a cached center set is only ever reused for exactly the same input, and changing the data, the
+# preprocessing, or k simply misses the cache. The cache is limited in size, and the least recently used center sets are
+# removed first once it grows too large. Each row is stored as a line of JSON, so a cached center set gives back
+# exactly the values that were stored: strings (even ones like "0.0"), floats, integers, and None all keep their type.
+
+import hashlib
+import json
+import os
+
+# The default directory of the cache, at the root of the project.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "center-cache")
+
+# The default maximum size (in bytes) of all the cached center sets together.
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# The file extension of cached center sets. Center sets cached as comma separated text (which lost the type of their
+# values) had a different extension, so they are never read.
+CACHE_FILE_EXTENSION = ".centers.json"
+
+
+# A center cache stored in a directory, with one file per center set named by its key. Files are written atomically,
+# so several processes can share the same cache. A file's modification time is updated whenever it is read, and is
+# used as the time it was last used.
+class CenterCache:
+
+    # Creates a cache in the given directory (which is created if needed), limited to max_bytes in total.
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Returns the key for the center set found by the named algorithm, with the given parameters (a dictionary), on the
+    # training data.
+    def get_key(self, training_data, alg_name, params):
+        key = hashlib.sha256()
+        description = {'alg': alg_name, 'params': params, 'attr_cols': training_data.attr_cols,
+                       'class_col': training_data.class_col}
+        key.update(json.dumps(description, sort_keys=True).encode())
+        for row in training_data.get_data():
+            key.update(repr(tuple(row)).encode())
+            key.update(b"\n")
+        return key.hexdigest()
+
+    # Returns the path of the file for a key.
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXTENSION)
+
+    # Returns the center set (a list of rows) stored under the key, or None if it is not in the cache.
+    def get(self, key):
+        file_name = self.get_file_name(key)
+        try:
+            with open(file_name, "r") as file:
+                rows = [json.loads(line) for line in file]
+            # Mark the center set as just used.
+            os.utime(file_name)
+        except FileNotFoundError:
+            # The center set is not cached, or another process removed it while it was being read.
+            return None
+        return rows
+
+    # Stores the center set (a list of rows) under the key, and then removes the least recently used center sets if the
+    # cache has grown too large.
+    def put(self, key, rows):
+        file_name = self.get_file_name(key)
+        temp_file_name = file_name + ".tmp-" + str(os.getpid())
+        with open(temp_file_name, "w") as file:
+            for row in rows:
+                file.write(json.dumps(list(row)) + "\n")
+        os.replace(temp_file_name, file_name)
+        self.evict()
+
+    # Removes the least recently used center sets until the cache is no larger than max_bytes. The most recently used
+    # center set is always kept, even if it alone is larger than max_bytes.
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_FILE_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total_bytes = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries[:-1]:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    # Returns the center set found by the named algorithm on the training data. It is taken from the cache if it is
+    # there, and otherwise is found by calling find_centers (which returns a list of rows) and then stored.
+    def get_centers(self, training_data, alg_name, params, find_centers):
+        key = self.get_key(training_data, alg_name, params)
+        rows = self.get(key)
+        if rows is None:
+            rows = [list(row) for row in find_centers()]
+            self.put(key, rows)
+        return rows
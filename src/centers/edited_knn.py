@@ -1,7 +1,9 @@
 # edited_knn.py
 # Implementation of edited KNN algorithm, which we create as a subclass of the KNN class.
 
+import numpy as np
 from src.centers.knn import KNN
+from src.centers import neighbor_index
 import src.util as util
 
 
@@ -9,31 +11,77 @@ import src.util as util
 class EditedKNN(KNN):
 
     # Upon creation of the model, the training data is reduced using the find_edited_data method. This allows us to
-    # use the "run" method from KNN once the object is created.
-    def __init__(self, training_data, k):
-        super().__init__(training_data, k)
-        self.training_data = training_data.copy()
+    # use the "run" method from KNN once the object is created. The index_type picks the neighbor index that both the
+    # editing and 'run' search with, and the dtype is the float type of the distances (see KNN).
+    def __init__(self, training_data, k, index_type=neighbor_index.BRUTE_FORCE, dtype=None):
+        super().__init__(training_data, k, index_type, dtype)
+        # neighbors[i] holds the indices of the k nearest remaining examples to example i (-1 if there are fewer than k).
+        self.neighbors = None
+        # neighbor_of[j] is the set of examples whose neighbor lists include example j.
+        self.neighbor_of = None
         self.find_edited_data()
 
     # Updates the edit_training_data variable to the edited data_set, that is the data_set with unnecessary
-    # vectors removed
+    # vectors removed.
+    #
+    # An example is removed when its remaining neighbors classify it correctly, and examples are checked until none of
+    # them can be removed. Since an example's classification only depends on its neighbors, an example only needs to be
+    # checked again once one of its neighbors has been removed. So, we find every example's neighbors at once, remember
+    # which examples each example is a neighbor of, and then make passes over just the examples that need checking.
     def find_edited_data(self):
-        counter = 0
-        length = len(self.training_data.data)
-        while True:
-            # print(str(counter) + "/" + str(length))
-            if counter > length:
-                break
-            counter += 1
+        num_examples = len(self.examples)
+        attr_matrix = self.attr_matrix
+        removed = np.zeros(num_examples, dtype=bool)
+        # Whether each example's neighbor list includes a removed example, so its neighbors must be found again.
+        stale = np.zeros(num_examples, dtype=bool)
+        # Whether each example needs to be checked. Every example is checked in the first pass.
+        to_check = np.ones(num_examples, dtype=bool)
 
-            # prev_accuracy = self.get_validation_accuracy()
-            example = self.training_data.data.pop(0)
-            # new_accuracy = self.get_validation_accuracy()
-            if util.get_highest_class(self.run(example)) != example[self.training_data.class_col]:
-                self.training_data.data.append(example)
-            else:
-                length -= 1
-                counter = 0
+        self.neighbors = np.full((num_examples, self.k), -1, dtype=int)
+        self.neighbor_of = [set() for i in range(num_examples)]
+        self.update_neighbors(attr_matrix, np.arange(num_examples))
 
+        while np.any(to_check):
+            pass_order = np.flatnonzero(to_check)
+            # The neighbors of examples that went stale in the last pass are found again in one batch.
+            self.update_neighbors(attr_matrix, pass_order[stale[pass_order]])
+            stale[pass_order] = False
+            for example_i in pass_order.tolist():
+                to_check[example_i] = False
+                # A neighbor may have been removed earlier in this pass.
+                if stale[example_i]:
+                    self.update_neighbors(attr_matrix, np.array([example_i]))
+                    stale[example_i] = False
+                # An example without any remaining neighbors cannot be classified, so it is kept.
+                distribution = self.get_class_distribution(self.neighbors[example_i])
+                if not distribution or util.get_highest_class(distribution) != self.classes[example_i]:
+                    continue
+                # The example was classified correctly, so it is removed. Every example it was a neighbor of needs new
+                # neighbors, and needs to be checked again.
+                removed[example_i] = True
+                self.index.remove(example_i)
+                for neighbor_i in self.neighbors[example_i]:
+                    if neighbor_i != -1:
+                        self.neighbor_of[neighbor_i].discard(example_i)
+                for other_i in self.neighbor_of[example_i]:
+                    stale[other_i] = True
+                    to_check[other_i] = True
+                self.neighbor_of[example_i] = set()
 
+        # The edited examples become the training data.
+        self.training_data.select_rows(np.flatnonzero(~removed))
 
+    # Finds the neighbors of the examples at the given indices among the remaining examples (in one batched query), and
+    # updates the neighbor lists to match.
+    def update_neighbors(self, attr_matrix, example_indices):
+        if len(example_indices) == 0:
+            return
+        distances, neighbors = self.find_batch_closest_neighbors(attr_matrix[example_indices], example_indices)
+        for example_i, new_neighbors in zip(example_indices.tolist(), neighbors):
+            for neighbor_i in self.neighbors[example_i]:
+                if neighbor_i != -1:
+                    self.neighbor_of[neighbor_i].discard(example_i)
+            for neighbor_i in new_neighbors:
+                if neighbor_i != -1:
+                    self.neighbor_of[neighbor_i].add(example_i)
+            self.neighbors[example_i] = new_neighbors
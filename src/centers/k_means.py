@@ -1,146 +1,182 @@
 # k_means.py
 # Implementation of the K-Means algorithm for finding clusters.
-import random as rand
+import numpy as np
 import src.util as util
 
 # The smallest percentage change in distortion that will NOT stop the centroid calculation.
 DISTORTION_CHANGE_CUTOFF = 0.001
 
+# The number of observations whose distances to every centroid are calculated at once.
+DISTANCE_CHUNK_SIZE = 1024
+
 
 # The K-Means algorithm implementation. This will find the k clusters in the training data and then store the class
 # distribution of the clusters to use for a nearest neighbor search done by 'run'.
 class KMeans:
 
     # Creates an instance of the algorithm and instantly begins clustering. This way, the run method can be used as
-    # soon as the object is created.
-    def __init__(self, training_data, k):
+    # soon as the object is created. The distances are calculated in the given float type (float32 or float64), which
+    # is the global float type by default (see util.get_float_dtype).
+    def __init__(self, training_data, k, dtype=None):
         self.training_data = training_data.copy()
         self.k = k
+        self.dtype = util.resolve_float_dtype(dtype)
         # The centroids and cluster_classes list are used to represent the clusters themselves. centroids[i] is the
         # centroid for the ith cluster, and cluster_classes[i] is a map of each class to the probability it occurs in
         # the ith cluster. Note that any classes with 0% probabilities (no training data in the cluster had that class)
         # are not included in the dictionary. Lastly, we also store the distortion of the final clusters.
         self.centroids, self.clusters, self.cluster_classes, self.distortion = self.calculate_clusters()
+        # The attributes of the centroids as a matrix (one centroid per row), used to find the closest centroid.
+        self.centroid_matrix = self.get_centroid_matrix(self.centroids)
 
     # Returns the centroids representing each cluster and the  distribution of classes within each cluster. Both values
     # are lists, where index i in either list represents the ith cluster. The class distributions are in the form of a
     # dictionary that maps each class to the frequency of the class in the cluster.
+    #
+    # Each iteration assigns every observation to its closest centroid and then moves each centroid to the mean of its
+    # cluster. Following Hamerly's algorithm, we keep an upper bound on each observation's distance to its assigned
+    # centroid and a lower bound on its distance to every other centroid. An observation can only change clusters if its
+    # upper bound is more than its lower bound (and more than half the distance from its centroid to the next closest
+    # centroid), so once the clusters settle down most observations skip the distance calculations entirely.
     def calculate_clusters(self):
+        observations = self.get_observations()
         # First, generate centroids randomly
         centroids = self.generate_random_centroids()
-        clusters = []
+
+        # The first assignment compares every observation to every centroid, which also sets up the bounds.
+        assignments, upper_bounds, lower_bounds = self.find_closest_centroids(observations, centroids)
 
         distortion = None
         distortion_change = None
         # The cluster calculation will continue until we have "converged", which is measured by having a smaller
         # percentage change in distortion between two cycles than DISTORTION_CHANGE_CUTOFF.
-        while distortion_change is None or abs(distortion_change) >= DISTORTION_CHANGE_CUTOFF:
-            # Reset the clusters to have 0 observations.
-            clusters = [[] for i in range(self.k)]
-
-            # Assign each observation to the cluster corresponding to the closest centroid.
-            for obs in self.training_data.get_data():
-                closest_centroid_i = self.find_closest_centroid(obs, centroids)
-                clusters[closest_centroid_i].append(obs)
-
+        while True:
             # With all observations assigned to a cluster, we now recalculate the centroids as the cluster means.
-            for i in range(self.k):
-                if len(clusters[i]) != 0:
-                    centroids[i] = self.calculate_cluster_mean(clusters[i])
+            new_centroids = self.calculate_cluster_means(observations, assignments, centroids)
 
             # Update distortion variables to determine whether to exit the loop now.
-            new_distortion = self.calculate_distortion(clusters, centroids)
+            new_distortion = self.calculate_distortion(observations, assignments, new_centroids)
             if distortion is not None:
                 # Percentage change in distortion from the previous set of clusters to these new clusters:
                 distortion_change = (new_distortion - distortion) / distortion
             distortion = new_distortion
+            if distortion_change is not None and abs(distortion_change) < DISTORTION_CHANGE_CUTOFF:
+                centroids = new_centroids
+                break
+
+            # Moving the centroids loosens the bounds: an observation's assigned centroid may have moved away from it, and
+            # any other centroid may have moved towards it by as much as the largest move of the other centroids.
+            moves = np.sqrt(np.sum((new_centroids - centroids) ** 2, axis=1))
+            centroids = new_centroids
+            upper_bounds += moves[assignments]
+            largest_two = np.sort(moves)[-2:] if self.k > 1 else np.array([0, moves[0]])
+            largest_move_i = np.argmax(moves)
+            lower_bounds -= np.where(assignments == largest_move_i, largest_two[0], largest_two[-1])
+
+            # Reassign the observations to the cluster corresponding to the closest centroid.
+            self.update_assignments(observations, centroids, assignments, upper_bounds, lower_bounds)
 
         # Finally, instead of returning each cluster itself, we are only interested in knowing the class distributions
         # in each cluster.
+        examples = self.training_data.data
+        clusters = [[] for i in range(self.k)]
+        for example_i, cluster_i in enumerate(assignments.tolist()):
+            clusters[cluster_i].append(examples[example_i])
         cluster_classes = [{} for i in range(len(clusters))]
         for i in range(len(clusters)):
             cluster_classes[i] = util.calculate_class_distribution(clusters[i], self.training_data.class_col)
 
-        return centroids, clusters, cluster_classes, distortion
-
-    # Creates a list of centroids that are "random." Returns the centroids as a 2D list.
+        return self.get_centroid_rows(centroids), clusters, cluster_classes, distortion
+
+    # Finds the closest centroid to each observation (one per row) by comparing it with every centroid, in chunks of
+    # observations. Returns (@0) the index of each observation's closest centroid, (@1) the distance to it, and (@2) the
+    # distance to the second closest centroid.
+    def find_closest_centroids(self, observations, centroids):
+        assignments = np.empty(len(observations), dtype=int)
+        closest = np.empty(len(observations))
+        second_closest = np.full(len(observations), np.inf)
+        for start in range(0, len(observations), DISTANCE_CHUNK_SIZE):
+            end = start + DISTANCE_CHUNK_SIZE
+            squared = util.squared_distances(observations[start:end], centroids)
+            assignments[start:end] = np.argmin(squared, axis=1)
+            closest[start:end] = np.sqrt(squared[np.arange(len(squared)), assignments[start:end]])
+            if len(centroids) > 1:
+                second_closest[start:end] = np.sqrt(np.partition(squared, 1, axis=1)[:, 1])
+        return assignments, closest, second_closest
+
+    # Reassigns observations to their closest centroid, skipping those whose bounds show they cannot have changed
+    # clusters. The assignments and bounds are updated in place.
+    def update_assignments(self, observations, centroids, assignments, upper_bounds, lower_bounds):
+        # Half the distance from each centroid to the closest other centroid. An observation closer than this to its
+        # centroid cannot be closer to any other centroid.
+        centroid_squared = util.squared_distances(centroids, centroids)
+        np.fill_diagonal(centroid_squared, np.inf)
+        half_gaps = np.sqrt(np.min(centroid_squared, axis=1)) / 2 if self.k > 1 else np.full(1, np.inf)
+
+        bounds = np.maximum(half_gaps[assignments], lower_bounds)
+        to_check = np.flatnonzero(upper_bounds > bounds)
+        # First tighten the upper bound to the exact distance to the assigned centroid, which may be enough.
+        upper_bounds[to_check] = np.sqrt(np.sum((observations[to_check] - centroids[assignments[to_check]]) ** 2,
+                                                axis=1))
+        to_check = to_check[upper_bounds[to_check] > bounds[to_check]]
+        # The remaining observations are compared with every centroid.
+        if len(to_check) > 0:
+            new_assignments, closest, second_closest = self.find_closest_centroids(observations[to_check], centroids)
+            assignments[to_check] = new_assignments
+            upper_bounds[to_check] = closest
+            lower_bounds[to_check] = second_closest
+
+    # Creates a matrix of centroids that are "random" (one centroid per row).
     def generate_random_centroids(self):
-        centroids = [[] for i in range(self.k)]
-        # Initialize the means using randomly selected attribute values.
-        for i in range(self.k):
-            centroids[i] = self.generate_random_centroid()
-        return centroids
-
-    # Creates a single random centroid. A centroid is really just a vector of attribute values, so we accomplish this
-    # by randomly selecting an attribute value from our training data.
-    def generate_random_centroid(self):
-        num_cols = len(self.training_data.get_data()[0])
-        num_training_data = len(self.training_data.get_data())
-
-        # Initialize the centroid with None values for all columns
-        centroid = [None for i in range(num_cols)]
-        # For the attribute columns, assign a value picked randomly from the training set.
-        for attr_col in self.training_data.attr_cols:
-            # Random pick from the training set:
-            selected_obs = self.training_data.get_data()[rand.randrange(0, num_training_data)]
-            # Assigning that pick's value for the current attribute:
-            centroid[attr_col] = selected_obs[attr_col]
-        return centroid
-
-    # Out of the list of all centroids, this will return the corresponding index for the centroid that is closest to the
-    # given observation.
-    def find_closest_centroid(self, obs, centroids):
-        # Index of the closest centroid seen so far.
-        closest_centroid_i = None
-        # Distance to the closest centroid seen so far.
-        min_dist = None
-        for i in range(len(centroids)):
-            dist = self.training_data.distance(centroids[i], obs)
-            if closest_centroid_i is None or dist < min_dist:
-                closest_centroid_i = i
-                min_dist = dist
-        return closest_centroid_i
-
-    # Calculates the mean of the cluster. This is tricky because not all attributes are numeric -- some are strings.
-    # When we encounter a string attribute, we simply calculate the mode (using a frequency dictionary) and use that
-    # as the "mean".
-    def calculate_cluster_mean(self, cluster):
-        num_cols = len(self.training_data.get_data()[0])
-        attr_cols = self.training_data.attr_cols
-
-        # If the cluster has to items in it, we return the mean as a random coordinate.
-        if len(cluster) == 0:
-            return self.generate_random_centroid()
-
-        # The sums and for calculating the average and mode of the attributes.
-        sums = [0 for i in range(num_cols)]
-
-        # This section calculates the sum of each observation's attribute.
-        for obs in cluster:
-            # We iterate over the attribute columns only (to ignore class and unused columns)
-            for attr_col in attr_cols:
-                sums[attr_col] += obs[attr_col]
-
-        # We now calculate the "means", which is an average for numeric columns and the mode for string columns.
-        mean = [0 for i in range(num_cols)]
-        # We again want to just iterate over the attribute columns instead of all the columns
-        for attr_col in attr_cols:
-                mean[attr_col] = sums[attr_col] / len(cluster)
-
-        # Lastly, we return this mean.
-        return mean
+        observations = self.get_observations()
+        # A centroid is really just a vector of attribute values, so we accomplish this by randomly selecting an
+        # attribute value from our training data for each attribute of each centroid.
+        picks = np.random.randint(0, len(observations), size=(self.k, observations.shape[1]))
+        return observations[picks, np.arange(observations.shape[1])]
+
+    # Returns the matrix of observations (one per row) in the algorithm's float type.
+    def get_observations(self):
+        return self.training_data.get_attr_matrix().astype(self.dtype, copy=False)
+
+    # Calculates the mean of each cluster, given the cluster each observation is assigned to. A cluster with no
+    # observations keeps its previous centroid. The sums are accumulated in float64.
+    def calculate_cluster_means(self, observations, assignments, centroids):
+        sums = np.zeros(centroids.shape)
+        np.add.at(sums, assignments, observations)
+        counts = np.bincount(assignments, minlength=self.k)
+        means = centroids.copy()
+        non_empty = counts > 0
+        means[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+        return means
 
     # Calculates the distortion of the given clusters using the training data. Essentially, distortion is a measure of
     # how far each point is from the cluster it belongs to. We use this to optimize our centroid placement.
-    def calculate_distortion(self, clusters, centroids):
-        distortion = 0
-        for cluster_i in range(len(clusters)):
-            for obs in clusters[cluster_i]:
-                centroid = centroids[cluster_i]
-                distortion += self.training_data.distance(obs, centroid)
-        return distortion
+    def calculate_distortion(self, observations, assignments, centroids):
+        return float(np.sum(np.sqrt(np.sum((observations - centroids[assignments]) ** 2, axis=1)), dtype=np.float64))
+
+    # Converts a matrix of centroids to a list of rows in the same layout as the training data's examples, with the
+    # attribute values in the attribute columns and None in every other column.
+    def get_centroid_rows(self, centroids):
+        num_cols = self.training_data.num_cols
+        centroid_rows = []
+        for centroid in centroids.tolist():
+            row = [None for i in range(num_cols)]
+            for attr_i, attr_col in enumerate(self.training_data.attr_cols):
+                row[attr_col] = centroid[attr_i]
+            centroid_rows.append(row)
+        return centroid_rows
+
+    # Converts a list of centroid rows back to a matrix of centroids (one per row).
+    def get_centroid_matrix(self, centroid_rows):
+        return np.array([[row[col] for col in self.training_data.attr_cols] for row in centroid_rows], dtype=float)
+
+    # Out of all the centroids, this will return the corresponding index for the centroid that is closest to the given
+    # observation.
+    def find_closest_centroid(self, obs):
+        obs_array = np.array([obs[col] for col in self.training_data.attr_cols], dtype=float)
+        return int(np.argmin(np.sum((self.centroid_matrix - obs_array) ** 2, axis=1)))
 
     # Classifies an example by finding the nearest cluster and then returning the class distribution for that cluster.
     def run(self, example):
-        closest_centroid_i = self.find_closest_centroid(example, self.centroids)
+        closest_centroid_i = self.find_closest_centroid(example)
         return self.cluster_classes[closest_centroid_i]
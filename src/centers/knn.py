@@ -1,6 +1,8 @@
 # knn.py
 # Implementation of the K-nearest neighbor algorithm.
+import numpy as np
 import src.util as util
+from src.centers import neighbor_index
 
 
 # The implementation of the K-nearest neighbor algorithm. Given a test example in the "run" method, it will find the k
@@ -8,65 +10,49 @@ import src.util as util
 class KNN:
 
     # Creates an instance of the algorithm, which requires the training_data and a specific k to evaluate in future
-    # calls to run.
-    def __init__(self, training_data, k):
+    # calls to run. The index_type picks the neighbor index used for searching (see neighbor_index.make_index), and the
+    # distances are calculated in the given float type (float32 or float64), which is the global float type by default
+    # (see util.get_float_dtype).
+    def __init__(self, training_data, k, index_type=neighbor_index.BRUTE_FORCE, dtype=None):
         self.training_data = training_data.copy()
-        self.dist = self.get_dist_matrix(self.training_data)
+        self.dtype = util.resolve_float_dtype(dtype)
+        # The training examples (rows) that neighbors are searched for in, along with their classes. The neighbor index
+        # refers to each example by its position in these lists.
+        self.examples = self.training_data.get_data()
+        self.classes = self.training_data.get_class_array().tolist()
+        # The attribute values of the training examples (one per row), in the float type.
+        self.attr_matrix = self.training_data.get_attr_matrix().astype(self.dtype, copy=False)
+        self.index = neighbor_index.make_index(self.attr_matrix, index_type)
         self.k = k
         self.last_nearest_neighbors = None
 
-    def get_dist_matrix(self, data):
-        print("getting dist matrix")
-        dist = {}
-        for ex1 in data.data:
-            dist[ex1] = {}
-            for ex2 in data.data:
-                if ex1 is ex2:
-                    continue
-                dist[ex1][ex2] = self.training_data.distance(ex1, ex2)
-        print("finished dist matrix")
-        return dist
+    # Returns the numpy array of an example's attribute values.
+    def get_attr_array(self, example):
+        return np.array([example[col] for col in self.training_data.attr_cols], dtype=self.dtype)
+
+    # Finds the k nearest training examples to each of a batch of examples, given as a matrix of attribute values (one
+    # example per row). If 'exclude' is given, exclude[i] is the index of a training example that cannot be a neighbor
+    # of the i-th example. Returns the matrices of neighbor distances and neighbor indices (see BruteForceIndex.query).
+    def find_batch_closest_neighbors(self, attr_matrix, exclude=None):
+        return self.index.query(attr_matrix, self.k, exclude)
 
     # Returns a list of training examples that are the k-closest neighbors to the given observation.
     def find_closest_neighbors(self, observation):
-        # Initialize k_smallest to be a list of 'None's. After the for loop is finished it should contain k tuples
-        # representing the k-nearest neighbors to the observation. The first position is the distance and the second
-        # position is the example itself.
-        k_smallest = [None for i in range(self.k)]
-        # Stores the index of either (1) the first None value or (2) the largest item if no None's are present.
-        max_index = 0
-        # Iterate across each example in the training data...
-        for example in self.training_data.data:
-            dist = None
-            if example in self.dist and observation in self.dist[example]:
-                dist = self.dist[example][observation]
-            else:
-                dist = self.training_data.distance(example, observation)
-            # ...filling in any None values in k_smallest or replacing any examples with larger distances.
-            if k_smallest[max_index] is None or k_smallest[max_index][0] > dist:
-                k_smallest[max_index] = (dist, example)
-                # We also need to re-calculate the max_index given the current k_smallest list.
-                for i in range(len(k_smallest)):
-                    # If a None is encountered, always set it as max_index (we want remove all Nones right away)
-                    if k_smallest[i] is None:
-                        max_index = i
-                        break
-                    # Otherwise, try to find the maximum index if there are no None's.
-                    if k_smallest[i][0] > k_smallest[max_index][0]:
-                        max_index = i
-        self.last_nearest_neighbors = k_smallest
-        # Lastly, we want k_smallest to only store the examples themselves, no distances.
-        k_smallest_examples = []
-        for i in range(len(k_smallest)):
-            if k_smallest[i] is not None:
-                k_smallest_examples.append(k_smallest[i][1])
-        return k_smallest_examples
+        distances, indices = self.find_batch_closest_neighbors(self.get_attr_array(observation)[np.newaxis, :])
+        # Each nearest neighbor is stored as a tuple, where the first position is the distance and the second position
+        # is the example itself.
+        self.last_nearest_neighbors = [(dist, self.examples[i]) for dist, i in zip(distances[0], indices[0]) if i != -1]
+        # We want to only return the examples themselves, no distances.
+        return [example for dist, example in self.last_nearest_neighbors]
+
+    # Returns the class distribution of the training examples at the given indices (ignoring any -1's).
+    def get_class_distribution(self, indices):
+        neighbor_classes = [self.classes[i] for i in indices if i != -1]
+        counts = util.count_frequency(neighbor_classes)
+        return {cls: count / len(neighbor_classes) for cls, count in counts.items()}
 
     # Input an example test, output probability map of class
     def run(self, example):
         k_closest = self.find_closest_neighbors(example)
         probability = util.calculate_class_distribution(k_closest, self.training_data.class_col)
         return probability
-
-
-
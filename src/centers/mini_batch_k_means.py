@@ -0,0 +1,129 @@
+# mini_batch_k_means.py
+# Implementation of mini batch K-Means, a streaming version of K-Means for finding centers. Instead of assigning every
+# observation to a cluster in each iteration, the observations are read as a stream of chunks and each centroid is
+# moved towards the observations assigned to it one mini batch at a time. This means the training data never has to be
+# held in memory all at once, and a few passes over the data are usually enough to find good centers.
+import numpy as np
+import src.util as util
+from src.centers.k_means import DISTORTION_CHANGE_CUTOFF
+
+# The number of observations used for each update of the centroids.
+DEFAULT_BATCH_SIZE = 256
+
+# The maximum number of passes made over the stream of observations.
+DEFAULT_MAX_PASSES = 10
+
+# The default amount of memory (in bytes) that a chunk of observations, and the working arrays of a mini batch, can use
+# at once.
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+# Returns how many observations can be in each chunk so that a chunk (with num_attrs attributes per observation, stored
+# in chunk_dtype) fits in the memory budget along with the working arrays of one mini batch: the mini batch converted to
+# the algorithm's float type (dtype), and its distances to the k centroids. The distances are only ever found for one
+# mini batch at a time, so they don't grow with the chunk. Every chunk has at least one observation.
+def get_chunk_size(memory_budget, num_attrs, k, batch_size=DEFAULT_BATCH_SIZE, dtype=np.float64,
+                   chunk_dtype=np.float64):
+    batch_bytes = np.dtype(dtype).itemsize * batch_size * (num_attrs + k)
+    bytes_per_observation = np.dtype(chunk_dtype).itemsize * num_attrs
+    return max(1, (memory_budget - batch_bytes) // bytes_per_observation)
+
+
+# The mini batch K-Means algorithm implementation. Like KMeans, the centroids are found as soon as the object is
+# created.
+class MiniBatchKMeans:
+
+    # Creates an instance of the algorithm from:
+    # - get_chunks: a function that returns an iterable of chunks of observations, where each chunk is a matrix of
+    #   attribute values (one observation per row). It is called once per pass over the data. The observations should
+    #   be in a random order, since the first k observations are used as the initial centroids.
+    # - k: the number of centroids to find.
+    # - batch_size: (optional) the number of observations used for each update of the centroids.
+    # - max_passes: (optional) the maximum number of passes made over the observations.
+    # - dtype: (optional) the float type the centroids and distances are calculated in, float32 or float64. By default,
+    #   the global float type (see util.get_float_dtype).
+    def __init__(self, get_chunks, k, batch_size=DEFAULT_BATCH_SIZE, max_passes=DEFAULT_MAX_PASSES, dtype=None):
+        self.get_chunks = get_chunks
+        self.k = k
+        self.dtype = util.resolve_float_dtype(dtype)
+        self.batch_size = batch_size
+        self.max_passes = max_passes
+        # The number of observations each centroid has been moved towards, which sets its learning rate.
+        self.counts = np.zeros(k)
+        # The centroids (one per row) and the distortion measured during the final pass.
+        self.centroids, self.distortion = self.calculate_centroids()
+
+    # Creates an instance of the algorithm that streams the observations of a DataSet, in chunks that fit the memory
+    # budget (see 'get_chunk_size'). Note that this doesn't lower the peak memory used, since the data set's feature
+    # matrix is already held in memory and the chunks are views of it. It only keeps the algorithm's own arrays within
+    # the budget, and gives the same results as streaming a data set too large to load in chunks of the same size.
+    @classmethod
+    def from_data_set(cls, data_set, k, memory_budget=DEFAULT_MEMORY_BUDGET, batch_size=DEFAULT_BATCH_SIZE,
+                      max_passes=DEFAULT_MAX_PASSES, dtype=None):
+        dtype = util.resolve_float_dtype(dtype)
+        chunk_dtype = data_set.get_attr_matrix().dtype
+        chunk_size = get_chunk_size(memory_budget, len(data_set.attr_cols), k, batch_size, dtype, chunk_dtype)
+        return cls(lambda: data_set.iter_attr_chunks(chunk_size), k, batch_size, max_passes, dtype)
+
+    # Returns the centroids (one per row) and the distortion of the final pass. The centroids start as the first k
+    # observations, and passes are made over the stream of observations until the percentage change in distortion
+    # between passes is smaller than DISTORTION_CHANGE_CUTOFF (or max_passes is reached). The distortion of a pass is
+    # the total distance from each observation to its closest centroid at the time it was used.
+    def calculate_centroids(self):
+        centroids = self.get_initial_centroids()
+        distortion = None
+        for pass_i in range(self.max_passes):
+            new_distortion = 0
+            for chunk in self.get_chunks():
+                for start in range(0, len(chunk), self.batch_size):
+                    new_distortion += self.update_centroids(centroids, chunk[start:start + self.batch_size])
+            if distortion is not None and abs((new_distortion - distortion) / distortion) < DISTORTION_CHANGE_CUTOFF:
+                distortion = new_distortion
+                break
+            distortion = new_distortion
+        return centroids, distortion
+
+    # Returns the first k observations of the stream as a matrix (one per row).
+    def get_initial_centroids(self):
+        observations = []
+        num_observations = 0
+        for chunk in self.get_chunks():
+            observations.append(chunk[:self.k - num_observations])
+            num_observations += len(observations[-1])
+            if num_observations == self.k:
+                break
+        if num_observations < self.k:
+            raise ValueError("Cannot find " + str(self.k) + " centroids from " + str(num_observations) +
+                             " observations")
+        return np.concatenate(observations).astype(self.dtype)
+
+    # Moves each centroid (in place) towards the observations of the mini batch that are closest to it, and returns the
+    # distortion of the mini batch. Each centroid's learning rate is one over the number of observations it has been
+    # moved towards, which makes each centroid the running mean of every observation that has been assigned to it. The
+    # distances are calculated in the algorithm's float type, and the sums are accumulated in float64.
+    def update_centroids(self, centroids, batch):
+        batch = batch.astype(self.dtype, copy=False)
+        squared = util.squared_distances(batch, centroids)
+        assignments = np.argmin(squared, axis=1)
+        distortion = float(np.sum(np.sqrt(squared[np.arange(len(batch)), assignments]), dtype=np.float64))
+        sums = np.zeros(centroids.shape)
+        np.add.at(sums, assignments, batch)
+        batch_counts = np.bincount(assignments, minlength=self.k)
+        moved = batch_counts > 0
+        # The running mean, updated with the batch's sum of observations for each centroid.
+        new_counts = self.counts[moved] + batch_counts[moved]
+        centroids[moved] = (centroids[moved] * self.counts[moved, np.newaxis] + sums[moved]) / new_counts[:, np.newaxis]
+        self.counts[moved] = new_counts
+        return distortion
+
+    # Converts the centroids to a list of rows in the layout of a data set with the given attribute columns and number
+    # of columns, with the attribute values in the attribute columns and None in every other column. This is the same
+    # format as KMeans.centroids, which is what is saved to the centers files.
+    def get_centroid_rows(self, attr_cols, num_cols):
+        centroid_rows = []
+        for centroid in self.centroids.tolist():
+            row = [None for i in range(num_cols)]
+            for attr_i, attr_col in enumerate(attr_cols):
+                row[attr_col] = centroid[attr_i]
+            centroid_rows.append(row)
+        return centroid_rows
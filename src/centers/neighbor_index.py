@@ -0,0 +1,178 @@
+# neighbor_index.py
+# Indexes for finding the nearest neighbors of examples. Both indexes are built on a matrix of attribute values (one
+# example per row) and answer batches of k-nearest neighbor queries. Points can be removed from an index after it is
+# built, which lets algorithms such as Edited-KNN shrink the searched data without rebuilding the index.
+
+import heapq
+import numpy as np
+
+# The names of the available index types, used to pick an index in 'make_index'.
+KD_TREE = "kd_tree"
+BRUTE_FORCE = "brute_force"
+
+# The maximum number of points in a leaf of the KD-tree. Leaves are searched with a single vectorized distance
+# calculation, so larger leaves trade extra distance calculations for less time spent walking the tree.
+LEAF_SIZE = 32
+
+# The number of queries whose distances the brute force index calculates at once.
+BRUTE_FORCE_BLOCK_SIZE = 256
+
+
+# Creates a neighbor index of the given type on the points (one per row).
+def make_index(points: np.ndarray, index_type=BRUTE_FORCE):
+    if index_type == KD_TREE:
+        return KDTree(points)
+    if index_type == BRUTE_FORCE:
+        return BruteForceIndex(points)
+    raise ValueError("Unknown neighbor index type: " + str(index_type))
+
+
+# Finds nearest neighbors by calculating the distance from each query to every point. This is done in blocks of queries,
+# so only BRUTE_FORCE_BLOCK_SIZE rows of the distance matrix are held in memory at once. Since each block is a single
+# matrix product, this is the fastest index for our data sets (a few thousand examples with up to 17 attributes).
+class BruteForceIndex:
+
+    # Creates the index on a matrix of points, one per row.
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        # The squared length of each point, which is part of every squared distance to that point.
+        self.squared_lengths = np.sum(points ** 2, axis=1)
+        # Whether each point can still be returned as a neighbor.
+        self.active = np.ones(len(points), dtype=bool)
+
+    # Removes the points at the given indices from any future queries.
+    def remove(self, indices):
+        self.active[indices] = False
+
+    # Finds the k nearest active points to each query (one per row of 'queries'). If 'exclude' is given, then
+    # exclude[i] is the index of a point that cannot be a neighbor of the i-th query (such as the query itself). Returns
+    # (@0) a matrix of neighbor distances and (@1) a matrix of neighbor indices, where row i holds the neighbors of the
+    # i-th query from nearest to farthest. If there are fewer than k points to choose from, the remaining distances are
+    # infinite and the remaining indices are -1.
+    def query(self, queries: np.ndarray, k: int, exclude=None):
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=int)
+        num_points = min(k, len(self.points))
+        for start in range(0, len(queries), BRUTE_FORCE_BLOCK_SIZE):
+            end = start + BRUTE_FORCE_BLOCK_SIZE
+            block = queries[start:end]
+            # The same expansion of |a - b|^2 as util.squared_distances, reusing the squared lengths of the points.
+            squared = np.sum(block ** 2, axis=1)[:, np.newaxis] + self.squared_lengths - 2 * np.dot(block, self.points.T)
+            np.maximum(squared, 0, out=squared)
+            squared[:, ~self.active] = np.inf
+            if exclude is not None:
+                squared[np.arange(len(squared)), exclude[start:end]] = np.inf
+            # Pick the k smallest distances of each row, and then sort just those.
+            nearest = np.argpartition(squared, num_points - 1, axis=1)[:, :num_points]
+            nearest_squared = np.take_along_axis(squared, nearest, axis=1)
+            order = np.argsort(nearest_squared, axis=1, kind="stable")
+            distances[start:end, :num_points] = np.sqrt(np.take_along_axis(nearest_squared, order, axis=1))
+            indices[start:end, :num_points] = np.take_along_axis(nearest, order, axis=1)
+        indices[np.isinf(distances)] = -1
+        return distances, indices
+
+
+# A KD-tree, which recursively splits the points in half along the attribute with the largest spread. Each node stores
+# the bounding box of its points, so whole subtrees that are farther than the current k-th nearest neighbor are skipped.
+# Queries walk the tree one at a time, so this only beats the brute force index on large data sets with few attributes
+# and a small k, where most of the tree can be skipped.
+class KDTree:
+
+    # Creates the index on a matrix of points, one per row.
+    def __init__(self, points: np.ndarray, leaf_size=LEAF_SIZE):
+        self.points = points
+        self.leaf_size = leaf_size
+        # Whether each point can still be returned as a neighbor.
+        self.active = np.ones(len(points), dtype=bool)
+        # The points of each node are order[start:end] for the node's start and end.
+        self.order = np.arange(len(points))
+        # Each node is stored across these lists at the node's id. Leaves have no children (-1).
+        self.starts = []
+        self.ends = []
+        self.lowers = []
+        self.uppers = []
+        self.children = []
+        self.build()
+        # The bounding boxes are stacked into matrices (one row per node) so both children can be checked at once.
+        self.lowers = np.array(self.lowers)
+        self.uppers = np.array(self.uppers)
+
+    # Builds the nodes of the tree, starting with the root (node 0) that holds all of the points.
+    def build(self):
+        to_build = [self.add_node(0, len(self.points))]
+        while to_build:
+            node = to_build.pop()
+            start, end = self.starts[node], self.ends[node]
+            if end - start <= self.leaf_size:
+                continue
+            # Split on the attribute with the largest spread, putting the smaller half of its values on the left.
+            split_dim = np.argmax(self.uppers[node] - self.lowers[node])
+            node_points = self.order[start:end]
+            middle = (end - start) // 2
+            split = np.argpartition(self.points[node_points, split_dim], middle)
+            self.order[start:end] = node_points[split]
+            left = self.add_node(start, start + middle)
+            right = self.add_node(start + middle, end)
+            self.children[node] = [left, right]
+            to_build += [left, right]
+
+    # Adds a node holding the points order[start:end], and returns the node's id.
+    def add_node(self, start, end):
+        node_points = self.points[self.order[start:end]]
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lowers.append(np.min(node_points, axis=0) if len(node_points) else np.zeros(self.points.shape[1]))
+        self.uppers.append(np.max(node_points, axis=0) if len(node_points) else np.zeros(self.points.shape[1]))
+        self.children.append(-1)
+        return len(self.starts) - 1
+
+    # Removes the points at the given indices from any future queries.
+    def remove(self, indices):
+        self.active[indices] = False
+
+    # Finds the k nearest active points to each query (one per row of 'queries'). The arguments and returned values are
+    # the same as 'BruteForceIndex.query'.
+    def query(self, queries: np.ndarray, k: int, exclude=None):
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=int)
+        for i in range(len(queries)):
+            excluded = -1 if exclude is None else exclude[i]
+            neighbors = self.query_one(queries[i], k, excluded)
+            distances[i, :len(neighbors)] = [np.sqrt(squared) for squared, index in neighbors]
+            indices[i, :len(neighbors)] = [index for squared, index in neighbors]
+        return distances, indices
+
+    # Finds the k nearest active points to a single query, ignoring the point at index 'excluded'. Returns a sorted list
+    # of (squared distance, index) tuples.
+    def query_one(self, query: np.ndarray, k: int, excluded: int):
+        # The squared distances and indices of the (up to) k best neighbors seen so far, and the largest of those
+        # squared distances once k neighbors have been seen.
+        best_squared = np.empty(0)
+        best_indices = np.empty(0, dtype=int)
+        kth_squared = np.inf
+        # The nodes left to search, as a heap ordered by the squared distance from the query to each node's box.
+        to_search = [(0.0, 0)]
+        while to_search:
+            box_squared, node = heapq.heappop(to_search)
+            # Since the closest remaining box is farther than the k-th best neighbor, nothing left can be closer.
+            if box_squared >= kth_squared:
+                break
+            children = self.children[node]
+            if children == -1:
+                node_points = self.order[self.starts[node]:self.ends[node]]
+                node_points = node_points[self.active[node_points] & (node_points != excluded)]
+                squared = np.sum((self.points[node_points] - query) ** 2, axis=1)
+                # Merge the leaf's points into the best neighbors, keeping only the k closest.
+                best_squared = np.concatenate((best_squared, squared))
+                best_indices = np.concatenate((best_indices, node_points))
+                if len(best_squared) >= k:
+                    keep = np.argpartition(best_squared, k - 1)[:k]
+                    best_squared, best_indices = best_squared[keep], best_indices[keep]
+                    kth_squared = np.max(best_squared)
+            else:
+                # The squared distance from the query to the closest point of each child's bounding box.
+                gaps = np.maximum(np.maximum(self.lowers[children, :] - query, query - self.uppers[children, :]), 0)
+                for child, child_squared in zip(children, np.sum(gaps ** 2, axis=1).tolist()):
+                    heapq.heappush(to_search, (child_squared, child))
+        order = np.argsort(best_squared, kind="stable")
+        return list(zip(best_squared[order].tolist(), best_indices[order].tolist()))
@@ -3,211 +3,394 @@
 # previous assignment was to make PAM run faster.
 import random
 import math
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
 import src.util as util
 
+# The most memory (in bytes) the cached distance matrix can use. Larger data sets calculate distances as needed instead.
+DISTANCE_MATRIX_MAX_BYTES = 512 * 1024 * 1024
+
+# The number of rows of the distance matrix that are calculated at once.
+DISTANCE_CHUNK_SIZE = 256
+
+# A swap has to lower the total deviation by more than this to be made, so that rounding errors cannot cause swaps back
+# and forth forever.
+SWAP_TOLERANCE = 1e-9
+
+# The ways medoids can be found: from all of the training data (PAM) or from samples of it (CLARA).
+PAM = "pam"
+CLARA = "clara"
+
+# The default number of samples CLARA finds medoids for.
+DEFAULT_CLARA_SAMPLES = 5
+
+
+# The distances between every pair of points (rows of a matrix), stored as float32 values in a condensed matrix: only
+# the pairs (i, j) with i < j are stored, one row after another. If the condensed matrix would use more than max_bytes,
+# nothing is stored and distances are calculated whenever they are requested instead. Either way, distances are
+# calculated from the differences of the points (rather than util.squared_distances), so the distance from a to b is
+# always exactly the same as the distance from b to a.
+class DistanceMatrix:
+
+    # Creates the distance matrix of the points (one per row). If the condensed matrix has already been calculated (such
+    # as one in shared memory), it can be given instead of being calculated again.
+    def __init__(self, points: np.ndarray, max_bytes=DISTANCE_MATRIX_MAX_BYTES, condensed=None):
+        self.points = points
+        self.n = len(points)
+        # The condensed index of the pair (i, j) with i < j is row_offsets[i] + j.
+        indices = np.arange(self.n)
+        self.row_offsets = self.n * indices - indices * (indices + 1) // 2 - indices - 1
+        self.condensed = condensed
+        num_pairs = self.n * (self.n - 1) // 2
+        if condensed is None and num_pairs * np.dtype(np.float32).itemsize <= max_bytes:
+            self.condensed = np.empty(num_pairs, dtype=np.float32)
+            for i in range(self.n - 1):
+                self.condensed[self.row_offsets[i] + i + 1:self.row_offsets[i] + self.n] = \
+                    self.calculate(np.array([i]), np.arange(i + 1, self.n))[0]
+
+    # Calculates the distances between the points at the 'rows' indices and the points at the 'cols' indices.
+    def calculate(self, rows, cols):
+        differences = self.points[rows][:, np.newaxis, :] - self.points[cols][np.newaxis, :, :]
+        return np.sqrt(np.sum(differences ** 2, axis=2)).astype(np.float32)
+
+    # Returns the matrix of distances between the points at the 'rows' indices and the points at the 'cols' indices.
+    def get(self, rows, cols):
+        if self.condensed is None:
+            distances = np.empty((len(rows), len(cols)), dtype=np.float32)
+            for start in range(0, len(rows), DISTANCE_CHUNK_SIZE):
+                end = start + DISTANCE_CHUNK_SIZE
+                distances[start:end] = self.calculate(rows[start:end], cols)
+            return distances
+        low = np.minimum(rows[:, np.newaxis], cols[np.newaxis, :])
+        high = np.maximum(rows[:, np.newaxis], cols[np.newaxis, :])
+        distances = self.condensed[np.maximum(self.row_offsets[low] + high, 0)]
+        # A point's distance to itself is zero (and is not stored).
+        distances[low == high] = 0
+        return distances
+
+    # Returns the distances from the point at index i to every point.
+    def row(self, i):
+        if self.condensed is None:
+            return self.calculate(np.array([i]), np.arange(self.n))[0]
+        distances = np.empty(self.n, dtype=np.float32)
+        distances[:i] = self.condensed[self.row_offsets[:i] + i]
+        distances[i] = 0
+        distances[i + 1:] = self.condensed[self.row_offsets[i] + i + 1:self.row_offsets[i] + self.n]
+        return distances
+
+
+# The shared memory blocks and arrays (by name) attached to by a swap worker process, set by 'init_swap_worker'.
+worker_blocks = []
+worker_state = {}
+
+
+# Copies an array into a new block of shared memory, which is added to 'blocks'. Returns (@0) the shared copy of the
+# array and (@1) the spec used to attach to it from another process (None for a None array).
+def to_shared_memory(array, blocks):
+    if array is None:
+        return None, None
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[:] = array
+    return shared, (block.name, array.shape, array.dtype.str)
+
+
+# Returns the array in shared memory described by a spec from 'to_shared_memory'.
+def attach_shared_memory(spec):
+    if spec is None:
+        return None
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    worker_blocks.append(block)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+# Sets up a swap worker process by attaching to the shared arrays of 'PamNN.parallel_fast_pam'.
+def init_swap_worker(specs):
+    for name, spec in specs.items():
+        worker_state[name] = attach_shared_memory(spec)
+    worker_state["distances"] = DistanceMatrix(worker_state["points"], max_bytes=0, condensed=worker_state["condensed"])
+
+
+# Finds the best swap of a candidate point in the range [start, end) with one of the k medoids, using the shared state
+# of the worker process. Returns a tuple of the change in total deviation, the position of the medoid and the candidate
+# (or None if every point in the range is a medoid).
+def find_best_swap(start, end, k):
+    distances = worker_state["distances"]
+    is_medoid, nearest = worker_state["is_medoid"], worker_state["nearest"]
+    dn, ds = worker_state["dn"], worker_state["ds"]
+    best_swap = None
+    for candidate in range(start, end):
+        if is_medoid[candidate]:
+            continue
+        delta_td = get_swap_changes(distances.row(candidate).astype(float), nearest, dn, ds, k)
+        medoid_i = int(np.argmin(delta_td))
+        if best_swap is None or delta_td[medoid_i] < best_swap[0]:
+            best_swap = (float(delta_td[medoid_i]), medoid_i, candidate)
+    return best_swap
+
+
+# Returns the change in total deviation of swapping the candidate point with each of the k medoids, given the
+# candidate's distances to every point and each point's nearest medoid (and the distances to its nearest and second
+# nearest medoids).
+def get_swap_changes(candidate_distances, nearest, dn, ds, k):
+    # Removing a medoid moves each of its points to their second nearest medoid.
+    delta_td = np.bincount(nearest, weights=ds - dn, minlength=k)
+    # Points closer to the candidate than their nearest medoid move to the candidate no matter which medoid is
+    # removed, and so don't need to move to their second nearest when their nearest medoid is removed.
+    closer = candidate_distances < dn
+    shared = np.sum(candidate_distances[closer] - dn[closer])
+    delta_td += np.bincount(nearest[closer], weights=(dn - ds)[closer], minlength=k)
+    # Points between their nearest and second nearest medoids move to the candidate (instead of their second
+    # nearest) when their nearest medoid is removed.
+    between = ~closer & (candidate_distances < ds)
+    delta_td += np.bincount(nearest[between], weights=(candidate_distances - ds)[between], minlength=k)
+    return delta_td + shared
+
 
 # The PAM implementation. This will attempt to find k clusters in the training data, and stores the class distribution
 # of points belonging to these clusters in order to perform a nearest neighbor classification later on.
 class PamNN:
 
     # Creates an instance of the PAM algorithm. Clusters and their medoids are calculated upon object creation so that
-    # the run method can be used right away.
-    def __init__(self, training_data, k):
+    # the run method can be used right away. By default, the medoids are found using all of the training data. For large
+    # data sets, sampling can be set to CLARA to find them from samples of the training data instead, where:
+    # - num_samples: the number of samples that medoids are found for.
+    # - sample_size: (optional) the number of examples in each sample, 40 + 2k by default.
+    # - time_budget: (optional) the number of seconds after which no more samples are started.
+    # With more than one worker (num_workers), the candidate swaps are checked in parallel by that many processes. The
+    # distances are calculated in the given float type (float32 or float64), which is the global float type by default
+    # (see util.get_float_dtype), and are always stored as float32.
+    def __init__(self, training_data, k, sampling=PAM, num_samples=DEFAULT_CLARA_SAMPLES, sample_size=None,
+                 time_budget=None, num_workers=1, dtype=None):
+        if sampling not in (PAM, CLARA):
+            raise ValueError("Unknown PAM sampling mode: " + str(sampling))
         self.training_data = training_data.copy()
         self.k = k
+        self.sampling = sampling
+        self.num_samples = num_samples
+        self.sample_size = sample_size
+        self.time_budget = time_budget
+        self.num_workers = num_workers
+        self.dtype = util.resolve_float_dtype(dtype)
         self.medoids, self.clusters, self.cluster_classes, self.distortion = self.fast_calculate_medoids(k)
+        # The attributes of the medoids as a matrix (one medoid per row), used to find the closest medoid.
+        attr_cols = self.training_data.attr_cols
+        self.medoid_matrix = np.array([[medoid[col] for col in attr_cols] for medoid in self.medoids], dtype=float)
 
-    def get_min_index(self, a_list):
-        min_i = 0
-        for i in range(1, len(a_list)):
-            if a_list[min_i] > a_list[i]:
-                min_i = i
-        return min_i
-
-    def fast_build(self, k):
-        tuple_data = []
-        for data in self.training_data.data:
-            tuple_data.append(tuple(data))
-        td = float("inf")
-        m1 = None
-        S = random.sample(tuple_data, 10 + math.ceil(math.sqrt(len(tuple_data))))
-        for xj_ind in range(len(S)):
-            xj = S[xj_ind]
-            td_j = 0
-            for x0_ind in range(len(S)):
-                if x0_ind == xj_ind:
-                    continue
-                x0 = S[x0_ind]
-                td_j = td_j + self.training_data.distance(x0, xj)
-                if td_j < td:
-                    td = td_j
-                    m1 = xj
-        medoids = [m1]
-        for i in range(1, k):
-            delta_td_star = float("inf")
-            x_star = None
-
-            S = random.sample([item for item in tuple_data if item not in medoids], math.ceil(10+math.sqrt(len(tuple_data))))
-            dn = {}
-            for x0 in S:
-                dn[x0] = float("inf")
-            for xj_ind in range(len(S)):
-                xj = S[xj_ind]
-                delta_td = 0
-                for x0_ind in range(len(S)):
-                    if x0_ind == xj_ind:
-                        continue
-                    x0 = S[x0_ind]
-                    new_dist = self.training_data.distance(x0, medoids[i-1])
-                    if new_dist < dn[x0]:
-                        dn[x0] = new_dist
-                    closest_dist = dn[x0]
-                    dist = self.training_data.distance(x0, xj) - closest_dist
-                    if dist < 0:
-                        delta_td = delta_td + dist
-                if delta_td < delta_td_star:
-                    delta_td_star = delta_td
-                    x_star = xj
-            td = td + delta_td_star
-            medoids.append(x_star)
-        return medoids
+    # Picks the k starting medoids (as indices into the training data) using a sampled greedy build: each medoid is the
+    # point, out of a random sample of the remaining points, that most lowers the total deviation of the sample.
+    def fast_build(self, k, distances: DistanceMatrix):
+        n = distances.n
+        sample_size = 10 + math.ceil(math.sqrt(n))
+        # The distance from each point to its closest medoid so far.
+        closest = np.full(n, np.inf)
+        is_medoid = np.zeros(n, dtype=bool)
+        medoids = []
+        for i in range(k):
+            candidates = np.flatnonzero(~is_medoid)
+            sample = np.array(random.sample(candidates.tolist(), min(sample_size, len(candidates))))
+            sample_distances = distances.get(sample, sample).astype(float)
+            if i == 0:
+                # The first medoid is the sampled point with the smallest total distance to the rest of the sample.
+                change = np.sum(sample_distances, axis=0)
+            else:
+                # Otherwise, it is the sampled point that most lowers the sample's distances to their closest medoids.
+                change = np.sum(np.minimum(sample_distances - closest[sample][:, np.newaxis], 0), axis=0)
+            medoid = sample[np.argmin(change)]
+            medoids.append(medoid)
+            is_medoid[medoid] = True
+            closest = np.minimum(closest, distances.row(medoid))
+        return np.array(medoids)
 
-    def fast_calculate_medoids(self, k):
-        tuple_data = []
-        for data in self.training_data.data:
-            tuple_data.append(tuple(data))
-        medoids = self.fast_build(k)
-        td = 0
-        while True:
-            nearest = {}
-            dn = {}
-            ds = {}
-            x_zeros = []
-            for example in tuple_data:
-                if example not in medoids:
-                    x_zeros.append(example)
-            for x in x_zeros:
-                (nearest[x], dn[x], ds[x]) = self.find_closest_medoids(x, medoids)
-            delta_td_star = 0
-            m_star = None
-            x_star = None
-            for xj_ind in range(len(x_zeros)):
-                xj = x_zeros[xj_ind]
-                dj = dn[xj]
-                delta_td = [-dj for i in range(k)]
-                for x0 in tuple_data:
-                    if x0 is xj:
-                        continue
-                    doj = self.training_data.distance(x0, xj)
-                    if x0 not in dn:
-                        (nearest[x0], dn[x0], ds[x0]) = self.find_closest_medoids(x0, medoids)
-                    dnx0 = dn[x0]
-                    dsx0 = ds[x0]
-                    nx0 = nearest[x0]
-                    delta_td[nx0] = delta_td[nx0] + min(doj, dsx0) - dnx0
-                    if doj < dnx0:
-                        for i in range(k):
-                            if i == nx0:
-                                continue
-                            delta_td[i] = delta_td[i] + doj - dnx0
-                min_td_i = 0
-                for i in range(1, k):
-                    if delta_td[i] < delta_td[min_td_i]:
-                        min_td_i = i
-                if delta_td[min_td_i] < delta_td_star:
-                    delta_td_star = delta_td[min_td_i]
-                    m_star = min_td_i
-                    x_star = xj_ind
-            if delta_td_star >= 0:
-                break
-            temp = medoids[m_star]
-            medoids[m_star] = x_zeros[x_star]
-            x_zeros[x_star] = temp
+    # Finds the closest and second closest medoid to the points at the given indices. Returns (@0) the position (in
+    # 'medoids') of each point's closest medoid, (@1) the distance to it, (@2) the position of the second closest medoid
+    # and (@3) the distance to it.
+    def find_nearest_medoids(self, points, medoids, distances: DistanceMatrix):
+        medoid_distances = distances.get(points, medoids).astype(float)
+        if len(medoids) == 1:
+            return (np.zeros(len(points), dtype=int), medoid_distances[:, 0], np.zeros(len(points), dtype=int),
+                    np.full(len(points), np.inf))
+        closest_two = np.argpartition(medoid_distances, 1, axis=1)[:, :2]
+        closest_two_distances = np.take_along_axis(medoid_distances, closest_two, axis=1)
+        # Put the closer of the two first.
+        order = np.argsort(closest_two_distances, axis=1, kind="stable")
+        closest_two = np.take_along_axis(closest_two, order, axis=1)
+        closest_two_distances = np.take_along_axis(closest_two_distances, order, axis=1)
+        return closest_two[:, 0], closest_two_distances[:, 0], closest_two[:, 1], closest_two_distances[:, 1]
 
-            td = td + delta_td_star
-            # print(str(td) + "   " + str(delta_td_star))
+    # The calculation of medoids, clusters, cluster class distributions, and total deviation (the sum of the distances
+    # from every point to its closest medoid). The medoids are found by FasterPAM on the whole training data, or on
+    # samples of it when sampling is CLARA.
+    def fast_calculate_medoids(self, k):
+        examples = self.training_data.data
+        observations = self.training_data.get_attr_matrix().astype(self.dtype, copy=False)
+        if self.sampling == CLARA:
+            distances = DistanceMatrix(observations, max_bytes=0)
+            medoids = self.clara(observations, k, distances)
+        else:
+            distances = DistanceMatrix(observations)
+            medoids = self.find_medoids(k, distances)
+        nearest, dn = self.assign_to_medoids(medoids, distances)
 
-        clusters, distortion = self.create_clusters(medoids, tuple_data)
+        is_medoid = np.zeros(len(examples), dtype=bool)
+        is_medoid[medoids] = True
+        clusters = [[] for i in range(k)]
+        for point_i in np.flatnonzero(~is_medoid).tolist():
+            clusters[nearest[point_i]].append(examples[point_i])
         cluster_classes = []
         for cluster in clusters:
             cluster_classes.append(util.calculate_class_distribution(cluster, self.training_data.class_col))
-        return medoids, clusters, cluster_classes, td
-
-    def closest_medoid(self, example, medoids):
-        min_dist = float('inf')
-        for medoid in medoids:
-            min_dist = min(min_dist, self.training_data.distance(medoid, example))
-        return min_dist
-
-    def find_closest_medoids(self, example, medoids):
-        closest_i = -1
-        closest_dist = float('inf')
-        second_closest_dist = float('inf')
-        for medoid_i in range(len(medoids)):
-            medoid = medoids[medoid_i]
-            dist = self.training_data.distance(medoid, example)
-            if dist < closest_dist:
-                second_closest_dist = closest_dist
-                closest_dist = dist
-                closest_i = medoid_i
-            elif dist < second_closest_dist:
-                second_closest_dist = dist
-        return closest_i, closest_dist, second_closest_dist
-
-    # The calculation of medoids, clusters, cluster class distributions, and final distortion using the PAM algorithm.
-    def calculate_medoids(self, k):
-        # We randomly choose our medoids to begin.
-        medoids = random.sample(self.training_data.data, self.k)
-        clusters, distortion = self.create_clusters(medoids, self.training_data.data)
-
-        count = 0
-        while True:
-            count += 1
-            if count % 1 == 0:
-                print("Swap #" + str(count))
-            best_distortion = distortion
-            best_medoid_i = None
-            best_obs = (-1, -1)
-            for medoid_i in range(len(medoids)):
-                for cluster_i in range(len(clusters)):
-                    for obs_i in range(len(clusters[cluster_i])):
-                        original_medoid = medoids[medoid_i]
-                        medoids[medoid_i] = clusters[cluster_i][obs_i]
-                        new_clusters, new_distortion = self.create_clusters(medoids, self.training_data.data)
-                        if new_distortion < best_distortion:
-                            best_distortion = new_distortion
-                            best_medoid_i = medoid_i
-                            best_obs = (cluster_i, obs_i)
-                        medoids[medoid_i] = original_medoid
-            if best_medoid_i is None:
+        return [examples[i] for i in medoids.tolist()], clusters, cluster_classes, float(np.sum(dn))
+
+    # Returns the indices of k medoids of the points in the distance matrix, using worker processes if there are any.
+    # With one medoid, no point has a second nearest medoid for the swap search to move it to, so the medoid is found
+    # directly instead.
+    def find_medoids(self, k, distances: DistanceMatrix):
+        if k == 1:
+            return self.find_single_medoid(distances)
+        if self.num_workers > 1:
+            return self.parallel_fast_pam(k, distances)
+        return self.fast_pam(k, distances)
+
+    # Returns the index of the point with the smallest total distance to every other point, which is the best single
+    # medoid, as an array of one index. The distances are summed in chunks of rows.
+    def find_single_medoid(self, distances: DistanceMatrix):
+        points = np.arange(distances.n)
+        total_distances = np.empty(distances.n)
+        for start in range(0, distances.n, DISTANCE_CHUNK_SIZE):
+            rows = points[start:start + DISTANCE_CHUNK_SIZE]
+            total_distances[rows] = np.sum(distances.get(rows, points), axis=1, dtype=np.float64)
+        return np.array([int(np.argmin(total_distances))])
+
+    # Returns the indices of k medoids of the points in the distance matrix, found using the FasterPAM algorithm.
+    #
+    # For every point, we keep track of its nearest and second nearest medoid, which is enough to find the change in
+    # total deviation of swapping a candidate point with each of the k medoids in one O(n) pass over the candidate's
+    # distances. We go through the candidates in a cycle and make any swap that lowers the total deviation as soon as it
+    # is found (rather than looking for the best swap first), updating the nearest medoids of only the points affected
+    # by the swap. We stop once a full cycle passes without a swap.
+    def fast_pam(self, k, distances: DistanceMatrix):
+        n = distances.n
+        medoids = self.fast_build(k, distances)
+        is_medoid = np.zeros(n, dtype=bool)
+        is_medoid[medoids] = True
+        nearest, dn, second, ds = self.find_nearest_medoids(np.arange(n), medoids, distances)
+
+        # The number of candidates checked since the last swap.
+        since_swap = 0
+        candidate = -1
+        while since_swap < n:
+            candidate = (candidate + 1) % n
+            since_swap += 1
+            if is_medoid[candidate]:
+                continue
+            delta_td = get_swap_changes(distances.row(candidate).astype(float), nearest, dn, ds, k)
+            best_medoid = int(np.argmin(delta_td))
+            if delta_td[best_medoid] >= -SWAP_TOLERANCE:
+                continue
+            self.swap(best_medoid, candidate, medoids, is_medoid, (nearest, dn, second, ds), distances)
+            since_swap = 0
+        return medoids
+
+    # Returns the indices of k medoids of the points in the distance matrix, found using a FasterPAM search where the
+    # candidates are checked by a pool of worker processes. The distance matrix and the nearest medoids of each point
+    # are put in shared memory, which the workers only read. Each round, every worker finds the best swap out of its
+    # share of the candidates, and the best of those swaps is made (rather than making swaps as soon as they are found,
+    # which would depend on the order the candidates are checked in). We stop once no swap lowers the total deviation.
+    def parallel_fast_pam(self, k, distances: DistanceMatrix):
+        n = distances.n
+        medoids = self.fast_build(k, distances)
+        blocks = []
+        try:
+            # Everything the workers read is copied into shared memory, and then only updated in place.
+            specs = {}
+            state = {}
+            for name, array in (("points", distances.points), ("condensed", distances.condensed),
+                                ("is_medoid", np.zeros(n, dtype=bool)),
+                                ("nearest", np.empty(n, dtype=int)), ("dn", np.empty(n)), ("ds", np.empty(n))):
+                state[name], specs[name] = to_shared_memory(array, blocks)
+            is_medoid, nearest, dn, ds = state["is_medoid"], state["nearest"], state["dn"], state["ds"]
+            is_medoid[medoids] = True
+            nearest[:], dn[:], second, ds[:] = self.find_nearest_medoids(np.arange(n), medoids, distances)
+
+            # Each worker checks one contiguous range of candidates.
+            bounds = np.linspace(0, n, self.num_workers + 1).astype(int).tolist()
+            ranges = [(bounds[i], bounds[i + 1], k) for i in range(self.num_workers)]
+            with multiprocessing.Pool(self.num_workers, initializer=init_swap_worker, initargs=(specs,)) as pool:
+                while True:
+                    swaps = [swap for swap in pool.starmap(find_best_swap, ranges) if swap is not None]
+                    if len(swaps) == 0:
+                        break
+                    delta_td, best_medoid, candidate = min(swaps)
+                    if delta_td >= -SWAP_TOLERANCE:
+                        break
+                    self.swap(best_medoid, candidate, medoids, is_medoid, (nearest, dn, second, ds), distances)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return medoids
+
+    # Swaps the medoid at position 'medoid_i' (in 'medoids') with the candidate point, and updates the nearest medoids
+    # (the nearest, dn, second and ds arrays of find_nearest_medoids) of every point that was affected by the swap:
+    # those that had the removed medoid as their nearest or second nearest, and those that are closer to the new medoid
+    # than to their second nearest. Everything is updated in place.
+    def swap(self, medoid_i, candidate, medoids, is_medoid, nearest_medoids, distances: DistanceMatrix):
+        nearest, dn, second, ds = nearest_medoids
+        affected = (nearest == medoid_i) | (second == medoid_i) | (distances.row(candidate) < ds)
+        is_medoid[medoids[medoid_i]] = False
+        is_medoid[candidate] = True
+        medoids[medoid_i] = candidate
+        affected = np.flatnonzero(affected)
+        nearest[affected], dn[affected], second[affected], ds[affected] = \
+            self.find_nearest_medoids(affected, medoids, distances)
+
+    # Returns the indices of k medoids of the observations, found using CLARA: FasterPAM is run on random samples of the
+    # observations, and the medoids of the sample with the smallest total deviation over ALL of the observations are
+    # kept. Every sample after the first includes the best medoids found so far, so the result can only improve. No new
+    # sample is started once the time budget (if any) has run out.
+    def clara(self, observations, k, distances: DistanceMatrix):
+        n = len(observations)
+        sample_size = min(n, self.sample_size if self.sample_size is not None else 40 + 2 * k)
+        if sample_size < k:
+            raise ValueError("The CLARA sample size (" + str(sample_size) + ") must be at least k (" + str(k) + ")")
+        start_time = time.monotonic()
+        best_medoids = None
+        best_deviation = np.inf
+        for sample_i in range(self.num_samples):
+            if best_medoids is not None and self.time_budget is not None and \
+                    time.monotonic() - start_time > self.time_budget:
                 break
+            if best_medoids is None:
+                sample = np.array(random.sample(range(n), sample_size))
             else:
-                medoids[best_medoid_i] = clusters[best_obs[0]][best_obs[1]]
-                clusters, distortion = self.create_clusters(medoids, self.training_data.data)
+                others = np.setdiff1d(np.arange(n), best_medoids)
+                sample = np.concatenate((best_medoids, random.sample(others.tolist(), sample_size - k)))
+            sample_medoids = sample[self.find_medoids(k, DistanceMatrix(observations[sample]))]
+            deviation = np.sum(self.assign_to_medoids(sample_medoids, distances)[1])
+            if deviation < best_deviation:
+                best_medoids, best_deviation = sample_medoids, deviation
+        return best_medoids
 
-        cluster_classes = []
-        for cluster in clusters:
-            cluster_classes.append(util.calculate_class_distribution(cluster, self.training_data.class_col))
-        return medoids, clusters, cluster_classes, distortion
-
-    def create_clusters(self, medoids, data):
-        clusters = [[] for i in range(len(medoids))]
-        distortion = 0
-        for example in data:
-            if example not in medoids:
-                min_dist = self.training_data.distance(example, medoids[0])
-                min_medoid_i = 0
-                for medoid_i in range(1, len(medoids)):
-                    cur_dist = self.training_data.distance(example, medoids[medoid_i])
-                    if cur_dist < min_dist:
-                        min_dist = cur_dist
-                        min_medoid_i = medoid_i
-                clusters[min_medoid_i].append(example)
-                distortion += min_dist**2
-        return clusters, distortion
+    # Assigns every point of the distance matrix to its closest medoid, in chunks of points. Returns (@0) the position
+    # (in 'medoids') of each point's closest medoid and (@1) the distance to it.
+    def assign_to_medoids(self, medoids, distances: DistanceMatrix):
+        nearest = np.empty(distances.n, dtype=int)
+        closest = np.empty(distances.n)
+        for start in range(0, distances.n, DISTANCE_CHUNK_SIZE):
+            points = np.arange(start, min(start + DISTANCE_CHUNK_SIZE, distances.n))
+            medoid_distances = distances.get(points, medoids)
+            nearest[points] = np.argmin(medoid_distances, axis=1)
+            closest[points] = medoid_distances[np.arange(len(points)), nearest[points]]
+        return nearest, closest
 
     # Classifies the given example using the clusters found by PAM. We simply find the nearest cluster to our example
     # point and then classify it according to the probability distribution of that cluster.
     def run(self, example):
-        closest_i, closest_dist, second_closest_dist = self.find_closest_medoids(example, self.medoids)
-        return self.cluster_classes[closest_i]
\ No newline at end of file
+        example_array = np.array([example[col] for col in self.training_data.attr_cols], dtype=float)
+        closest_i = int(np.argmin(np.sum((self.medoid_matrix - example_array) ** 2, axis=1)))
+        return self.cluster_classes[closest_i]
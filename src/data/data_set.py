@@ -2,10 +2,14 @@
 # Has the class that defines data set objects, which we use throughout our algorithms.
 
 from typing import Dict
+import copy
+import itertools
 import math
 import random
 import numpy as np
 import src.util as util
+import src.data.schema as schema
+from src.data.normalizer import Normalizer
 
 ABALONE_DATA_FILE = "../data/abalone.data"
 CAR_DATA_FILE = "../data/car.data"
@@ -18,6 +22,12 @@ REGRESSION_TEST_DATA_FILE = '../data/test/regression_test_set.data'
 
 
 # Creates DataSet objects, which stored the relevant information for our data sets.
+#
+# The data is stored by column rather than by row. Once every attribute column is numeric, the attribute columns are
+# packed into a single contiguous float matrix ('features', one row per example and one column per attribute in the
+# order of attr_cols). The class column is stored as an encoded label vector ('labels'), which holds the index of each
+# example's class value in 'label_values'. Any other columns are kept as their own numpy arrays. The row representation
+# ('data', a list of tuples) is only built when it is asked for.
 class DataSet:
 
     # Creates a DataSet object from:
@@ -27,14 +37,99 @@ class DataSet:
     # - num_classes: the number of classes in the data (including classes that may not be present in the data list).
     # - filename: (optional) string denoting the name of the file the data is originally sourced from.
     def __init__(self, data: list, attr_cols: list, class_col: int, filename=""):
-        self.data = data
         self.attr_cols = attr_cols
         self.class_col = class_col
         self.filename = filename
+        self.data = data
+
+    # Creates a DataSet from a list of numpy columns (each holding num_rows values) rather than a list of examples. The
+    # other arguments are the same as the constructor's.
+    @classmethod
+    def from_columns(cls, columns: list, num_rows: int, attr_cols: list, class_col: int, filename=""):
+        data_set = cls.__new__(cls)
+        data_set.attr_cols = list(attr_cols)
+        data_set.class_col = class_col
+        data_set.filename = filename
+        data_set.set_columns(columns, num_rows)
+        return data_set
+
+    # Creates a DataSet directly from its arrays, rather than from a list of examples:
+    # - features: the float matrix of attribute values, with one column per attribute in the order of attr_cols.
+    # - labels and label_values: the encoded class column (see 'encode_labels').
+    # - attr_cols and class_col: the same as in the constructor.
+    # - num_cols: the number of columns in each example.
+    # - other_columns: (optional) a dictionary mapping the index of any other column to its numpy array of values.
+    #   Columns that are not given are filled with None.
+    # - filename: (optional) the name of the file the data is originally sourced from.
+    # The arrays are used as they are rather than copied, so they can be memory mapped.
+    @classmethod
+    def from_arrays(cls, features: np.ndarray, labels: np.ndarray, label_values: list, attr_cols: list, class_col: int,
+                    num_cols: int, other_columns=None, filename=""):
+        data_set = cls.__new__(cls)
+        data_set.attr_cols = list(attr_cols)
+        data_set.class_col = class_col
+        data_set.filename = filename
+        data_set.num_rows = len(labels)
+        data_set.num_cols = num_cols
+        data_set.features = features
+        data_set.labels = labels
+        data_set.label_values = np.empty(len(label_values), dtype=object)
+        data_set.label_values[:] = list(label_values)
+        other_columns = other_columns or {}
+        data_set.columns = []
+        for col in range(num_cols):
+            if col == class_col:
+                data_set.columns.append(None)
+            elif col in data_set.attr_cols:
+                data_set.columns.append(features[:, data_set.attr_cols.index(col)])
+            elif col in other_columns:
+                data_set.columns.append(other_columns[col])
+            else:
+                data_set.columns.append(np.full(data_set.num_rows, None, dtype=object))
+        data_set.clear_cache()
+        return data_set
+
+    # Returns the rows of the data set as a list of tuples. The list is built from the columns the first time it is
+    # requested and is kept until the data changes, so it must not be modified directly (set 'data' instead).
+    @property
+    def data(self):
+        if self.rows is None:
+            columns = [self.get_column(col).tolist() for col in range(self.num_cols)]
+            self.rows = list(zip(*columns))
+        return self.rows
+
+    # Replaces the data of this data set with a list of examples, where each example is either a list or tuple.
+    @data.setter
+    def data(self, data: list):
+        data = list(data)
+        # Examples that are shorter than the others (such as header lines) have their missing values filled with None.
+        self.set_columns([to_column(list(column)) for column in itertools.zip_longest(*data)], len(data))
+
+    # Replaces the data of this data set with a list of numpy columns, each holding num_rows values.
+    def set_columns(self, columns: list, num_rows: int):
+        self.num_rows = num_rows
+        self.num_cols = max(len(columns), max(self.attr_cols + [self.class_col]) + 1)
+        self.features = None
+        self.columns = list(columns)
+        self.columns += [np.empty(0, dtype=object) for col in range(len(self.columns), self.num_cols)]
+        self.label_values, self.labels = encode_labels(self.columns[self.class_col])
+        self.columns[self.class_col] = None
+        self.clear_cache()
+        self.pack_features()
+
+    # Clears the values that are calculated from the data and kept until it changes. This must be called whenever the
+    # data changes.
+    def clear_cache(self):
+        self.rows = None
+        # Maps whether the max distance is exact to the max distance found (see 'get_max_distance').
+        self.max_distances = {}
 
     # Creates a copy of this data set, with copies of each underlying field as well.
     def copy(self):
-        return DataSet(self.data.copy(), self.attr_cols.copy(), self.class_col, self.filename)
+        data_copy = copy.copy(self)
+        data_copy.attr_cols = self.attr_cols.copy()
+        data_copy.select_rows(np.arange(self.num_rows))
+        return data_copy
 
     # Returns the underlying data list.
     def get_data(self):
@@ -42,102 +137,167 @@ class DataSet:
 
     # Returns the length of the underlying data list.
     def get_len(self):
-        return len(self.data)
+        return self.num_rows
+
+    # Returns the values of the column at the specified index as a numpy array.
+    def get_column(self, col: int):
+        if col == self.class_col:
+            return self.label_values[self.labels]
+        return self.columns[col]
+
+    # Replaces the values of the column at the specified index with the given numpy array.
+    def set_column(self, col: int, values: np.ndarray):
+        self.clear_cache()
+        if col == self.class_col:
+            self.label_values, self.labels = encode_labels(values)
+            return
+        if self.features is not None and col in self.attr_cols:
+            # Numeric attribute values can be written directly into the feature matrix. Otherwise the feature matrix
+            # can no longer hold this column, so the attribute columns go back to being stored separately.
+            if values.dtype == float:
+                self.own_features()
+                self.columns[col][:] = values
+                return
+            self.unpack_features()
+        self.columns[col] = values
+        self.pack_features()
+
+    # Packs the attribute columns into the contiguous 'features' matrix, which is only possible once all of the
+    # attribute columns are numeric. The attribute entries of 'columns' then become views of the feature matrix.
+    def pack_features(self):
+        if self.features is not None or not all(is_numeric(self.columns[col]) for col in self.attr_cols):
+            return
+        self.features = np.empty((self.num_rows, len(self.attr_cols)))
+        for i, col in enumerate(self.attr_cols):
+            self.features[:, i] = self.columns[col]
+            self.columns[col] = self.features[:, i]
+
+    # Makes sure the feature matrix is not a view of another array (such as the feature matrix of the data set this one
+    # is a subset of, or a memory mapped file) by copying it if it is, so that writing to it doesn't change any other
+    # data set.
+    def own_features(self):
+        if self.features is None or self.features.flags.owndata:
+            return
+        self.features = self.features.copy()
+        for i, col in enumerate(self.attr_cols):
+            self.columns[col] = self.features[:, i]
+
+    # Undoes 'pack_features', giving each attribute column its own array again.
+    def unpack_features(self):
+        for i, col in enumerate(self.attr_cols):
+            self.columns[col] = self.features[:, i].copy()
+        self.features = None
+
+    # Keeps only the rows picked out by 'selector', in the order it picks them. The selector is anything that can index
+    # a numpy array: a slice keeps views of the current arrays, while an array of indices creates new arrays.
+    def select_rows(self, selector):
+        self.labels = self.labels[selector]
+        self.num_rows = len(self.labels)
+        self.clear_cache()
+        if self.features is not None:
+            self.features = self.features[selector]
+        columns = []
+        for col, column in enumerate(self.columns):
+            if column is None:
+                columns.append(None)
+            elif self.features is not None and col in self.attr_cols:
+                columns.append(self.features[:, self.attr_cols.index(col)])
+            else:
+                columns.append(column[selector])
+        self.columns = columns
+
+    # Returns a new data set made of the rows picked out by 'selector' (see 'select_rows').
+    def subset(self, selector, filename=""):
+        data_subset = copy.copy(self)
+        data_subset.filename = filename
+        data_subset.select_rows(selector)
+        return data_subset
 
     # Removes the first 'length' rows from the data. Use if there is header information.
     def remove_header(self, length: int):
-        self.data = self.data[length:]
+        self.select_rows(slice(length, None))
+
+    # Removes each of the given examples from the data, if present. Like list.remove, only one matching row is removed
+    # for each given example.
+    def remove_examples(self, examples):
+        to_remove = util.count_frequency(tuple(example) for example in examples)
+        keep = []
+        for i, row in enumerate(self.data):
+            if to_remove.get(row, 0) > 0:
+                to_remove[row] -= 1
+            else:
+                keep.append(i)
+        self.select_rows(np.array(keep, dtype=int))
 
     # Used to handle data sets that involve discrete attribute values. The values in the attribute at the specified
     # column are converted using the given map from the original value to the new value. This is purposefully abstract
     # in order for the Data class to work with numerous data sets.
     def convert_str_attribute(self, col: int, value_map: Dict[str, float]):
-        for i in range(len(self.data)):
-            row = list(self.data[i])
-            if row[col] in value_map:
-                row[col] = value_map[row[col]]
-            self.data[i] = tuple(row)
+        values = [value_map.get(value, value) for value in self.get_column(col).tolist()]
+        self.set_column(col, to_column(values))
 
     # Converts values in a specified set of columns (represented as indices) to floating point values.
     def convert_to_float(self, cols):
-        for line_i in range(len(self.data)):
-            line = self.data[line_i]
-            new_line = list(line)
-            for i in range(len(line)):
-                if i not in cols:
-                    continue
-                if line[i] != 'None':
-                    new_line[i] = float(line[i])
-            line = tuple(new_line)
-            self.data[line_i] = line
+        for col in cols:
+            column = self.get_column(col)
+            if column.dtype == float:
+                continue
+            values = [value if value is None or value == 'None' else float(value) for value in column.tolist()]
+            self.set_column(col, to_column(values))
 
     # Normalizes the values in a specified set of columns (represented as indices) to a z-score. For interpretation, the
     # new value in the data set represents how many standard deviations an attribute value is from the mean of the
-    # attribute.
+    # attribute. The statistics are found from this data set itself; to normalize other data (such as a test set) with
+    # the same statistics, use a Normalizer instead. Columns stored in the feature matrix are normalized in place.
     def normalize_z_score(self, cols):
-        for col in cols:
-            # Calculate the mean of the column's data.
-            col_sum = 0
-            for row in self.data:
-                col_sum += row[col]
-            mean = col_sum / len(self.data)
-
-            # Calculate the standard deviation of the column's data.
-            sum_square_diffs = 0
-            for row in self.data:
-                sum_square_diffs += (mean - row[col]) ** 2
-            standard_deviation = math.sqrt(sum_square_diffs)
-
-            # Replace each column value with it's z-score.
-            for row_i in range(len(self.data)):
-                row = list(self.data[row_i])
-                # If the standard deviation is 0, we just assign the z_score as 0 (no variation from mean).
-                z_score = 0
-                if standard_deviation != 0:
-                    # Otherwise we can use the standard calculation for z_scores.
-                    z_score = (row[col] - mean) / standard_deviation
-                row[col] = z_score
-                self.data[row_i] = tuple(row)
+        matrix = np.column_stack([self.get_column(col).astype(float) for col in cols])
+        normalized = Normalizer.fit(matrix).transform(matrix)
+        for i, col in enumerate(cols):
+            self.set_column(col, normalized[:, i])
 
     # Shuffles the rows in the data randomly.
     def shuffle(self):
-        random.shuffle(self.data)
+        order = list(range(self.num_rows))
+        random.shuffle(order)
+        self.select_rows(np.array(order, dtype=int))
 
     # Partitions the data set into two 2D lists. The first_percentage parameter specifies what proportion of
-    # observations should fall into the first 2D list.
+    # observations should fall into the first 2D list. Both partitions are views of this data set's arrays until their
+    # data is changed, when they get their own copies (see 'own_features'), so changing them never changes this data
+    # set.
     def partition(self, first_percentage):
-        cutoff = math.floor(first_percentage * len(self.data))
-        first = DataSet(self.data[:cutoff], self.attr_cols, self.class_col)
-        second = DataSet(self.data[cutoff:], self.attr_cols, self.class_col)
+        cutoff = math.floor(first_percentage * self.num_rows)
+        first = self.subset(slice(None, cutoff))
+        second = self.subset(slice(cutoff, None))
         return first, second
 
     # Creates n-"folds" of our data set, which can be used for cross validation. Each fold has a test set, containing
-    # 1/n of the data, and a training set, containing (n-1)/n of the data. Returns the list of folds.
-    def validation_folds(self, n):
-        avg_size = len(self.data) / n
-        sections = []
-        for i in range(n):
-            section_data = None
-            # If we are in the final section, we make sure to take all elements to the very end of the data.
-            if i == n - 1:
-                sections.append(self.data[math.floor(avg_size * i):])
-            # Otherwise, we use a normal range to create the data for the section.
-            else:
-                sections.append(self.data[math.floor(avg_size * i):math.floor(avg_size * (i + 1))])
-
-        folds = [{} for i in range(n)]
-        for i in range(n):
-            folds[i]['test'] = DataSet(sections[i], self.attr_cols, self.class_col)
-            train = []
-            for j in range(n):
-                if i != j:
-                    train += sections[j]
-            folds[i]['train'] = DataSet(train, self.attr_cols, self.class_col)
-        return folds
+    # 1/n of the data, and a training set, containing (n-1)/n of the data. Returns the list of folds (see Fold), which
+    # only hold which fold each example is in, so creating them doesn't copy any data. If stratified is set, the
+    # examples of each class are spread evenly over the folds, so each test set has close to the same proportion of
+    # each class as the whole data set. Otherwise each test set is a consecutive section of the data.
+    def validation_folds(self, n, stratified=False):
+        assignment = self.get_fold_assignment(n, stratified)
+        return [Fold(self, assignment, i) for i in range(n)]
+
+    # Returns an array holding the index of the fold (out of n) that each example is in the test set of (see
+    # 'validation_folds').
+    def get_fold_assignment(self, n, stratified=False):
+        if not stratified:
+            avg_size = self.num_rows / n
+            # The boundaries of each section. The final section takes all elements to the very end of the data.
+            bounds = [math.floor(avg_size * i) for i in range(n)] + [self.num_rows]
+            return np.repeat(np.arange(n), np.diff(bounds))
+        # Group the examples by class, keeping their order within each class, and deal them out to the folds in turn.
+        # Since the dealing carries on from one class to the next, the folds' sizes differ by at most one.
+        order = np.argsort(self.labels, kind='stable')
+        assignment = np.empty(self.num_rows, dtype=int)
+        assignment[order] = np.arange(self.num_rows) % n
+        return assignment
 
     # Used to randomly sample our data to only be of length k.
     def sample(self, k):
-        self.data = random.sample(self.data, k)
+        self.select_rows(np.array(random.sample(range(self.num_rows), k), dtype=int))
 
     # Save data to a file with the specified name.
     def save_file(self, file_name):
@@ -159,37 +319,132 @@ class DataSet:
             squared_sum += (example_a[attr_col] - example_b[attr_col]) ** 2
         return math.sqrt(squared_sum)
 
-    # Returns the maximum distance between any two observations in this data set.
-    def get_max_distance(self):
-        max_distance = 0
-        idx = 0
-        starter_row = self.data[idx]
-        while idx < len(self.data)-1:
-            for i in range(idx+1, len(self.data)):
-                # Calculate distance between starter_row
-                distance = self.distance(starter_row, self.data[i])
-                if distance > max_distance:
-                    max_distance = distance
-            idx += 1
-            starter_row = self.data[idx]
-        return max_distance
+    # Returns the maximum distance between any two observations in this data set. By default the exact maximum is
+    # found by comparing every pair of observations (in vectorized blocks). Otherwise, it is estimated using farthest
+    # point sweeps, which never overestimate and are at least half of the exact maximum (see
+    # 'util.approximate_max_distance'). The result is kept until the data changes.
+    def get_max_distance(self, exact=True):
+        if exact not in self.max_distances:
+            attr_matrix = self.get_attr_matrix()
+            if exact:
+                self.max_distances[exact] = util.max_distance(attr_matrix)
+            else:
+                self.max_distances[exact] = util.approximate_max_distance(attr_matrix)[0]
+        return self.max_distances[exact]
 
     # Returns a list of tuples, where each tuple stores (@0) the numpy representation of each example's attributes, and
-    # (@1) the example's class.
+    # (@1) the example's class. The attribute arrays are views of the rows of the feature matrix.
     def get_numpy_list(self):
-        numpy_list = []
-        for example in self.data:
-            attr_only = []
-            for col in self.attr_cols:
-                attr_only.append(example[col])
-            numpy_list.append((np.array(attr_only), example[self.class_col]))
-        return numpy_list
+        attr_matrix = self.get_attr_matrix()
+        return list(zip(attr_matrix, self.get_class_array().tolist()))
+
+    # Returns a numpy matrix of the attribute values, where each row is an example and each column is an attribute (in
+    # the order of attr_cols). This is the feature matrix itself rather than a copy, so it should not be modified.
+    def get_attr_matrix(self):
+        if self.features is not None:
+            return self.features
+        return np.array([self.columns[col] for col in self.attr_cols], dtype=float).T.copy()
+
+    # Yields the rows of the attribute matrix in chunks of (at most) chunk_size examples. Each chunk is a view of the
+    # feature matrix.
+    def iter_attr_chunks(self, chunk_size):
+        attr_matrix = self.get_attr_matrix()
+        for start in range(0, len(attr_matrix), chunk_size):
+            yield attr_matrix[start:start + chunk_size]
+
+    # Returns a numpy array of the class value of each example, in the same order as the rows of 'get_attr_matrix'.
+    def get_class_array(self):
+        return self.get_column(self.class_col)
+
+
+# A fold of a data set used for cross validation, made by 'DataSet.validation_folds'. Rather than holding its own copies
+# of the data, a fold holds the data set and an array (shared by all of the data set's folds) of which fold each example
+# is in the test set of. Its parts are indexed like a dictionary, fold['train'] and fold['test'], and each part is only
+# built from the data set when it is asked for. A test set that is a consecutive section of the data is a view of the
+# data set's arrays (until it is changed, see 'DataSet.own_features'). Since the parts are built from the data set, it
+# should not be changed while its folds are in use.
+class Fold:
+
+    # The parts of a fold.
+    PARTS = ('train', 'test')
+
+    # Creates the fold with index fold_i of the data set, given which fold each example is in the test set of.
+    def __init__(self, data_set: DataSet, assignment: np.ndarray, fold_i: int):
+        self.data_set = data_set
+        self.assignment = assignment
+        self.fold_i = fold_i
+
+    # Returns the indices of the examples (in the data set) of the given part of the fold, in their original order.
+    def get_indices(self, part):
+        if part == 'test':
+            return np.flatnonzero(self.assignment == self.fold_i)
+        if part == 'train':
+            return np.flatnonzero(self.assignment != self.fold_i)
+        raise KeyError(part)
+
+    # Returns a new data set holding the given part of the fold.
+    def __getitem__(self, part):
+        indices = self.get_indices(part)
+        if len(indices) > 0 and indices[-1] - indices[0] + 1 == len(indices):
+            # The examples are consecutive, so the part can be a view of the data set.
+            return self.data_set.subset(slice(indices[0], indices[-1] + 1))
+        return self.data_set.subset(indices)
+
+    # Returns whether the fold has a part with the given name.
+    def __contains__(self, part):
+        return part in Fold.PARTS
+
+    # Returns the names of the parts of the fold.
+    def keys(self):
+        return list(Fold.PARTS)
+
+
+# Encodes the values of a column as labels. Returns (@0) an array of the distinct values, in order of first appearance,
+# and (@1) an array that stores the index of each original value in the array of distinct values.
+def encode_labels(values: np.ndarray):
+    value_index = {}
+    labels = np.fromiter((value_index.setdefault(value, len(value_index)) for value in values.tolist()), dtype=int,
+                         count=len(values))
+    label_values = np.empty(len(value_index), dtype=object)
+    label_values[:] = list(value_index)
+    return label_values, labels
+
+
+# Creates a numpy array from a list of column values. The array is a float array if every value is a number, and an
+# object array (holding the original values) otherwise.
+def to_column(values: list):
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    if is_numeric(column):
+        return column.astype(float)
+    return column
+
+
+# Returns true if every value in the column is a number.
+def is_numeric(column: np.ndarray):
+    if column.dtype == float:
+        return True
+    return all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in column.tolist())
 
 
 # NOTE:
 # The following functions are meant to handle the preprocessing of the data sets used in our experimental design.
 
 
+# Loads a data set from a file using its schema (see schema.py). The file is parsed straight into typed columns, rather
+# than into rows that are then converted.
+def load_data_set(file_name, data_schema: schema.Schema):
+    columns, num_rows = data_schema.read_columns(file_name)
+    return DataSet.from_columns(columns, num_rows, data_schema.attr_cols, data_schema.class_col, file_name)
+
+
+# Loads a data set from a file using its schema, as a stream of data sets with at most chunk_size examples each. Only
+# one chunk of the file is held in memory at a time. The chunks are not normalized or shuffled.
+def load_data_set_chunks(file_name, data_schema: schema.Schema, chunk_size=schema.DEFAULT_CHUNK_SIZE):
+    for columns in data_schema.iter_column_chunks(file_name, chunk_size):
+        yield DataSet.from_columns(columns, len(columns[0]), data_schema.attr_cols, data_schema.class_col, file_name)
+
+
 # Gets the abalone data set.
 def get_abalone_data():
     return get_abalone_data(ABALONE_DATA_FILE)
@@ -197,12 +452,8 @@ def get_abalone_data():
 
 # Gets the abalone data set from a specific file name.
 def get_abalone_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    abalone_data = DataSet(data, list(range(1, 8)), 8, file_name)
-    # Convert male, female, infant column to numeric values
-    # abalone_data.convert_str_attribute(0, {'I': 0, 'F': 1, 'M': 2})
-    # Convert attribute columns to floats
-    abalone_data.convert_to_float(list(range(1, 9)))
+    # The attribute and class columns are read as floats (the male, female, infant column is left as it is).
+    abalone_data = load_data_set(file_name, schema.ABALONE_SCHEMA)
     # Normalize values
     if normalize:
         abalone_data.normalize_z_score(list(range(1, 8)))
@@ -218,16 +469,8 @@ def get_car_data():
 
 # Gets the car data set from a specified file name.
 def get_car_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    car_data = DataSet(data, list(range(0, 6)), 6, file_name)
-    # Convert attribute columns to numeric scheme
-    car_data.convert_str_attribute(0, {'low': 0, 'med': 1, 'high': 2, 'vhigh': 3})
-    car_data.convert_str_attribute(1, {'low': 0, 'med': 1, 'high': 2, 'vhigh': 3})
-    car_data.convert_str_attribute(2, {'2': 2, '3': 3, '4': 4, '5more': 5})
-    car_data.convert_str_attribute(3, {'2': 2, '4': 4, 'more': 5})
-    car_data.convert_str_attribute(4, {'small': 0, 'med': 1, 'big': 2})
-    car_data.convert_str_attribute(5, {'low': 0, 'med': 1, 'high': 2})
-    car_data.convert_to_float([0, 1, 2, 3, 4, 5])
+    # The attribute columns are converted to a numeric scheme as they are read.
+    car_data = load_data_set(file_name, schema.CAR_SCHEMA)
     # Normalize values.
     if normalize:
         car_data.normalize_z_score(list(range(0, 6)))
@@ -243,16 +486,9 @@ def get_forest_fires_data():
 
 # Gets the forest fires data set from the specified file name.
 def get_forest_fires_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    forest_fires_data = DataSet(data, list(range(0, 12)), 12, file_name)
-    # Remove the first line, which is the header info.
-    forest_fires_data.remove_header(1)
-    # Convert string columns (dates) to numerics
-    forest_fires_data.convert_str_attribute(2, {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-                                                'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12})
-    forest_fires_data.convert_str_attribute(3, {'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6, 'sun': 7})
-    # Convert applicable columns to floats, including the class column.
-    forest_fires_data.convert_to_float(list(range(0, 13)))
+    # The first line (the header info) is skipped, and the string columns (dates) are converted to numerics, along with
+    # the rest of the columns, including the class column.
+    forest_fires_data = load_data_set(file_name, schema.FOREST_FIRES_SCHEMA)
     # Normalize values.
     if normalize:
         forest_fires_data.normalize_z_score(list(range(0, 12)))
@@ -268,11 +504,8 @@ def get_machine_data():
 
 # Gets the machine data set from the specified file name.
 def get_machine_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    # There is another final column but we probably want to exclude it.
-    machine_data = DataSet(data, list(range(2, 8)), 8, file_name)
-    # Convert all columns except the first two to floats, including the class column.
-    machine_data.convert_to_float(list(range(2, 9)))
+    # All columns except the first two are read as floats, including the class column.
+    machine_data = load_data_set(file_name, schema.MACHINE_SCHEMA)
     # Normalize values.
     if normalize:
         machine_data.normalize_z_score(list(range(2, 8)))
@@ -288,19 +521,11 @@ def get_segmentation_data():
 
 # Gets the segmentation data set from the specified file name.
 def get_segmentation_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    # Attribute columns are all numeric
-    #  * Attribute #7, vedge-sd, removed because it is a standard deviation.
-    #  * Attribute #9, hedge-sd, removed for same reason.
-    attr_cols = [1, 2, 3, 4, 5, 6, 8, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
-    segmentation_data = DataSet(data, attr_cols, 0, file_name)
-    # Remove the first 5 lines, which is reserved for the header.
-    segmentation_data.remove_header(5)
-    # Convert all attribute columns to numeric values.
-    segmentation_data.convert_to_float(attr_cols)
+    # The first 5 lines, which are reserved for the header, are skipped, and the attribute columns are read as floats.
+    segmentation_data = load_data_set(file_name, schema.SEGMENTATION_SCHEMA)
     # Normalize values.
     if normalize:
-        segmentation_data.normalize_z_score(attr_cols)
+        segmentation_data.normalize_z_score(schema.SEGMENTATION_ATTR_COLS)
     # Randomly shuffle values.
     segmentation_data.shuffle()
     return segmentation_data
@@ -313,10 +538,8 @@ def get_wine_data():
 
 # Gets the wine data set from the specified file name.
 def get_wine_data(file_name, normalize=True):
-    data = util.read_file(file_name)
-    wine_data = DataSet(data, list(range(0, 11)), 11, file_name)
-    # Convert all attribute columns to numeric values.
-    wine_data.convert_to_float(list(range(0, 12)))
+    # All columns are read as floats.
+    wine_data = load_data_set(file_name, schema.WINE_SCHEMA)
     # Normalize values.
     if normalize:
         wine_data.normalize_z_score(list(range(0, 11)))
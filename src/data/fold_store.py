@@ -0,0 +1,124 @@
+# fold_store.py
+# Stores the folds used by the RBFNN in binary files, so that they can be loaded without parsing and converting text.
+# Each fold (its train, test, and center data sets) is stored in a single file in the binary format of
+# util.save_binary: the feature matrix and encoded labels of each data set are arrays, which are memory mapped when the
+# fold is loaded, and everything else is stored in the header. The folds stored as text in /rbf-data/ can be converted
+# once by running this file.
+
+import os
+import numpy as np
+import src.util as util
+import src.data.data_set as d
+import src.centers.center as center
+from src.data.data_set import DataSet
+
+# The directory of the saved folds.
+RBF_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "rbf-data")
+
+# The file extension of binary fold files.
+FOLD_FILE_EXTENSION = ".fold"
+
+# The data sets that make up a fold, along with the suffix of each data set's text file.
+FOLD_PARTS = {'train': "-train.txt", 'test': "-test.txt", 'center': "-centers.txt"}
+
+# The functions used to open the text files of each data set, by the name the files start with.
+TEXT_OPENERS = {
+    "abalone": d.get_abalone_data,
+    "car": d.get_car_data,
+    "segmentation": d.get_segmentation_data,
+    "forestfires": d.get_forest_fires_data,
+    "machine": d.get_machine_data,
+    "winequality": d.get_wine_data,
+}
+
+
+# Returns the name of the binary file of a fold, given the name of its folds (such as "car-kmeans") and its index.
+def get_fold_file_name(data_set_name, fold_i, rbf_data_dir=RBF_DATA_DIR):
+    return os.path.join(rbf_data_dir, data_set_name + "-fold-" + str(fold_i) + FOLD_FILE_EXTENSION)
+
+
+# Splits a data set into (@0) its metadata and (@1) its arrays (named with the given prefix), as stored in a fold file.
+# Columns other than the attributes and class are stored as arrays if they are numeric, and in the metadata otherwise.
+def get_data_set_parts(data_set, prefix):
+    if data_set.features is None:
+        raise ValueError("Only data sets with numeric attributes can be stored in a fold file")
+    meta = {'attr_cols': data_set.attr_cols, 'class_col': data_set.class_col, 'num_cols': data_set.num_cols,
+            'filename': data_set.filename, 'label_values': data_set.label_values.tolist(), 'object_columns': {}}
+    arrays = {prefix + "features": data_set.features, prefix + "labels": data_set.labels}
+    for col in range(data_set.num_cols):
+        if col == data_set.class_col or col in data_set.attr_cols:
+            continue
+        column = data_set.get_column(col)
+        if column.dtype == float:
+            arrays[prefix + "column-" + str(col)] = column
+        else:
+            meta['object_columns'][str(col)] = column.tolist()
+    return meta, arrays
+
+
+# Rebuilds a data set from the metadata and arrays made by 'get_data_set_parts'.
+def from_data_set_parts(meta, arrays, prefix):
+    num_rows = len(arrays[prefix + "labels"])
+    other_columns = {}
+    for col in range(meta['num_cols']):
+        if prefix + "column-" + str(col) in arrays:
+            other_columns[col] = arrays[prefix + "column-" + str(col)]
+        elif str(col) in meta['object_columns']:
+            column = np.empty(num_rows, dtype=object)
+            column[:] = meta['object_columns'][str(col)]
+            other_columns[col] = column
+    return DataSet.from_arrays(arrays[prefix + "features"], arrays[prefix + "labels"], meta['label_values'],
+                               meta['attr_cols'], meta['class_col'], meta['num_cols'], other_columns, meta['filename'])
+
+
+# Saves a fold (a dictionary with 'train', 'test', and 'center' data sets) to a binary file.
+def save_fold(file_name, fold):
+    meta = {}
+    arrays = {}
+    for part in FOLD_PARTS:
+        meta[part], part_arrays = get_data_set_parts(fold[part], part + "/")
+        arrays.update(part_arrays)
+    util.save_binary(file_name, meta, arrays)
+
+
+# Loads a fold saved by 'save_fold', as a dictionary with 'train', 'test', and 'center' data sets. The feature matrices
+# and labels are memory mapped copy on write, so the data sets can be changed without changing the file.
+def load_fold(file_name):
+    meta, arrays = util.load_binary(file_name)
+    return {part: from_data_set_parts(meta[part], arrays, part + "/") for part in FOLD_PARTS}
+
+
+# Converts the folds stored as text files in the directory to binary fold files. Each fold's text files are opened the
+# same way the driver opens them, so the binary fold holds exactly the data sets the driver would have used. Folds that
+# already have a binary file are skipped unless 'overwrite' is set, as are folds that cannot be converted or were not
+# saved completely (see center.is_fold_complete). Returns the names of the files that were written.
+def convert_text_folds(rbf_data_dir=RBF_DATA_DIR, overwrite=False):
+    manifest = center.load_manifest(rbf_data_dir)
+    written = []
+    for file_name in sorted(os.listdir(rbf_data_dir)):
+        if not file_name.endswith(FOLD_PARTS['center']):
+            continue
+        # Text fold files are named "<data set>-<algorithm>-fold-<i>-centers.txt".
+        fold_prefix = os.path.join(rbf_data_dir, file_name[:-len(FOLD_PARTS['center'])])
+        binary_file_name = fold_prefix + FOLD_FILE_EXTENSION
+        opener = TEXT_OPENERS.get(file_name.split("-")[0])
+        if opener is None or (os.path.exists(binary_file_name) and not overwrite):
+            continue
+        if not center.is_fold_complete(fold_prefix, manifest):
+            print("Skipping " + fold_prefix + ": the fold was not saved completely")
+            continue
+        try:
+            save_fold(binary_file_name, {part: opener(fold_prefix + suffix, False)
+                                         for part, suffix in FOLD_PARTS.items()})
+        except ValueError as error:
+            # A fold with a damaged file (such as one that was only partly written) is left as text.
+            print("Skipping " + fold_prefix + ": " + str(error))
+            continue
+        written.append(binary_file_name)
+    return written
+
+
+# Converts the text folds in /rbf-data/ to binary fold files.
+if __name__ == "__main__":
+    for converted_file_name in convert_text_folds():
+        print(converted_file_name)
@@ -0,0 +1,92 @@
+# normalizer.py
+# Z-score normalization that is fit on one set of data (such as a training fold) and then applied to any other data
+# (such as the test and validation sets), so that no information about the held out data leaks into the training data.
+
+import numpy as np
+
+# The default number of examples read at a time when fitting a normalizer to a data set.
+DEFAULT_CHUNK_SIZE = 8192
+
+
+# Normalizes attribute values to z-scores using statistics found in a single pass over the data. For each attribute,
+# the normalizer keeps the number of values seen, their mean, and the sum of their squared differences from the mean
+# (M2). These are updated one chunk of examples at a time, and the statistics of two normalizers (such as ones fit on
+# different chunks by different workers) can be merged exactly, so the data never has to be held in memory at once.
+#
+# Following DataSet.normalize_z_score, the "standard deviation" used to scale the values is sqrt(M2), rather than
+# sqrt(M2 / n). An attribute with no variation is normalized to all zeros.
+class Normalizer:
+
+    # Creates a normalizer for examples with num_attrs attributes, that has not seen any data yet.
+    def __init__(self, num_attrs):
+        self.count = 0
+        self.mean = np.zeros(num_attrs)
+        self.m2 = np.zeros(num_attrs)
+
+    # Creates a normalizer fit to a matrix of attribute values (one example per row).
+    @classmethod
+    def fit(cls, matrix: np.ndarray):
+        normalizer = cls(matrix.shape[1])
+        normalizer.update(matrix)
+        return normalizer
+
+    # Creates a normalizer fit to the attributes of a data set, reading chunk_size examples at a time.
+    @classmethod
+    def fit_data_set(cls, data_set, chunk_size=DEFAULT_CHUNK_SIZE):
+        normalizer = cls(len(data_set.attr_cols))
+        for chunk in data_set.iter_attr_chunks(chunk_size):
+            normalizer.update(chunk)
+        return normalizer
+
+    # Updates the statistics with a chunk of attribute values (one example per row).
+    def update(self, matrix: np.ndarray):
+        count = len(matrix)
+        if count == 0:
+            return
+        # The chunk's own mean and M2 are found for every attribute at once, and then merged into the statistics. The
+        # einsum sums each column's squared differences without making another temporary matrix for the squares.
+        mean = matrix.sum(axis=0) / count
+        centered = matrix - mean
+        m2 = np.einsum('ij,ij->j', centered, centered)
+        self.merge_statistics(count, mean, m2)
+
+    # Merges the statistics of another normalizer into this one, as if this normalizer had also seen its data.
+    def merge(self, other):
+        self.merge_statistics(other.count, other.mean, other.m2)
+
+    # Merges the count, mean, and M2 of another set of values into the statistics (Chan et al.'s parallel update).
+    def merge_statistics(self, count, mean, m2):
+        if count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = count, mean.copy(), m2.copy()
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    # Returns the value each attribute is divided by, sqrt(M2).
+    def get_scale(self):
+        return np.sqrt(self.m2)
+
+    # Returns a normalized copy of a matrix of attribute values (one example per row).
+    def transform(self, matrix: np.ndarray):
+        scale = self.get_scale()
+        normalized = np.array(matrix, dtype=float)
+        normalized -= self.mean
+        varies = scale != 0
+        normalized[:, varies] /= scale[varies]
+        normalized[:, ~varies] = 0
+        return normalized
+
+    # Returns a copy of the data set with its attributes normalized. The data set itself is not changed, which matters
+    # because the data sets of a fold can share their feature matrix with each other.
+    def transform_data_set(self, data_set):
+        normalized = data_set.copy()
+        if normalized.features is None:
+            raise ValueError("Only data sets with numeric attributes can be normalized")
+        normalized.features[:] = self.transform(data_set.get_attr_matrix())
+        normalized.clear_cache()
+        return normalized
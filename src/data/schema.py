@@ -0,0 +1,115 @@
+# schema.py
+# Schemas that describe how to read each of our data set files: the column types, the maps used to convert categorical
+# values to numbers, the number of header rows, and the attribute and class columns. A file is parsed straight into
+# typed numpy columns, a chunk of rows at a time, so the rows never need to be held as lists of strings and walked over
+# again for each conversion. The chunks can also be streamed one at a time for files that are too large to load.
+
+import csv
+import itertools
+import numpy as np
+
+# The default number of rows parsed at a time.
+DEFAULT_CHUNK_SIZE = 8192
+
+
+# Creates an object array holding the given values.
+def to_object_column(values: list):
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+# The schema of a data set file.
+class Schema:
+
+    # Creates a schema from:
+    # - attr_cols: a list of the indices of the attribute columns.
+    # - class_col: the index of the class column.
+    # - float_cols: (optional) a list of the indices of the columns that hold numbers, which are converted to floats.
+    #   Missing values (None or 'None') are kept as they are. Every other column is kept as strings.
+    # - value_maps: (optional) a dictionary mapping the index of a categorical column to a dictionary that maps each
+    #   original value to its new value. Values that are not in the map are kept as they are.
+    # - header_rows: (optional) the number of (non-empty) rows at the start of the file to skip.
+    def __init__(self, attr_cols: list, class_col: int, float_cols=None, value_maps=None, header_rows=0):
+        self.attr_cols = list(attr_cols)
+        self.class_col = class_col
+        self.float_cols = set(float_cols or [])
+        self.value_maps = value_maps or {}
+        self.header_rows = header_rows
+
+    # Parses a list of rows (lists of strings) into a list of typed numpy columns. Rows that are shorter than the others
+    # have their missing values filled with None.
+    def parse_columns(self, rows: list):
+        columns = []
+        for col, values in enumerate(itertools.zip_longest(*rows)):
+            value_map = self.value_maps.get(col)
+            if value_map is not None:
+                values = [value_map.get(value, value) for value in values]
+            values = list(values)
+            if col in self.float_cols:
+                if None not in values and 'None' not in values:
+                    # Every value can be converted in one step.
+                    columns.append(np.array(values, dtype=float))
+                    continue
+                # With missing values, the column has to stay an object array.
+                values = [value if value is None or value == 'None' else float(value) for value in values]
+            columns.append(to_object_column(values))
+        return columns
+
+    # Reads the file a chunk of (at most chunk_size) rows at a time, skipping empty rows and the header rows. Yields a
+    # list of typed numpy columns for each chunk (see 'parse_columns').
+    def iter_column_chunks(self, file_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        with open(file_name) as file:
+            rows = (row for row in csv.reader(file) if row)
+            rows = itertools.islice(rows, self.header_rows, None)
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield self.parse_columns(chunk)
+
+    # Reads the whole file. Returns (@0) its list of typed numpy columns and (@1) its number of rows.
+    def read_columns(self, file_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        chunks = list(self.iter_column_chunks(file_name, chunk_size))
+        if len(chunks) == 1:
+            return chunks[0], len(chunks[0][0])
+        num_rows = sum(len(chunk[0]) for chunk in chunks)
+        num_cols = max([len(chunk) for chunk in chunks] + [0])
+        columns = []
+        for col in range(num_cols):
+            parts = []
+            for chunk in chunks:
+                # A chunk made of only shorter rows has no values for this column.
+                parts.append(chunk[col] if col < len(chunk) else np.full(len(chunk[0]), None, dtype=object))
+            if not all(part.dtype == float for part in parts):
+                parts = [part.astype(object) for part in parts]
+            columns.append(np.concatenate(parts))
+        return columns, num_rows
+
+
+# The value maps of the categorical columns of the car and forest fires data sets.
+CAR_BUYING_MAP = {'low': 0, 'med': 1, 'high': 2, 'vhigh': 3}
+CAR_DOORS_MAP = {'2': 2, '3': 3, '4': 4, '5more': 5}
+CAR_PERSONS_MAP = {'2': 2, '4': 4, 'more': 5}
+CAR_LUG_BOOT_MAP = {'small': 0, 'med': 1, 'big': 2}
+CAR_SAFETY_MAP = {'low': 0, 'med': 1, 'high': 2}
+MONTH_MAP = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10,
+             'nov': 11, 'dec': 12}
+DAY_MAP = {'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6, 'sun': 7}
+
+# The schemas of each data set. Note that the header rows are also skipped in the fold files saved for the RBFNN, since
+# those are read with the same schemas.
+ABALONE_SCHEMA = Schema(list(range(1, 8)), 8, float_cols=range(1, 9))
+CAR_SCHEMA = Schema(list(range(0, 6)), 6, float_cols=range(0, 6),
+                    value_maps={0: CAR_BUYING_MAP, 1: CAR_BUYING_MAP, 2: CAR_DOORS_MAP, 3: CAR_PERSONS_MAP,
+                                4: CAR_LUG_BOOT_MAP, 5: CAR_SAFETY_MAP})
+FOREST_FIRES_SCHEMA = Schema(list(range(0, 12)), 12, float_cols=range(0, 13), value_maps={2: MONTH_MAP, 3: DAY_MAP},
+                             header_rows=1)
+# Machine has another final column but we probably want to exclude it.
+MACHINE_SCHEMA = Schema(list(range(2, 8)), 8, float_cols=range(2, 9))
+# Segmentation attribute columns are all numeric
+#  * Attribute #7, vedge-sd, removed because it is a standard deviation.
+#  * Attribute #9, hedge-sd, removed for same reason.
+SEGMENTATION_ATTR_COLS = [1, 2, 3, 4, 5, 6, 8, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+SEGMENTATION_SCHEMA = Schema(SEGMENTATION_ATTR_COLS, 0, float_cols=SEGMENTATION_ATTR_COLS, header_rows=5)
+WINE_SCHEMA = Schema(list(range(0, 11)), 11, float_cols=range(0, 12))
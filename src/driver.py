@@ -2,200 +2,348 @@
 # File for running our experimental design.
 
 import src.data.data_set as d
-from src.networks.rbfnn import RBFNN
+import src.data.fold_store as fold_store
+import src.centers.center as center
+from src.networks.rbfnn import RBFNN, GRADIENT_DESCENT, LEAST_SQUARES
 from src.networks.mfnn import MFNN
+import src.networks.optimizers as optimizers
+import src.util as util
+from src.data.normalizer import Normalizer
 import math
+import multiprocessing
+import os
+import random
+import numpy as np
+
+# The default number of worker processes that cross validation jobs are run on.
+NUM_WORKERS = os.cpu_count() or 1
+
+# The data sets that the jobs running in this process make their folds from (see SharedFold), by key. Each is a
+# (data set, fold assignment) tuple.
+worker_data_sets = {}
+
+
+# A reference to a fold of a data set that is shared with the workers, which stands in for the fold in a job's
+# arguments. The data set and its fold assignment are sent to each worker once, when it starts (see 'init_worker'),
+# so a job only holds the data set's key and the index of its fold rather than a copy of the whole data set.
+class SharedFold:
+
+    # Creates a reference to fold fold_i of the data set shared under the key.
+    def __init__(self, key, fold_i):
+        self.key = key
+        self.fold_i = fold_i
+
+    # Returns the fold, made from the data set shared with this process.
+    def get_fold(self):
+        data_set, assignment = worker_data_sets[self.key]
+        return d.Fold(data_set, assignment, self.fold_i)
+
+
+# Prepares a worker process: it computes in the given float type (see util.get_float_dtype), and gets the data sets
+# that the jobs' folds are made from (see SharedFold).
+def init_worker(float_dtype, data_sets):
+    util.set_float_dtype(float_dtype)
+    worker_data_sets.update(data_sets)
 
 
 # Gets the folds for running rbf using a certain algorithm, as these folds are stored in a file so we do not have to
-# rerun our center algs.
-def get_rbf_data(data_set_name, data_opener):
-    data_set_name = "../rbf-data/" + data_set_name
+# rerun our center algs. The data set name is the name of the original data set followed by the name of the center
+# algorithm (such as "car-kmeans"). The folds are read from the same directory centers/center.py saves them to, and
+# those that have been converted to binary fold files (see fold_store.py) are loaded from those instead of the text
+# files. Raises a ValueError if any fold was not saved completely (see center.is_fold_complete), unless
+# generate_missing is set, in which case the fold is made from the original data set instead (with its centers taken
+# from, or added to, the center cache). Only folds of data sets the algorithm runs on (see center.ALGORITHM_DATA_SETS)
+# are made. Note that folds made here are not saved, so run centers/center.py to fill in the rbf-data files instead.
+def get_rbf_data(data_set_name, data_opener, generate_missing=False):
+    original_name, center_alg_name = data_set_name.rsplit("-", 1)
+    manifest = center.load_manifest(center.RBF_DATA_DIR)
     folds = []
     # Get set of files for each folds.
-    for fold_i in range(10):
-        # train, test, and center data in separate files.
-        train_data = data_opener(data_set_name + "-fold-" + str(fold_i) + "-train.txt", False)
-        test_data = data_opener(data_set_name + "-fold-" + str(fold_i) + "-test.txt", False)
-        center_data = data_opener(data_set_name + "-fold-" + str(fold_i) + "-centers.txt", False)
+    for fold_i in range(center.NUM_FOLDS):
+        file_name = center.get_fold_file_name(original_name, center_alg_name, fold_i)
+        if os.path.exists(file_name + fold_store.FOLD_FILE_EXTENSION):
+            folds.append(fold_store.load_fold(file_name + fold_store.FOLD_FILE_EXTENSION))
+            continue
+        if not center.is_fold_complete(file_name, manifest):
+            if not generate_missing:
+                raise ValueError("The files of fold " + str(fold_i) + " of " + data_set_name + " are missing or "
+                                 "incomplete, run centers/center.py to make them")
+            if original_name not in center.ALGORITHM_DATA_SETS.get(center_alg_name, []):
+                raise ValueError("The " + center_alg_name + " center algorithm is not run on " + original_name)
+            test_data, train_data, center_data = center.make_fold(center_alg_name, original_name, fold_i)
+        else:
+            # train, test, and center data in separate files.
+            train_data = data_opener(file_name + "-train.txt", False)
+            test_data = data_opener(file_name + "-test.txt", False)
+            center_data = data_opener(file_name + "-centers.txt", False)
         folds.append({'train': train_data, 'test': test_data, 'center': center_data})
     return folds
 
 
-# Runs the RBFNN using cross validation on specific classification data set with the given parameters.
-def run_rbfnn_classification(data_set_name, data_opener, classes, learning_rate, convergence_size):
-    print(data_set_name)
-    # Standard parameters to run on the data_set
-    num_folds = 10
-    folds = get_rbf_data(data_set_name, data_opener)
-    fold_average = []
-    # Iterate through each fold in cross validation..
-    for fold_i, fold in enumerate(folds):
-        test = fold['test']
-        # partition the training part of the fold into a true training set AND a small validation set.
-        train, validation = fold['train'].partition(.8)
-        center = fold['center']
-        size_inputs = len(test.attr_cols)
-        # Create the network.
-        rbfnn = RBFNN(center, train, validation, size_inputs, learning_rate, convergence_size, classes)
-        # Train the network.
-        rbfnn.train()
-        # Get the accuracy on the test set.
-        fold_accuracy = rbfnn.get_accuracy(test)
-        fold_average.append(fold_accuracy)
-        print("\t Fold: " + str(fold_i + 1) + " - Accuracy: " + str(fold_accuracy))
-    # Show average accuracy across all folds.
-    print("Average Accuracy: " + str(sum(fold_average) / num_folds))
-
-
-# Runs the RBFNN using cross validation on specific regression data set with the given parameters.
-def run_rbfnn_regression(data_set_name, data_opener, learning_rate, convergence_size):
-    print(data_set_name)
-    # Standard parameters to run on the data_set
-    num_folds = 10
+# Seeds both random number generators with the given seed (or a random one if it is None), and returns the seed. The
+# data sets are shuffled and split into folds with these generators, so seeding them before any data is loaded makes
+# the folds (as well as the jobs, see 'run_experiments') the same in every run with the same seed.
+def seed_random(seed=None):
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    random.seed(seed)
+    np.random.seed(seed)
+    return seed
+
+
+# Runs a single job, a (seed, function, args) tuple, and returns its result. Any SharedFold in the args is replaced by
+# its fold. Both random number generators are seeded first, so that every job gets its own random numbers no matter
+# which worker process it runs in (forked workers would otherwise all start from the same state).
+def run_job(job):
+    seed, function, args = job
+    args = [arg.get_fold() if isinstance(arg, SharedFold) else arg for arg in args]
+    random.seed(seed)
+    np.random.seed(seed)
+    return function(*args)
+
+
+# Runs the jobs of every experiment on a pool of num_workers processes, and prints the results of each experiment in
+# order. An experiment is the cross validation of one network on one data set, stored as a dictionary with:
+# - 'lines': the lines printed before its results.
+# - 'metric': the name of the metric its jobs return ("Accuracy" or "Error").
+# - 'jobs': a (function, args) tuple for each fold, where the function returns the metric on the fold.
+# - 'shared': (optional) the (data set, fold assignment) tuples that the SharedFolds in its jobs' args refer to, by key.
+# Each job's seed is the given seed (or a random one) plus the job's position, so the jobs are repeated exactly in a run
+# with the same seed. The folds themselves are only the same if the data was loaded after seeding with 'seed_random'.
+# The workers compute in the same float type as this process (see util.get_float_dtype), and each is sent the shared
+# data sets once, when it starts.
+def run_experiments(experiments, num_workers=NUM_WORKERS, seed=None):
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    jobs = [job for experiment in experiments for job in experiment['jobs']]
+    seeded_jobs = [((seed + job_i) % 2 ** 32, function, args) for job_i, (function, args) in enumerate(jobs)]
+    data_sets = {key: shared for experiment in experiments for key, shared in experiment.get('shared', {}).items()}
+    if num_workers > 1:
+        with multiprocessing.Pool(num_workers, init_worker, (util.get_float_dtype(), data_sets)) as pool:
+            # The results come back in order, so each fold is printed as soon as it (and every fold before it) is done.
+            print_experiments(experiments, pool.imap(run_job, seeded_jobs))
+    else:
+        worker_data_sets.update(data_sets)
+        try:
+            print_experiments(experiments, map(run_job, seeded_jobs))
+        finally:
+            for key in data_sets:
+                worker_data_sets.pop(key, None)
+
+
+# Prints the lines of each experiment, followed by its fold results (taken in order from 'results') and their average.
+def print_experiments(experiments, results):
+    for experiment in experiments:
+        for line in experiment['lines']:
+            print(line)
+        metric = experiment['metric']
+        fold_average = []
+        for fold_i in range(len(experiment['jobs'])):
+            fold_average.append(next(results))
+            print("\t Fold: " + str(fold_i + 1) + " - " + metric + ": " + str(fold_average[-1]))
+        # Show average metric across all folds.
+        print("Average " + metric + ": " + str(sum(fold_average) / len(fold_average)))
+
+
+# Trains an RBFNN on one fold and returns its accuracy on the fold's test set, or its error if classes is None. The
+# optimizer is the name of the optimizer used by gradient descent (see optimizers.py), and the momentum is used by SGD
+# and Nesterov.
+def train_rbfnn_fold(fold, classes, learning_rate, convergence_size, fit_mode=GRADIENT_DESCENT,
+                     optimizer=optimizers.SGD, momentum=0):
+    test = fold['test']
+    # partition the training part of the fold into a true training set AND a small validation set.
+    train, validation = fold['train'].partition(.8)
+    size_inputs = len(test.attr_cols)
+    # Create and train the network.
+    rbfnn = RBFNN(fold['center'], train, validation, size_inputs, learning_rate, convergence_size, classes, fit_mode,
+                  optimizer=optimizer, momentum=momentum)
+    rbfnn.train()
+    if classes is None:
+        return rbfnn.get_error(test)
+    return rbfnn.get_accuracy(test)
+
+
+# Trains an MFNN with the given layers on one fold and returns its accuracy on the fold's test set, or its error if
+# classes is None. If normalize_fold is set, the attributes are normalized with statistics fit on the training set only,
+# so nothing about the validation or test sets leaks into training. The optimizer is the name of the optimizer used to
+# update the weights (see optimizers.py).
+def train_mfnn_fold(fold, layers, classes, learning_rate, momentum, convergence_size, mini_batch_size,
+                    normalize_fold=False, optimizer=optimizers.SGD):
+    test = fold['test']
+    # Partition the training part of the fold into a true training set AND a small validation set.
+    train, validation = fold['train'].partition(.8)
+    if normalize_fold:
+        normalizer = Normalizer.fit_data_set(train)
+        train, validation, test = [normalizer.transform_data_set(data) for data in (train, validation, test)]
+    # Create and train the network.
+    mfnn = MFNN(train, validation, layers, learning_rate, momentum, convergence_size, classes, mini_batch_size,
+                optimizer)
+    mfnn.train()
+    if classes is None:
+        return mfnn.get_error(test)
+    return mfnn.get_accuracy(test)
+
+
+# Returns the experiment (see run_experiments) for cross validation of the RBFNN on a data set with stored folds. The
+# classes are None for regression.
+def get_rbfnn_experiment(data_set_name, data_opener, classes, learning_rate, convergence_size,
+                         fit_mode=GRADIENT_DESCENT, optimizer=optimizers.SGD, momentum=0):
     folds = get_rbf_data(data_set_name, data_opener)
-    fold_average = []
-    # Iterate through each fold in cross validation.
-    for fold_i, fold in enumerate(folds):
-        test = fold['test']
-        # partition the training part of the fold into a true training AND a small validation set.
-        train, validation = fold['train'].partition(.8)
-        center = fold['center']
-        size_inputs = len(test.attr_cols)
-        # Create the newtork.
-        rbfnn = RBFNN(center, train, validation, size_inputs, learning_rate, convergence_size)
-        # Train the network.
-        rbfnn.train()
-        # Get the accuracy on the test set.
-        fold_error = rbfnn.get_error(test)
-        fold_average.append(fold_error)
-        print("\t Fold: " + str(fold_i + 1) + " - Error: " + str(fold_error))
-    # Show average accuracy across all folds.
-    print("Average Error: " + str(sum(fold_average) / num_folds))
-
-
-# Runs the MFNN using cross validation on specific classification data set with the given parameters.
-def run_mfnn_classification(data_set, classes, learning_rate, momentum, convergence_size):
-    print(data_set.filename)
+    jobs = [(train_rbfnn_fold, (fold, classes, learning_rate, convergence_size, fit_mode, optimizer, momentum))
+            for fold in folds]
+    return {'lines': [data_set_name], 'metric': "Error" if classes is None else "Accuracy", 'jobs': jobs}
+
+
+# Returns the RBFNN experiments (see get_rbfnn_experiment) for each tuple of arguments. An experiment whose folds cannot
+# be loaded (such as one with a fold that was not saved completely) is reported and skipped, so the others still run.
+def get_rbfnn_experiments(experiment_args):
+    experiments = []
+    for args in experiment_args:
+        try:
+            experiments.append(get_rbfnn_experiment(*args))
+        except ValueError as error:
+            print("Skipping " + args[0] + ": " + str(error))
+    return experiments
+
+
+# Returns the experiments (see run_experiments) for cross validation of MFNNs with 0, 1, and 2 hidden layers of the
+# given size on a data set. The classes are None for regression. If normalize_folds is set, each fold is normalized
+# with statistics fit on its own training set (see train_mfnn_fold), so the data set should not be normalized already.
+# The data set is shared with the workers (see SharedFold), keyed by its id, so the jobs only hold the fold indexes.
+def get_mfnn_experiments(data_set, classes, size_hidden_layers, learning_rate, momentum, convergence_size,
+                         mini_batch_size, normalize_folds=False, optimizer=optimizers.SGD):
     # Standard parameters to run on the data_set
     num_folds = 10
     size_inputs = len(data_set.attr_cols)
+    size_outputs = 1 if classes is None else len(classes)
+    # The classification folds are stratified, so each test set has about the same mix of classes.
+    assignment = data_set.get_fold_assignment(num_folds, stratified=classes is not None)
+    shared = {id(data_set): (data_set, assignment)}
+    experiments = []
     # Want to examine 0, 1, and 2 hidden layers.
-    num_hidden_layers = [0, 1, 2]
-    size_outputs = len(classes)
-    # The size of the hidden layers is the average between the size of inputs and outputs.
-    size_hidden_layers = math.floor((size_inputs + size_outputs) / 2)
-    folds = data_set.validation_folds(num_folds)
-    # Iterate over all the number of hidden layers we need to try.
-    for hidden_layer in num_hidden_layers:
+    for hidden_layers in [0, 1, 2]:
         # Setup the layer sizes into a list.
-        layers = [size_inputs] + ([size_hidden_layers] * hidden_layer) + [size_outputs]
-        print("Network " + str(layers))
-        fold_average = []
-        # Iterate through each fold in cross validation.
-        for fold_i, fold in enumerate(folds):
-            test = fold['test']
-            # partion the training part of the fold into a true training set AND a small validation set.
-            train, validation = fold['train'].partition(.8)
-            print(layers)
-            # Create the network.
-            mfnn = MFNN(train, validation, layers, learning_rate, momentum, convergence_size, classes)
-            # Train the network/
-            mfnn.train()
-            # Get the accuracy on the test set.
-            fold_average.append(mfnn.get_accuracy(test))
-            print("\t Fold: " + str(fold_i+1) + " - Accuracy: " + str(mfnn.get_accuracy(test)))
-        print("Average Accuracy: " + str(sum(fold_average) / num_folds))
-
-
-# Runs the MFNN using cross validation on specific regression data set with the given parameters.
-def run_mfnn_regression(data_set, learning_rate, momentum, convergence_size):
-    print(data_set.filename)
-    num_folds = 10
-    size_inputs = len(data_set.attr_cols)
-    # Want to examine 0, 1, and 2 hidden layers.
-    num_hidden_layers = [0, 1, 2]
-    # Size of the hidden layers (num nodes) is the average of the input and output size.
-    size_hidden_layers = math.floor((size_inputs + 1) / 2)
+        layers = [size_inputs] + ([size_hidden_layers] * hidden_layers) + [size_outputs]
+        jobs = [(train_mfnn_fold, (SharedFold(id(data_set), fold_i), layers, classes, learning_rate, momentum,
+                                   convergence_size, mini_batch_size, normalize_folds, optimizer))
+                for fold_i in range(num_folds)]
+        experiments.append({'lines': ["Network " + str(layers)], 'metric': "Error" if classes is None else "Accuracy",
+                            'jobs': jobs, 'shared': shared})
+    experiments[0]['lines'].insert(0, data_set.filename)
+    return experiments
 
-    folds = data_set.validation_folds(num_folds)
-    # Iterate over all the number of hidden layers we need to try.
-    for hidden_layers in num_hidden_layers:
-        # Setup the layer sizes into a list.
-        layers = [size_hidden_layers] * (hidden_layers + 2)
-        layers[0], layers[-1] = size_inputs, 1
-        print("Network " + str(layers))
-        fold_average = []
-        # Iterate through each fold in cross validation.
-        for fold_i, fold in enumerate(folds):
-            test = fold['test']
-            # Partion the training part of the fold into a true training set AND a small validation set.
-            train, validation = fold['train'].partition(.8)
-            # Create the network.
-            mfnn = MFNN(train, validation, layers, learning_rate, momentum, convergence_size, None)
-            # Train the network.
-            mfnn.train()
-            # Get the accuracy on the test.
-            fold_average.append(mfnn.get_error(test))
-            print("\t Fold: " + str(fold_i+1) + " - Error: " + str(mfnn.get_error(test)))
-        print("Average Error: " + str(sum(fold_average)/num_folds))
-
-
-# Runs the RBFNN on each classification data set, using the specified algorithm for getting center vectors.
-def run_rbfnn_classification_data_sets(center_alg_name):
-    abalone_classes = [float(i) for i in range(1, 30)]
-    car_classes = ["unacc", "acc", "good", "vgood"]
-    segmentation_classes = ["BRICKFACE", "SKY", "FOLIAGE", "CEMENT", "WINDOW", "PATH", "GRASS"]
 
-    run_rbfnn_classification("abalone-" + center_alg_name, d.get_abalone_data, abalone_classes, 1, 10)
-    run_rbfnn_classification("car-" + center_alg_name, d.get_car_data, car_classes, 1, 10)
-    run_rbfnn_classification("segmentation-" + center_alg_name, d.get_segmentation_data, segmentation_classes, 1, 30)
+# Runs the RBFNN using cross validation on specific classification data set with the given parameters. The random
+# number generators are seeded (see 'seed_random') before the folds are loaded.
+def run_rbfnn_classification(data_set_name, data_opener, classes, learning_rate, convergence_size,
+                             optimizer=optimizers.SGD, momentum=0, num_workers=NUM_WORKERS, seed=None):
+    seed = seed_random(seed)
+    run_experiments([get_rbfnn_experiment(data_set_name, data_opener, classes, learning_rate, convergence_size,
+                                          optimizer=optimizer, momentum=momentum)], num_workers, seed)
+
 
+# Runs the RBFNN using cross validation on specific regression data set with the given parameters. The random number
+# generators are seeded (see 'seed_random') before the folds are loaded.
+def run_rbfnn_regression(data_set_name, data_opener, learning_rate, convergence_size, fit_mode=GRADIENT_DESCENT,
+                         optimizer=optimizers.SGD, momentum=0, num_workers=NUM_WORKERS, seed=None):
+    seed = seed_random(seed)
+    run_experiments([get_rbfnn_experiment(data_set_name, data_opener, None, learning_rate, convergence_size,
+                                          fit_mode, optimizer, momentum)], num_workers, seed)
 
-# Runs the RBFNN on each regression data set, using the specified algorithm for getting center vectors.
-def run_rbfnn_regression_data_sets(center_alg_name):
-    run_rbfnn_regression("forestfires-" + center_alg_name, d.get_forest_fires_data, 1, 100)
-    run_rbfnn_regression("machine-" + center_alg_name, d.get_machine_data, .1, 100)
-    run_rbfnn_regression("winequality-" + center_alg_name, d.get_wine_data, 1, 20)
+
+# Runs the MFNN using cross validation on specific classification data set with the given parameters. The data set is
+# loaded by the caller, so for the folds to be repeatable it should be loaded after calling 'seed_random' with the same
+# seed.
+def run_mfnn_classification(data_set, classes, learning_rate, momentum, convergence_size, mini_batch_size=4,
+                            optimizer=optimizers.SGD, num_workers=NUM_WORKERS, seed=None):
+    # The size of the hidden layers is the average between the size of inputs and outputs.
+    size_hidden_layers = math.floor((len(data_set.attr_cols) + len(classes)) / 2)
+    run_experiments(get_mfnn_experiments(data_set, classes, size_hidden_layers, learning_rate, momentum,
+                                         convergence_size, mini_batch_size, optimizer=optimizer), num_workers, seed)
+
+
+# Runs the MFNN using cross validation on specific regression data set with the given parameters. As with
+# 'run_mfnn_classification', the data set should be loaded after seeding for the folds to be repeatable.
+def run_mfnn_regression(data_set, learning_rate, momentum, convergence_size, mini_batch_size=4,
+                        optimizer=optimizers.SGD, num_workers=NUM_WORKERS, seed=None):
+    # Size of the hidden layers (num nodes) is the average of the input and output size.
+    size_hidden_layers = math.floor((len(data_set.attr_cols) + 1) / 2)
+    run_experiments(get_mfnn_experiments(data_set, None, size_hidden_layers, learning_rate, momentum,
+                                         convergence_size, mini_batch_size, optimizer=optimizer), num_workers, seed)
 
 
-# Runs the MFNN on each classification data set.
-def run_mfnn_classification_data_sets():
-    abalone_data = d.get_abalone_data("../data/abalone.data")
+# Returns the RBFNN experiments on each classification data set the specified algorithm for getting center vectors is
+# run on (see center.ALGORITHM_DATA_SETS), skipping those whose folds cannot be loaded.
+def get_rbfnn_classification_experiments(center_alg_name):
     abalone_classes = [float(i) for i in range(1, 30)]
-    car_data = d.get_car_data("../data/car.data")
     car_classes = ["unacc", "acc", "good", "vgood"]
-    segmentation_data = d.get_segmentation_data("../data/segmentation.data")
     segmentation_classes = ["BRICKFACE", "SKY", "FOLIAGE", "CEMENT", "WINDOW", "PATH", "GRASS"]
+    # The (data set name, opener, classes, learning rate, convergence size) of each experiment.
+    settings = [("abalone", d.get_abalone_data, abalone_classes, 1, 10), ("car", d.get_car_data, car_classes, 1, 10),
+                ("segmentation", d.get_segmentation_data, segmentation_classes, 1, 30)]
+    return get_rbfnn_experiments([(name + "-" + center_alg_name, opener, classes, learning_rate, convergence_size)
+                                  for name, opener, classes, learning_rate, convergence_size in settings
+                                  if name in center.ALGORITHM_DATA_SETS[center_alg_name]])
 
-    run_mfnn_classification(abalone_data, abalone_classes, 1, .1, 100)
-    run_mfnn_classification(car_data, car_classes, 1, .1, 100)
-    run_mfnn_classification(segmentation_data, segmentation_classes, 1, .1, 100)
 
+# Returns the RBFNN experiments on each regression data set the specified algorithm for getting center vectors is run on
+# (see center.ALGORITHM_DATA_SETS), skipping those whose folds cannot be loaded. Edited-KNN needs classes, so it has
+# none.
+def get_rbfnn_regression_experiments(center_alg_name):
+    # The (data set name, opener, learning rate, convergence size, fit mode) of each experiment. The first two converge
+    # slowly with gradient descent, so their output weights are solved for directly.
+    settings = [("forestfires", d.get_forest_fires_data, 1, 100, LEAST_SQUARES),
+                ("machine", d.get_machine_data, .1, 100, LEAST_SQUARES),
+                ("winequality", d.get_wine_data, 1, 20, GRADIENT_DESCENT)]
+    return get_rbfnn_experiments([(name + "-" + center_alg_name, opener, None, learning_rate, convergence_size,
+                                   fit_mode) for name, opener, learning_rate, convergence_size, fit_mode in settings
+                                  if name in center.ALGORITHM_DATA_SETS[center_alg_name]])
 
-# Runs the MFNN on each regression data set.
-def run_mfnn_regression_data_sets():
-    forest_fires_data = d.get_forest_fires_data("../data/forestfires.data")
-    machine_data = d.get_machine_data("../data/machine.data")
-    wine_data = d.get_wine_data("../data/winequality.data")
 
-    run_mfnn_regression(forest_fires_data, 1, 0.1, 100)
-    run_mfnn_regression(machine_data, 1, 0.1, 100)
-    run_mfnn_regression(wine_data, 1, 0.1, 100)
+# Returns the MFNN experiments on each classification data set. The data sets are normalized per fold.
+def get_mfnn_classification_experiments():
+    experiments = []
+    data_sets = [(d.get_abalone_data(os.path.join(center.DATA_DIR, "abalone.data"), False),
+                  [float(i) for i in range(1, 30)]),
+                 (d.get_car_data(os.path.join(center.DATA_DIR, "car.data"), False), ["unacc", "acc", "good", "vgood"]),
+                 (d.get_segmentation_data(os.path.join(center.DATA_DIR, "segmentation.data"), False),
+                  ["BRICKFACE", "SKY", "FOLIAGE", "CEMENT", "WINDOW", "PATH", "GRASS"])]
+    for data_set, classes in data_sets:
+        # The size of the hidden layers is the average between the size of inputs and outputs.
+        size_hidden_layers = math.floor((len(data_set.attr_cols) + len(classes)) / 2)
+        experiments += get_mfnn_experiments(data_set, classes, size_hidden_layers, 1, .1, 100, 4, True)
+    return experiments
 
 
-# Runs each set of regression and classification for the different data sets and configurations.
-def main():
-    run_mfnn_regression_data_sets()
-    run_mfnn_classification_data_sets()
+# Returns the MFNN experiments on each regression data set. The data sets are normalized per fold.
+def get_mfnn_regression_experiments():
+    experiments = []
+    data_sets = [d.get_forest_fires_data(os.path.join(center.DATA_DIR, "forestfires.data"), False),
+                 d.get_machine_data(os.path.join(center.DATA_DIR, "machine.data"), False),
+                 d.get_wine_data(os.path.join(center.DATA_DIR, "winequality.data"), False)]
+    for data_set in data_sets:
+        # Size of the hidden layers (num nodes) is the average of the input and output size.
+        size_hidden_layers = math.floor((len(data_set.attr_cols) + 1) / 2)
+        experiments += get_mfnn_experiments(data_set, None, size_hidden_layers, 1, 0.1, 100, 4, True)
+    return experiments
 
-    run_rbfnn_regression_data_sets("eknn")
-    run_rbfnn_classification_data_sets("eknn")
 
-    run_rbfnn_regression_data_sets("kmeans")
-    run_rbfnn_classification_data_sets("kmeans")
+# Runs each set of regression and classification for the different data sets and configurations. Every fold of every
+# experiment is an independent job, so they are all run on one pool of worker processes. The random number generators
+# are seeded (see 'seed_random') before any data set is loaded, and the seed is printed, so running again with that
+# seed gives the same folds and jobs. If float_dtype is given (float32 or float64), every network computes in that
+# float type.
+def main(num_workers=NUM_WORKERS, seed=None, float_dtype=None):
+    if float_dtype is not None:
+        util.set_float_dtype(float_dtype)
+    seed = seed_random(seed)
+    print("Seed: " + str(seed))
+    experiments = get_mfnn_regression_experiments() + get_mfnn_classification_experiments()
+    for center_alg_name in ["eknn", "kmeans", "pam"]:
+        experiments += get_rbfnn_regression_experiments(center_alg_name)
+        experiments += get_rbfnn_classification_experiments(center_alg_name)
+    run_experiments(experiments, num_workers, seed)
 
-    run_rbfnn_regression_data_sets("pam")
-    run_rbfnn_classification_data_sets("pam")
 
-main()
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,77 @@
 # Defines the mutli-layer feedforward neural network implementation.
 
 import numpy as np
-import random
 import math
 import src.activation_functions as af
+import src.networks.model_file as model_file
+import src.networks.optimizers as optimizers
+import src.util as util
 
 # The amount each new average metric needs to be better than the old average metric for the training process to
 # continue.
 CONVERGENCE_THRESHOLD = .0001
 
+# The number of examples in each mini batch, unless a different size is given to the network.
+DEFAULT_MINI_BATCH_SIZE = 4
+
+# The activation of the bias node of each layer (other than the output layer).
+BIAS_ACTIVATION = af.sigmoid(1)
+
+# The model type stored in the files that MFNNs are saved to (see model_file.py).
+MODEL_TYPE = "mfnn"
+
+
+# The buffers used by an MFNN while running and training, which are allocated once and then reused for every batch so
+# that the forward and backward passes don't allocate any new arrays. The batch buffers store a batch of examples one
+# per column (rather than one per row), so that each layer's matrix product can be written straight into a contiguous
+# buffer. The buffers use the network's float type. They hold:
+# - inputs and activations: for each layer (except the output layer), the activations of a batch of examples with one
+#   row per node plus a final row for the bias node. The bias row always holds BIAS_ACTIVATION, so the bias node is
+#   never added to or removed from the activations. The output layer's activations have no bias row.
+# - deltas and derivatives: for each layer after the input layer, the deltas of a batch of examples (one row per node
+#   other than the bias node) and room for the sigmoid derivative of the activations.
+# - expected: the expected outputs of a batch of examples (one row per output node).
+# - gradients: matrices shaped like the weights, where each mini batch's change in weights is found.
+class Workspace:
+
+    # Creates the buffers for a network with the given layer sizes and for batches of up to num_rows examples, holding
+    # values of the given float type.
+    def __init__(self, layer_size: list, num_rows: int, dtype=np.float64):
+        self.layer_size = layer_size
+        self.dtype = dtype
+        weight_shapes = [(layer_size[i], layer_size[i - 1] + 1) for i in range(1, len(layer_size))]
+        self.gradients = [np.empty(shape, dtype=dtype) for shape in weight_shapes]
+        # The number of rows in each layer's activation buffer, and in its delta buffer.
+        self.activation_rows = [size + 1 for size in layer_size[:-1]] + [layer_size[-1]]
+        self.delta_rows = layer_size[1:]
+        self.capacity = 0
+        self.num_rows = 0
+        self.set_num_rows(num_rows)
+
+    # Sets the number of examples in the current batch. The batch buffers are views of the start of flat storage, so
+    # that they are contiguous for any number of examples, and the storage is only reallocated when it needs to grow.
+    def set_num_rows(self, num_rows: int):
+        if num_rows == self.num_rows:
+            return
+        if num_rows > self.capacity:
+            self.capacity = num_rows
+            self.activation_storage = [np.empty(rows * num_rows, dtype=self.dtype) for rows in self.activation_rows]
+            self.delta_storage = [np.empty(rows * num_rows, dtype=self.dtype) for rows in self.delta_rows]
+            self.derivative_storage = [np.empty(rows * num_rows, dtype=self.dtype) for rows in self.delta_rows]
+            self.expected_storage = np.empty(self.layer_size[-1] * num_rows, dtype=self.dtype)
+        self.num_rows = num_rows
+        self.activations = [storage[:rows * num_rows].reshape(rows, num_rows)
+                            for rows, storage in zip(self.activation_rows, self.activation_storage)]
+        self.deltas = [storage[:rows * num_rows].reshape(rows, num_rows)
+                       for rows, storage in zip(self.delta_rows, self.delta_storage)]
+        self.derivatives = [storage[:rows * num_rows].reshape(rows, num_rows)
+                            for rows, storage in zip(self.delta_rows, self.derivative_storage)]
+        self.expected = self.expected_storage[:self.layer_size[-1] * num_rows].reshape(self.layer_size[-1], num_rows)
+        # The views moved within the storage, so the bias rows have to be filled in again.
+        for activation in self.activations[:-1]:
+            activation[-1] = BIAS_ACTIVATION
+        self.inputs = self.activations[0][:-1]
+
 
 # The class for creating MFNN objects.
 class MFNN:
@@ -22,7 +85,13 @@ class MFNN:
     # - momentum: float specifying how much momentum to be used.
     # - convergence_size: how many previous epochs to evaluate when determining convergence.
     # - classes: the class values for the data, if a classification problem.
-    def __init__(self, training_data, validation_data, layer_size, learning_rate, momentum, convergence_size, classes=None):
+    # - mini_batch_size: (optional) how many examples are trained on together in each mini batch.
+    # - optimizer: (optional) the name of the optimizer used to update the weights, or an Optimizer object (see
+    #   optimizers.py). The named optimizers use the learning rate, and SGD and Nesterov also use the momentum.
+    # - dtype: (optional) the float type the network computes in, float32 or float64. By default, the global float type
+    #   (see util.get_float_dtype).
+    def __init__(self, training_data, validation_data, layer_size, learning_rate, momentum, convergence_size, classes=None,
+                 mini_batch_size=DEFAULT_MINI_BATCH_SIZE, optimizer=optimizers.SGD, dtype=None):
         self.training_data = training_data
         self.validation_data = validation_data
         self.num_layers = len(layer_size)
@@ -30,10 +99,57 @@ class MFNN:
         self.learning_rate = learning_rate
         self.momentum = momentum
         self.convergence_size = convergence_size
+        self.mini_batch_size = mini_batch_size
+        self.dtype = util.resolve_float_dtype(dtype)
         # We initialize the weights randomly.
         self.weights = self.init_weights()
+        # The buffers reused by every forward and backward pass.
+        self.workspace = Workspace(layer_size, mini_batch_size, self.dtype)
+        # The optimizer, which keeps any state it needs (such as the momentum) between mini batches.
+        self.optimizer = optimizers.get_optimizer(optimizer, learning_rate, momentum)
+        self.set_classes(classes)
+        # A network loaded from a file is frozen: it can only be run, not trained.
+        self.frozen = False
+
+    # Sets the class values of the network, or None for a regression problem.
+    def set_classes(self, classes):
         # The class dictionary is used to map each class value to an index in the output array of the network.
         self.class_dict = None if classes is None else {cls: index for index, cls in enumerate(classes)}
+        # The class values in order of their index in the output array, which maps output indices back to classes.
+        self.class_values = None if classes is None else np.array(classes)
+
+    # Saves the trained network to a file: its weights, layer sizes, classes, and training parameters. The training and
+    # validation data and the optimizer's state are not saved.
+    def save(self, file_name):
+        meta = {'layer_size': [int(size) for size in self.layer_size],
+                'classes': model_file.encode_classes(self.class_values), 'learning_rate': self.learning_rate,
+                'momentum': self.momentum, 'convergence_size': self.convergence_size,
+                'mini_batch_size': self.mini_batch_size}
+        arrays = {'weights/' + str(i): weight for i, weight in enumerate(self.weights)}
+        model_file.save_model(file_name, MODEL_TYPE, meta, arrays)
+
+    # Loads a network saved by 'save'. The network is frozen, for inference only: its weights are memory mapped read
+    # only (so loading takes about the same time for any size of network), and it has no training or validation data.
+    # It computes in the float type the weights were saved in.
+    @classmethod
+    def load(cls, file_name):
+        meta, arrays = model_file.load_model(file_name, MODEL_TYPE)
+        mfnn = cls.__new__(cls)
+        mfnn.training_data = None
+        mfnn.validation_data = None
+        mfnn.layer_size = meta['layer_size']
+        mfnn.num_layers = len(mfnn.layer_size)
+        mfnn.learning_rate = meta['learning_rate']
+        mfnn.momentum = meta['momentum']
+        mfnn.convergence_size = meta['convergence_size']
+        mfnn.mini_batch_size = meta['mini_batch_size']
+        mfnn.weights = [arrays['weights/' + str(i)] for i in range(mfnn.num_layers - 1)]
+        mfnn.dtype = mfnn.weights[0].dtype.type
+        mfnn.workspace = Workspace(mfnn.layer_size, 1, mfnn.dtype)
+        mfnn.optimizer = None
+        mfnn.set_classes(meta['classes'])
+        mfnn.frozen = True
+        return mfnn
 
     # Returns true if this network is running on a regression data set.
     def is_regression(self):
@@ -60,19 +176,22 @@ class MFNN:
         if self.is_regression():
             return class_array[0]
         else:
-            inverted_class_dict = {value: key for key, value in self.class_dict.items()}
-            max_index = 0
-            for i in range(1, len(class_array)):
-                if class_array[i] > class_array[max_index]:
-                    max_index = i
-            return inverted_class_dict[max_index]
+            return self.class_values[np.argmax(class_array)]
 
     # Trains the network on the training data, ending when the accuracy/error has converged on the validation data.
     def train(self):
-        # We convert our training data to a list of tuples that stores the numpy array of the example and the class.
+        if self.frozen:
+            raise ValueError("A network loaded from a file is frozen, so it cannot be trained")
+        # We convert our training data to a matrix of examples (one row per example) and a matrix of the expected output
+        # arrays, so that each mini batch can be trained on as a single matrix.
         numpy_training_data = self.training_data.get_numpy_list()
-        # We always use mini batches with four examples in it.
-        mini_batch_size = 4
+        examples = np.array([example_array for example_array, expected_class in numpy_training_data], dtype=self.dtype)
+        expected = np.array([self.get_class_array(expected_class) for example_array, expected_class in
+                             numpy_training_data], dtype=self.dtype)
+        # The workspace stores examples by column, so the mini batches are gathered from the transposed matrices.
+        examples_by_column = np.ascontiguousarray(examples.T)
+        expected_by_column = np.ascontiguousarray(expected.T)
+        mini_batch_size = self.mini_batch_size
         # This will record the error/accuracy of the last 'self.convergence_size' epochs. We can then evaluate how
         # the older and newer values in this list compare to determine if convergence has occurred.
         convergence_check = []
@@ -108,122 +227,159 @@ class MFNN:
                         return
 
             # If we are here, then there was no convergence. We therefore need to train on the training data (again). We
-            # first shuffle the training data so that we aren't learning on the exact same mini batches as last time.
-            random.shuffle(numpy_training_data)
-            # Now we form the mini batches. Each mini batch is a list of examples.
-            mini_batches = [numpy_training_data[k:k + mini_batch_size] for k in range(0, len(numpy_training_data), mini_batch_size)]
-            # We now perform gradient descent on each mini batch. We also maintain the delta weights from the previous
-            # mini batch so that we can apply momentum to our current delta weight.
-            prev_delta_weights = None
-            for mini_batch in mini_batches:
-                prev_delta_weights = self.train_mini_batch(mini_batch, prev_delta_weights)
-
-    # This trains on a single mini batch. It takes in the mini batch being trained on as well as the previous delta
-    # weights from the last mini batch, or None if this is the first mini batch.
-    def train_mini_batch(self, mini_batch, prev_weights):
-        total_dw = [np.zeros(w.shape) for w in self.weights]
-        for example_array, expected_class in mini_batch:
-            expected_array = self.get_class_array(expected_class)
-            delta_weights = self.back_propagation(example_array, expected_array)
-            for i in range(len(self.weights)):
-                delta_weights[i] *= (self.learning_rate / len(mini_batch))
-                if prev_weights is not None:
-                    delta_weights[i] -= self.momentum * prev_weights[i]
-                self.weights[i] -= delta_weights[i]
-                total_dw[i] += delta_weights[i]
-        return total_dw
+            # first shuffle the order of the training examples so that we aren't learning on the exact same mini batches
+            # as last time.
+            order = np.random.permutation(len(examples))
+            # We now perform gradient descent on each mini batch, where a mini batch is the columns of the example and
+            # expected matrices at the next 'mini_batch_size' positions of the shuffled order. The columns are gathered
+            # straight into the workspace.
+            workspace = self.workspace
+            for k in range(0, len(order), mini_batch_size):
+                batch_indices = order[k:k + mini_batch_size]
+                workspace.set_num_rows(len(batch_indices))
+                np.take(examples_by_column, batch_indices, axis=1, out=workspace.inputs)
+                np.take(expected_by_column, batch_indices, axis=1, out=workspace.expected)
+                self.train_workspace_batch()
+
+    # This trains on a single mini batch, given as a matrix of examples (one per row) and a matrix of the corresponding
+    # expected output arrays.
+    def train_mini_batch(self, examples: np.ndarray, expected: np.ndarray):
+        self.load_batch(examples)
+        np.copyto(self.workspace.expected, expected.T)
+        self.train_workspace_batch()
+
+    # Trains on the mini batch loaded into the workspace, like 'train_mini_batch'.
+    def train_workspace_batch(self):
+        # The gradient is summed across the mini batch, so we average it by dividing by the number of examples. The
+        # optimizer then updates the weights in place.
+        gradients = self.workspace_back_propagation()
+        for gradient in gradients:
+            gradient *= 1 / self.workspace.num_rows
+        self.optimizer.step(self.weights, gradients)
 
     # Returns the root mean squared error on the specified data set according to the current configuration of weights
     # in the network.
     def get_error(self, data_set):
-        numpy_data = data_set.get_numpy_list()
-        squared_sum = 0
+        outputs, predictions = self.predict_batch(data_set.get_attr_matrix())
+        expected = data_set.get_class_array().astype(float)
         # Sum up the squared sup across all squared differences between the actual class value and the expected value.
-        for example_array, expected_class in numpy_data:
-            output = self.run(example_array)
-            squared_sum += (self.get_class_value(output) - expected_class)**2
-        return math.sqrt(squared_sum) / len(numpy_data)
+        # The predictions are converted to float64 first, so the sum is accumulated in float64.
+        squared_sum = np.sum((predictions.astype(np.float64) - expected)**2)
+        return math.sqrt(squared_sum) / len(expected)
 
     # Returns the accuracy on the specified data set according to the current configuration of weights in the network.
     def get_accuracy(self, data_set):
-        numpy_data = data_set.get_numpy_list()
-        correct = 0
-        # Sum the number of correctly classified examples.
-        for example_array, expected_class in numpy_data:
-            output = self.run(example_array)
-            if self.get_class_value(output) == expected_class:
-                correct += 1
-        # Divide the number of correct examples by the total number of examples.
-        return correct / len(numpy_data)
+        outputs, predictions = self.predict_batch(data_set.get_attr_matrix())
+        expected = data_set.get_class_array()
+        # Divide the number of correctly classified examples by the total number of examples.
+        return np.count_nonzero(predictions == expected) / len(expected)
+
+    # Runs a batch of examples (one per row of 'examples') through the network. Returns both the output activations (one
+    # row per example) and the value each output decodes to, which is the class for classification problems and the
+    # estimate for regression problems. This is the vectorized version of calling 'run' and 'get_class_value' on each
+    # example.
+    def predict_batch(self, examples: np.ndarray):
+        # The output activations are copied out of the workspace, since it is overwritten by the next batch.
+        outputs = self.get_batch_activation(examples)[-1].copy()
+        if self.is_regression():
+            return outputs, outputs[:, 0]
+        return outputs, self.class_values[np.argmax(outputs, axis=1)]
 
     # Initialize the weights to random values that are generated according to a guassian distribution centered at zero
-    # with a standard deviation of one.
+    # with a standard deviation of one. The weights are stored in the network's float type.
     def init_weights(self):
         weights = []
         for size in range(1, len(self.layer_size)):
-            weights.append(np.random.randn(self.layer_size[size], self.layer_size[size-1] + 1))
+            weight = np.random.randn(self.layer_size[size], self.layer_size[size-1] + 1)
+            weights.append(weight.astype(self.dtype, copy=False))
         return weights
 
     # Returns a list of numpy arrays that are the activations of each layer caused by a given example inputted into the
     # network. The first activation is just the example (plus a bias activation) and the last activation is the output
-    # of the network.
+    # of the network. This runs the example as a batch of one (see 'get_batch_activation'), and copies the activations
+    # out of the workspace so they can be kept.
     def get_activation(self, example: np.ndarray):
-        inputs = np.append(example, af.sigmoid(1))
-        activation = [inputs]
-        # We successively apply each weight matrix to the example using the dot product, and then store that as the
-        # activation that should be dotted with the next weight matrix, and so on.
+        return [activation[0].copy() for activation in self.get_batch_activation(example[np.newaxis])]
+
+    # Performs back propagation of a specified example given an expected output. Returns a list of the matrices to be
+    # subtracted from the actual weights, which are copies, so they can be kept.
+    def back_propagation(self, example: np.ndarray, expected: np.ndarray):
+        delta_weights = self.batch_back_propagation(example[np.newaxis], expected[np.newaxis])
+        return [delta_weight.copy() for delta_weight in delta_weights]
+
+    # Loads a batch of examples (one per row) into the workspace, to be run through the network.
+    def load_batch(self, examples: np.ndarray):
+        self.workspace.set_num_rows(len(examples))
+        np.copyto(self.workspace.inputs, examples.T)
+
+    # Returns a list of matrices that are the activations of each layer caused by inputting a batch of examples into
+    # the network, where each row of 'examples' is a single example. This is the same as 'get_activation', except the
+    # i-th row of each matrix is the activation of the i-th example, so that each layer is computed with a single matrix
+    # product for the entire batch. Every layer except the output layer has the bias activation as its final column.
+    # The matrices are (transposed) views of the workspace, so they are only valid until the next batch is run.
+    def get_batch_activation(self, examples: np.ndarray):
+        self.load_batch(examples)
+        return [activation.T for activation in self.workspace_feed_forward()]
+
+    # Runs the batch loaded into the workspace through the network. Returns the workspace's activation buffers, which
+    # hold the activations of each layer with one column per example.
+    def workspace_feed_forward(self):
+        activation = self.workspace.activations
         for i in range(len(self.weights)):
-            # We now update input to be the activation of the next layer.
-            inputs = np.dot(self.weights[i], inputs)
+            # Each row of the weight matrix is applied to each column (example) of the previous layer's activations,
+            # including the bias row. The result is written over this layer's activations, except for its bias row.
+            outputs = activation[i + 1] if i == len(self.weights) - 1 else activation[i + 1][:-1]
+            np.dot(self.weights[i], activation[i], out=outputs)
             # We do not want to apply the sigmoid function if this is the output layer of a regression problem.
             if not (self.is_regression() and i == len(self.weights) - 1):
-               inputs = af.sigmoid(inputs)
-            # We also do not want to append the activation of the bias node (sigmoid(1)) to the activation if this is
-            # the output layer.
-            if i < len(self.weights) - 1:
-                inputs = np.append(inputs, af.sigmoid(1))
-            # We then add the current activation to the list of activations.
-            activation.append(inputs)
-        # Activation is now a list of numpy arrays, each an activation of a layer.
+                af.sigmoid_in_place(outputs)
         return activation
 
-    # Performs back propagation of a specified example given an expected output.
-    def back_propagation(self, example: np.ndarray, expected: np.ndarray):
-        # Objective: calculate the change in weights (delta_weights) for the gradient formed by this training example.
-        delta_weights = [np.zeros(w.shape) for w in self.weights]
+    # Performs back propagation on a batch of examples (one per row) given the matrix of expected outputs (one per row).
+    # Returns the change in weights summed across all examples in the batch, which is the same as summing the results of
+    # 'back_propagation' for each example. The changes in weights are the workspace's gradient buffers.
+    def batch_back_propagation(self, examples: np.ndarray, expected: np.ndarray):
+        self.load_batch(examples)
+        np.copyto(self.workspace.expected, expected.T)
+        return self.workspace_back_propagation()
+
+    # Performs back propagation on the batch loaded into the workspace, like 'batch_back_propagation'.
+    def workspace_back_propagation(self):
+        workspace = self.workspace
+        delta_weights = workspace.gradients
         n = len(self.layer_size)
 
-        # First we perform feedforward, and save all the activations of each layer.
-        activation = self.get_activation(example)
+        # First we perform feedforward on the entire batch, and save all the activations of each layer.
+        activation = self.workspace_feed_forward()
 
-        # We then calculate the delta of the output layer.
-        delta = af.cost_prime(expected, activation[-1])
+        # We then calculate the delta of the output layer, where the i-th column is the delta for the i-th example. The
+        # deltas of the workspace are indexed from the first layer after the input layer.
+        delta = workspace.deltas[-1]
+        np.subtract(activation[-1], workspace.expected, out=delta)
         if not self.is_regression():
-            delta = delta * af.sigmoid_prime(activation[-1])
-        # The change in weights for the output layer is then updated using delta.
-        delta_weights[-1] = np.outer(delta, activation[-2])
+            delta *= self.get_sigmoid_prime(activation[-1], workspace.derivatives[-1])
+        # Multiplying the deltas with the transposed activations sums each example's outer product in one step.
+        np.dot(delta, activation[-2].T, out=delta_weights[-1])
 
-        # Now, we calculate the delta and change in weights for each hidden layer weights. The variable i represents the
-        # layer we are currently evaluating, with i=1 being the first hidden layer, i=2 being the second, etc.
+        # Now, we calculate the delta and change in weights for each hidden layer. The variable i represents the layer
+        # we are currently evaluating, with i=1 being the first hidden layer, i=2 being the second, etc.
         for i in range(n-2, 0, -1):
-            # This is the activation from the previous hidden (or the input) layer.
-            previous_activation = activation[i-1]
-            # These are the weights going out from the current layer.
-            downstream_weights = self.weights[i].T
-
-            # We need to trim the delta from the previous layer (unless it comes from the output layer) because it
-            # includes a delta for the bias node, which does not change.
-            if i < n-2:
-                delta = delta[:-1]
-            # We compute delta for this layer:
-            delta = np.dot(downstream_weights, delta) * af.sigmoid_prime(activation[i])
-            # Then we update the delta_weight matrix to have the change in weights for this layer's weights:
-            delta_weights[i-1] = np.delete(np.outer(delta, previous_activation), -1, 0)
-        # We return delta_weights, which is a list of the matrices to be subtracted from the actual weights.
+            # The bias node has no delta, since it doesn't depend on the previous layer, so the weights from the bias
+            # node are left out.
+            downstream_delta = delta
+            delta = workspace.deltas[i-1]
+            np.dot(self.weights[i][:, :-1].T, downstream_delta, out=delta)
+            delta *= self.get_sigmoid_prime(activation[i][:-1], workspace.derivatives[i-1])
+            np.dot(delta, activation[i-1].T, out=delta_weights[i-1])
         return delta_weights
 
+    # Stores the sigmoid derivative of the given activations in 'out', and returns it.
+    @staticmethod
+    def get_sigmoid_prime(activation: np.ndarray, out: np.ndarray):
+        np.subtract(1, activation, out=out)
+        out *= activation
+        return out
+
     # This method returns the output activation layer of a single input example.
     def run(self, example):
         return self.get_activation(example)[-1]
-
-
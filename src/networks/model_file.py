@@ -0,0 +1,42 @@
+# model_file.py
+# Saves trained networks to files, and reads them back. A model file is a binary file in the format of util.save_binary:
+# the weight matrices (and any other arrays, such as the RBF centers) are stored as arrays, and everything else needed
+# to run the network (its type, layer sizes, classes, and so on) is stored in the metadata. When a model is loaded, its
+# arrays are memory mapped read only, so any number of processes can load the same model almost instantly and share
+# the memory of its weights.
+
+import src.util as util
+
+# The version of the layout of the model metadata, which is increased whenever it changes in a way that older code
+# cannot read.
+MODEL_FORMAT_VERSION = 1
+
+
+# Saves a model of the given type (such as "mfnn") with its metadata (anything that can be stored as JSON) and its named
+# numpy arrays.
+def save_model(file_name, model_type, meta, arrays):
+    util.save_binary(file_name, {'model_type': model_type, 'model_version': MODEL_FORMAT_VERSION, 'model': meta},
+                     arrays)
+
+
+# Loads a model saved by 'save_model'. Returns (@0) its metadata and (@1) its named arrays, which are memory mapped read
+# only. Raises a ValueError if the file doesn't hold a model of the given type, or holds one from an unsupported
+# version.
+def load_model(file_name, model_type):
+    meta, arrays = util.load_binary(file_name, mode="r")
+    if meta.get('model_type') != model_type:
+        raise ValueError(file_name + " does not hold a model of type " + model_type)
+    if meta.get('model_version') != MODEL_FORMAT_VERSION:
+        raise ValueError(file_name + " has unsupported model version " + str(meta.get('model_version')))
+    return meta['model'], arrays
+
+
+# Returns the type of the model saved in a file (see 'save_model'). Only the file's header is read, so this is cheap to
+# call before loading the model.
+def get_model_type(file_name):
+    return util.load_binary_meta(file_name).get('model_type')
+
+
+# Returns the class values of a network as a list that can be stored as JSON, or None for a regression network.
+def encode_classes(class_values):
+    return None if class_values is None else class_values.tolist()
@@ -0,0 +1,168 @@
+# optimizers.py
+# Defines the update rules (optimizers) used to train the weights of our networks. An optimizer takes the weights of a
+# network as a list of numpy arrays, such as MFNN.weights or [RBFNN.weights], along with the gradient of each, and
+# updates the weights in place. Any state an optimizer keeps between updates (such as velocities or moving averages) is
+# allocated on its first update (in the same float type as the weights) and is then updated in place as well, so no
+# arrays are allocated while training.
+
+import math
+import numpy as np
+
+# The names of the optimizers, which can be given to the networks in place of an Optimizer object.
+SGD = "sgd"
+NESTEROV = "nesterov"
+RMSPROP = "rmsprop"
+ADAM = "adam"
+
+# The default decay rate of the moving average of squared gradients used by RMSProp.
+RMSPROP_DECAY = .9
+
+# The default decay rates of the moving averages of the gradients and squared gradients used by Adam.
+ADAM_BETA1 = .9
+ADAM_BETA2 = .999
+
+# Added to the denominator of the adaptive optimizers to avoid dividing by zero.
+EPSILON = 1e-8
+
+
+# The base class of the optimizers. Subclasses implement 'init_state' and 'update'.
+class Optimizer:
+
+    # Creates an optimizer with the given learning rate.
+    def __init__(self, learning_rate):
+        self.learning_rate = learning_rate
+        # The state of each weight array, and the number of updates made so far.
+        self.state = None
+        self.num_steps = 0
+
+    # Updates each weight array in place, given the gradient of each (the average over the mini batch). The gradient
+    # arrays are used as scratch space, so they are overwritten.
+    def step(self, weights: list, gradients: list):
+        if self.state is None:
+            self.state = [self.init_state(weight) for weight in weights]
+        self.num_steps += 1
+        for weight, gradient, state in zip(weights, gradients, self.state):
+            self.update(weight, gradient, state)
+
+    # Forgets the state of the optimizer, as if no updates were made yet.
+    def reset(self):
+        self.state = None
+        self.num_steps = 0
+
+    # Returns the state kept for a weight array, as a list of arrays.
+    def init_state(self, weight: np.ndarray):
+        return []
+
+    # Updates a weight array in place given its gradient and state.
+    def update(self, weight: np.ndarray, gradient: np.ndarray, state: list):
+        raise NotImplementedError
+
+
+# Stochastic gradient descent, with (optional) momentum. The velocity of each weight is a running sum of its gradients,
+# each previous gradient being scaled by the momentum once more per update, and the weight moves against its velocity.
+# With Nesterov momentum, the weight instead moves against the gradient plus the momentum times the new velocity, which
+# is where the velocity is about to take it (the formulation of Sutskever et al., which doesn't need the gradient at a
+# second point).
+class SGDOptimizer(Optimizer):
+
+    def __init__(self, learning_rate, momentum=0, nesterov=False):
+        super().__init__(learning_rate)
+        self.momentum = momentum
+        self.nesterov = nesterov
+
+    def init_state(self, weight: np.ndarray):
+        if self.momentum == 0:
+            return []
+        # The velocity, and with Nesterov momentum, a scratch array for the momentum term.
+        return [np.zeros_like(weight), np.empty_like(weight)] if self.nesterov else [np.zeros_like(weight)]
+
+    def update(self, weight: np.ndarray, gradient: np.ndarray, state: list):
+        if self.momentum != 0:
+            velocity = state[0]
+            velocity *= self.momentum
+            velocity += gradient
+            if self.nesterov:
+                np.multiply(velocity, self.momentum, out=state[1])
+                gradient += state[1]
+            else:
+                gradient[...] = velocity
+        gradient *= self.learning_rate
+        weight -= gradient
+
+
+# RMSProp: each weight's step is divided by the root of a moving average of its squared gradients, so that weights with
+# large gradients take smaller steps and weights with small gradients take larger ones.
+class RMSPropOptimizer(Optimizer):
+
+    def __init__(self, learning_rate, decay=RMSPROP_DECAY, epsilon=EPSILON):
+        super().__init__(learning_rate)
+        self.decay = decay
+        self.epsilon = epsilon
+
+    def init_state(self, weight: np.ndarray):
+        return [np.zeros_like(weight), np.empty_like(weight)]
+
+    def update(self, weight: np.ndarray, gradient: np.ndarray, state: list):
+        mean_square, scratch = state
+        mean_square *= self.decay
+        np.multiply(gradient, gradient, out=scratch)
+        scratch *= 1 - self.decay
+        mean_square += scratch
+        np.sqrt(mean_square, out=scratch)
+        scratch += self.epsilon
+        gradient /= scratch
+        gradient *= self.learning_rate
+        weight -= gradient
+
+
+# Adam: moving averages of both the gradients and the squared gradients are kept, and each weight moves against the
+# first divided by the root of the second. Both averages start at zero, so they are corrected for that bias (which
+# matters in the first updates) by dividing them by one minus their decay rate to the power of the number of updates.
+class AdamOptimizer(Optimizer):
+
+    def __init__(self, learning_rate, beta1=ADAM_BETA1, beta2=ADAM_BETA2, epsilon=EPSILON):
+        super().__init__(learning_rate)
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+
+    def init_state(self, weight: np.ndarray):
+        return [np.zeros_like(weight), np.zeros_like(weight), np.empty_like(weight)]
+
+    def update(self, weight: np.ndarray, gradient: np.ndarray, state: list):
+        mean, mean_square, scratch = state
+        mean *= self.beta1
+        np.multiply(gradient, 1 - self.beta1, out=scratch)
+        mean += scratch
+        mean_square *= self.beta2
+        np.multiply(gradient, gradient, out=scratch)
+        scratch *= 1 - self.beta2
+        mean_square += scratch
+        # The bias corrected root mean square, plus epsilon, is the denominator of the step.
+        np.sqrt(mean_square, out=scratch)
+        scratch /= math.sqrt(1 - self.beta2 ** self.num_steps)
+        scratch += self.epsilon
+        np.divide(mean, scratch, out=gradient)
+        gradient *= self.learning_rate / (1 - self.beta1 ** self.num_steps)
+        weight -= gradient
+
+
+# Returns a new optimizer, given either the name of the optimizer or an Optimizer object (which is returned as it is).
+# The learning rate is used by every named optimizer, and the momentum by SGD and Nesterov. Since Nesterov without
+# momentum would just be SGD, it raises a ValueError if the momentum is zero. Note that the adaptive optimizers (RMSProp
+# and Adam) take steps of about the size of the learning rate, so they usually need a much smaller learning rate than
+# SGD.
+def get_optimizer(optimizer, learning_rate, momentum=0):
+    if isinstance(optimizer, Optimizer):
+        return optimizer
+    if optimizer == SGD:
+        return SGDOptimizer(learning_rate, momentum)
+    if optimizer == NESTEROV:
+        if momentum == 0:
+            raise ValueError("Nesterov momentum needs a momentum other than zero")
+        return SGDOptimizer(learning_rate, momentum, nesterov=True)
+    if optimizer == RMSPROP:
+        return RMSPropOptimizer(learning_rate)
+    if optimizer == ADAM:
+        return AdamOptimizer(learning_rate)
+    raise ValueError("Unknown optimizer: " + str(optimizer))
@@ -4,12 +4,29 @@
 import math
 import numpy as np
 from src import activation_functions as af
-import random
+import src.util as util
+import src.networks.model_file as model_file
+import src.networks.optimizers as optimizers
 
 # The amount each new average metric needs to be better than the old average metric for the training process to
 # continue.
 CONVERGENCE_THRESHOLD = .0001
 
+# The number of examples whose hidden layer activations are calculated at once. This bounds the size of the temporary
+# matrices used while building an activation matrix.
+ACTIVATION_CHUNK_SIZE = 1024
+
+# The ways the output layer's weights can be fit by 'train'. Gradient descent trains epoch by epoch until the validation
+# metric converges, while least squares solves for the weights directly in a single pass over the training data.
+GRADIENT_DESCENT = "gradient_descent"
+LEAST_SQUARES = "lstsq"
+
+# The default regularization used by the least squares fit, relative to the average squared activation of a center.
+LSTSQ_REGULARIZATION = 1e-2
+
+# The model type stored in the files that RBFNNs are saved to (see model_file.py).
+MODEL_TYPE = "rbfnn"
+
 
 # Creates an instance of an RBFNN.
 class RBFNN:
@@ -22,21 +39,93 @@ class RBFNN:
     # - learning_rate: the learning rate for the algorithm.
     # - convergence_size: how many epochs to evalaute when determing whether the algorithm has converged.
     # - classes: the class values for the data, if a classification problem.
-    def __init__(self, centers, training_data, validation_data, num_inputs, learning_rate, convergence_size, classes=None):
+    # - fit_mode: (optional) either GRADIENT_DESCENT or LEAST_SQUARES, the way 'train' fits the output weights.
+    # - regularization: (optional) the regularization of the least squares fit, see 'fit_least_squares'.
+    # - optimizer: (optional) the name of the optimizer used by gradient descent to update the weights, or an Optimizer
+    #   object (see optimizers.py). The named optimizers use the learning rate, and SGD and Nesterov also use the
+    #   momentum.
+    # - momentum: (optional) float specifying how much momentum the SGD and Nesterov optimizers use.
+    # - dtype: (optional) the float type the network computes in, float32 or float64. By default, the global float type
+    #   (see util.get_float_dtype).
+    def __init__(self, centers, training_data, validation_data, num_inputs, learning_rate, convergence_size, classes=None,
+                 fit_mode=GRADIENT_DESCENT, regularization=LSTSQ_REGULARIZATION, optimizer=optimizers.SGD, momentum=0,
+                 dtype=None):
+        if fit_mode not in (GRADIENT_DESCENT, LEAST_SQUARES):
+            raise ValueError("Unknown fit mode: " + str(fit_mode))
         self.receptors = centers  # Dataset, use for rbf (Centers of Gaussians)
         self.training_data = training_data  # Dataset, use to train
         self.validation_data = validation_data # Dataset, use to validate training convergence
+        # The columns of the attributes and the class in the examples given to 'run', which are those of the training data.
+        self.attr_cols = list(training_data.attr_cols)
+        self.class_col = training_data.class_col
         self.num_inputs = num_inputs
         self.num_outputs = len(classes) if classes is not None else 1
         self.learning_rate = learning_rate
+        self.momentum = momentum
         self.convergence_size = convergence_size
-        self.weights = np.random.randn(self.num_outputs, len(self.receptors.data))
+        self.fit_mode = fit_mode
+        self.regularization = regularization
+        self.dtype = util.resolve_float_dtype(dtype)
+        self.weights = np.random.randn(self.num_outputs, self.receptors.get_len()).astype(self.dtype, copy=False)
+        # The optimizer, which keeps any state it needs between mini batches.
+        self.optimizer = optimizers.get_optimizer(optimizer, learning_rate, momentum)
         # Calculates the standard deviation of our training data.
         self.std_dev = self.get_stdrd_dev()
+        self.set_classes(classes)
+        # The attributes of the centers as a matrix (one center per row), used to run batches of examples at once.
+        self.center_matrix = self.receptors.get_attr_matrix().astype(self.dtype, copy=False)
+        # To speed up the algorithm, we cache the hidden layer activations of every example in each data set we run, as a
+        # matrix where row i holds the activations of the data set's i-th example. The cache maps each DataSet object to
+        # its activation matrix, so a data set must not be changed after it is run through the network.
+        self.activation_cache = {}
+        # A network loaded from a file is frozen: it can only be run, not trained.
+        self.frozen = False
+
+    # Sets the class values of the network, or None for a regression problem.
+    def set_classes(self, classes):
         # Creates a mapping of each class value to an index in the output array.
         self.class_dict = None if classes is None else {cls: index for index, cls in enumerate(classes)}
-        # To speed up the algorithm, we cache the distances.
-        self.dist_cache = {}
+        # The class values in order of their index in the output array, which maps output indices back to classes.
+        self.class_values = None if classes is None else np.array(classes)
+
+    # Saves the trained network to a file: its weights, centers, standard deviation, classes, and training parameters.
+    # The training and validation data and the optimizer's state are not saved.
+    def save(self, file_name):
+        meta = {'num_inputs': int(self.num_inputs), 'std_dev': float(self.std_dev),
+                'attr_cols': [int(col) for col in self.attr_cols], 'class_col': int(self.class_col),
+                'classes': model_file.encode_classes(self.class_values), 'learning_rate': self.learning_rate,
+                'momentum': self.momentum, 'convergence_size': self.convergence_size, 'fit_mode': self.fit_mode,
+                'regularization': self.regularization}
+        model_file.save_model(file_name, MODEL_TYPE, meta, {'weights': self.weights, 'centers': self.center_matrix})
+
+    # Loads a network saved by 'save'. The network is frozen, for inference only: its weights and centers are memory
+    # mapped read only, its standard deviation is read rather than recalculated from the centers, and it has no training
+    # or validation data. It computes in the float type the weights were saved in.
+    @classmethod
+    def load(cls, file_name):
+        meta, arrays = model_file.load_model(file_name, MODEL_TYPE)
+        rbfnn = cls.__new__(cls)
+        rbfnn.receptors = None
+        rbfnn.training_data = None
+        rbfnn.validation_data = None
+        rbfnn.num_inputs = meta['num_inputs']
+        rbfnn.attr_cols = meta['attr_cols']
+        rbfnn.class_col = meta['class_col']
+        rbfnn.learning_rate = meta['learning_rate']
+        rbfnn.momentum = meta['momentum']
+        rbfnn.convergence_size = meta['convergence_size']
+        rbfnn.fit_mode = meta['fit_mode']
+        rbfnn.regularization = meta['regularization']
+        rbfnn.weights = arrays['weights']
+        rbfnn.center_matrix = arrays['centers']
+        rbfnn.num_outputs = len(rbfnn.weights)
+        rbfnn.dtype = rbfnn.weights.dtype.type
+        rbfnn.optimizer = None
+        rbfnn.std_dev = meta['std_dev']
+        rbfnn.set_classes(meta['classes'])
+        rbfnn.activation_cache = {}
+        rbfnn.frozen = True
+        return rbfnn
 
     # Returns the value of the class with the highest activation in the given class array. See 'get_class_array' for a
     # better understanding of the purpose of these functions.
@@ -44,69 +133,60 @@ class RBFNN:
         if self.is_regression():
             return class_array[0]
         else:
-            # Flip class dictionary to go from output array index to associated class value.
-            inverted_class_dict = {value: key for key, value in self.class_dict.items()}
-            # Find the max index.
-            max_index = 0
-            for i in range(1, len(class_array)):
-                if class_array[i] > class_array[max_index]:
-                    max_index = i
-            # Return the class associated with that max index.
-            return inverted_class_dict[max_index]
+            # Return the class associated with the max index.
+            return self.class_values[np.argmax(class_array)]
 
     # Gets the estimated standard deviation between the center vectors.
     def get_stdrd_dev(self):
         max_dist_bw_clusters = self.receptors.get_max_distance()
-        num_cluster_centers = len(self.receptors.data)
+        num_cluster_centers = self.receptors.get_len()
         stdrd_dev = max_dist_bw_clusters/math.sqrt((2*num_cluster_centers))
         return stdrd_dev
 
-    # Gets the activations of the radial basis layer of the network for a specific input and center.
-    def get_rbf_activation(self, input, center, stdrd_dev):
-        """Use a Gaussian RBF as our "activation" function and take in an input parameter and centers for the neural
-         network and the standard deviation for these centers. Then calculate and output the 'activation value'."""
-        if center not in self.dist_cache:
-            self.dist_cache[center] = {}
-        if input not in self.dist_cache[center]:
-            self.dist_cache[center][input] = self.receptors.distance(input, center)
-        dist = self.dist_cache[center][input]
-        activation_value = math.exp((-1*(dist)**2)/(2*stdrd_dev**2))
-        return activation_value
-
     # Gets the output and hidden layer activations for a specific example inputted to the network.
     def run_rbfnn(self, example: list):
         """Uses a linear combination of Gaussians to approximate any function."""
-        stdrd_dev = self.std_dev
-        num_of_centers = len(self.receptors.data)
-
+        example_array, example_class = self.get_numpy_array(example)
         # Find the activations of the hidden layer.
-        hidden_activations = []
-        for idx in range(num_of_centers):
-            gaussian_rbf = self.get_rbf_activation(example, self.receptors.data[idx], stdrd_dev)
-            hidden_activations.append(gaussian_rbf)
-        hidden_activations = np.array(hidden_activations)
-
+        hidden_activations = self.get_batch_rbf_activation(example_array[np.newaxis, :])[0]
         # Find the activations of the output layer.
-        output_activations = np.dot(self.weights, hidden_activations)
+        output_activations = self.get_output_activation(hidden_activations)
+        # Return the activations of both layers.
+        return output_activations, hidden_activations
+
+    # Gets the activations of the output layer from the activations of the hidden layer. This works for a single
+    # example's hidden activations, or for a matrix of them (one example per row).
+    def get_output_activation(self, hidden_activations: np.ndarray):
+        output_activations = np.dot(hidden_activations, self.weights.T)
         if not self.is_regression():
             output_activations = af.sigmoid(output_activations)
+        return output_activations
 
-        # Return the activations of both layers.
-        return output_activations, hidden_activations
+    # Returns the matrix of hidden layer activations for every example in the data set, where row i holds the
+    # activations of the i-th example. The matrix is calculated (in chunks of rows) the first time a data set is seen,
+    # and is then reused from the cache.
+    def get_data_activation(self, data_set):
+        if data_set not in self.activation_cache:
+            examples = data_set.get_attr_matrix()
+            activation = np.empty((len(examples), len(self.center_matrix)), dtype=self.dtype)
+            for start in range(0, len(examples), ACTIVATION_CHUNK_SIZE):
+                end = start + ACTIVATION_CHUNK_SIZE
+                activation[start:end] = self.get_batch_rbf_activation(examples[start:end])
+            self.activation_cache[data_set] = activation
+        return self.activation_cache[data_set]
 
     # Performs gradient descent on our single weight matrix connecting the radial basis (hidden) layer and output layer.
-    # Does gradient descent on a single example and its expected output, returns the change in weights calculated from
-    # the gradient.
-    def gradient_descent(self, example: np.ndarray, expected: np.ndarray):
-        # Get activations for example.
-        output_activation, hidden_activations = self.run_rbfnn(example)
+    # Does gradient descent on a batch of examples, given as their hidden layer activations (one example per row) and
+    # their expected outputs (one example per row), and returns the change in weights summed across the batch.
+    def gradient_descent(self, hidden_activations: np.ndarray, expected: np.ndarray):
+        output_activation = self.get_output_activation(hidden_activations)
         delta = af.cost_prime(expected, output_activation)
         # No sigmoid activation function is we are doing regression, so we don't need to use the derivative of the
         # sigmoid during gradient descent in that case.
         if not self.is_regression():
             delta = delta * af.sigmoid_prime(output_activation)
-        # Calculates the delta weight given the delta.
-        delta_weights = np.outer(delta, hidden_activations)
+        # Multiplying the transposed deltas with the hidden activations sums each example's outer product in one step.
+        delta_weights = np.dot(delta.T, hidden_activations)
         return delta_weights
 
     # Returns true if the current data set is a regression problem.
@@ -128,12 +208,19 @@ class RBFNN:
             class_array[class_index] = 1
             return class_array
 
-    # Trains the data on the training data provided to the algorithm. Does so using mini batches of size four.
+    # Trains the data on the training data provided to the algorithm. Does so using mini batches of size four, unless
+    # the network uses the least squares fit mode.
     def train(self):
-        # We want both the original example and the expected class of the example.
-        training_observations = []
-        for example in self.training_data.data:
-            training_observations.append((example, example[self.training_data.class_col]))
+        if self.frozen:
+            raise ValueError("A network loaded from a file is frozen, so it cannot be trained")
+        if self.fit_mode == LEAST_SQUARES:
+            self.fit_least_squares()
+            return
+        # We want the hidden layer activations of each training example (one per row) along with the expected output
+        # array of each example (one per row).
+        training_activation = self.get_data_activation(self.training_data)
+        expected = np.array([self.get_class_array(cls) for cls in self.training_data.get_class_array().tolist()],
+                            dtype=self.dtype)
         # We always use mini batches with four examples ini t.
         mini_batch_size = 4
         # This will record the error/accuracy of the last 'self.convergence_size' epochs. We can then evaluate how
@@ -170,53 +257,96 @@ class RBFNN:
                         return
 
             # If we are here, then there was no convergence. We therefore need to train on the training data (again). We
-            # first shuffle the training data so that we aren't learning on the exact same mini batches as last time.
-            random.shuffle(training_observations)
-            # Now we form the mini batches. Each mini batch is a list of examples.
-            mini_batches = [training_observations[k:k + mini_batch_size] for k in range(0, len(training_observations), mini_batch_size)]
-            # We now perform gradient descent on each mini batch. We also maintain the delta weights from the previous
-            # mini batch so that we can apply momentum to our current delta weight.
-            for mini_batch in mini_batches:
-                self.train_mini_batch(mini_batch)
-
-    # This trains on a single mini batch.
-    def train_mini_batch(self, mini_batch):
-        for example_array, expected_class in mini_batch:
-            expected_array = self.get_class_array(expected_class)
-            # Calculate teh delta weights as the gradient descent output times the learning rate divided by the number
-            # of items in the mini batch (averaging).
-            delta_weights = self.gradient_descent(example_array, expected_array) * (self.learning_rate / len(mini_batch))
-            # Applies the change in weights for this example in this mini batch.
-            self.weights -= delta_weights
+            # first shuffle the order of the training examples so that we aren't learning on the exact same mini batches
+            # as last time.
+            order = np.random.permutation(len(training_activation))
+            # We now perform gradient descent on each mini batch, which is made of the rows of the training activations
+            # and expected outputs at the next 'mini_batch_size' positions of the shuffled order.
+            for k in range(0, len(order), mini_batch_size):
+                batch_indices = order[k:k + mini_batch_size]
+                self.train_mini_batch(training_activation[batch_indices], expected[batch_indices])
+
+    # This trains on a single mini batch, given as the hidden layer activations of its examples (one per row) and their
+    # expected output arrays (one per row).
+    def train_mini_batch(self, hidden_activations, expected):
+        # Calculate the gradient as the gradient descent output divided by the number of items in the mini batch
+        # (averaging).
+        gradient = self.gradient_descent(hidden_activations, expected)
+        gradient *= 1 / len(hidden_activations)
+        # The optimizer applies the change in weights for this mini batch.
+        self.optimizer.step([self.weights], [gradient])
+
+    # Fits the output layer's weights directly, by solving the regularized linear least squares problem of mapping the
+    # hidden layer activations of the training data to their expected output arrays. The activations are calculated in
+    # chunks of rows, and only the (centers x centers) and (centers x outputs) sums needed by the solve are kept, so the
+    # memory used does not grow with the size of the training data. For classification the expected arrays are fit
+    # before the sigmoid, which does not change which output is the largest. The sums and the solve are always done in
+    # float64, whatever float type the network computes in.
+    def fit_least_squares(self):
+        examples = self.training_data.get_attr_matrix()
+        classes = self.training_data.get_class_array().tolist()
+        num_centers = self.receptors.get_len()
+        # These accumulate H^T H and H^T Y, where H is the activation matrix and Y is the expected output matrix.
+        gram = np.zeros((num_centers, num_centers))
+        moment = np.zeros((num_centers, self.num_outputs))
+        for start in range(0, len(examples), ACTIVATION_CHUNK_SIZE):
+            end = start + ACTIVATION_CHUNK_SIZE
+            hidden_activations = self.get_batch_rbf_activation(examples[start:end]).astype(np.float64, copy=False)
+            expected = np.array([self.get_class_array(cls) for cls in classes[start:end]])
+            gram += np.dot(hidden_activations.T, hidden_activations)
+            moment += np.dot(hidden_activations.T, expected)
+        # The regularization is scaled by the average diagonal entry so that it does not depend on the amount of data.
+        ridge = self.regularization * max(np.trace(gram) / num_centers, np.finfo(float).tiny)
+        gram[np.diag_indices(num_centers)] += ridge
+        self.weights = np.linalg.solve(gram, moment).T.astype(self.dtype)
 
     # Returns the root mean squared error on the specified data set according to the current configuration of weights
     # in the network.
     def get_error(self, data_set):
-        observations = [(example, example[self.training_data.class_col]) for example in data_set.data]
-        squared_sum = 0
+        outputs, predictions = self.predict_activation(self.get_data_activation(data_set))
+        expected = data_set.get_class_array().astype(float)
         # Sum up the squared sup across all squared differences between the actual class value and the expected value.
-        for example, expected_class in observations:
-            output = self.run(example)
-            squared_sum += (self.get_class_value(output) - expected_class)**2
-        return math.sqrt(squared_sum) / len(observations)
+        # The predictions are converted to float64 first, so the sum is accumulated in float64.
+        squared_sum = np.sum((predictions.astype(np.float64) - expected)**2)
+        return math.sqrt(squared_sum) / len(expected)
 
     # Returns the accuracy on the specified data set according to the current configuration of weights in the network.
     def get_accuracy(self, data_set):
-        observations = [(example, example[self.training_data.class_col]) for example in data_set.data]
-        correct = 0
-        # Sum the number of correctly classified examples.
-        for example, expected_class in observations:
-            output = self.run(example)
-            if self.get_class_value(output) == expected_class:
-                correct += 1
-        # Divide the number of correct examples by the total number of examples.
-        return correct / len(observations)
+        outputs, predictions = self.predict_activation(self.get_data_activation(data_set))
+        expected = data_set.get_class_array()
+        # Divide the number of correctly classified examples by the total number of examples.
+        return np.count_nonzero(predictions == expected) / len(expected)
+
+    # Gets the activations of the radial basis layer for a batch of examples (one per row of 'examples'). The value at
+    # [i, j] is the gaussian activation of the j-th center for the i-th example. The activations are in the network's
+    # float type. Activations smaller than the square root of the smallest normal float (those of far away centers) are
+    # set to zero. Otherwise, multiplying them by small deltas during training gives subnormal floats, and arithmetic on
+    # those is very slow. This is common in float32, where the cutoff is about 1e-19, and never matters in float64.
+    def get_batch_rbf_activation(self, examples: np.ndarray):
+        squared_dists = util.squared_distances(examples.astype(self.dtype, copy=False), self.center_matrix)
+        activation = np.exp(-squared_dists / (2 * self.std_dev**2))
+        activation[activation < math.sqrt(np.finfo(self.dtype).tiny)] = 0
+        return activation
+
+    # Runs a batch of examples (one per row of 'examples') through the network. Returns both the output activations (one
+    # row per example) and the value each output decodes to, which is the class for classification problems and the
+    # estimate for regression problems. This is the vectorized version of calling 'run' and 'get_class_value' on each
+    # example.
+    def predict_batch(self, examples: np.ndarray):
+        return self.predict_activation(self.get_batch_rbf_activation(examples))
+
+    # The same as 'predict_batch', but for examples whose hidden layer activations (one example per row) are known.
+    def predict_activation(self, hidden_activations: np.ndarray):
+        outputs = self.get_output_activation(hidden_activations)
+        if self.is_regression():
+            return outputs, outputs[:, 0]
+        return outputs, self.class_values[np.argmax(outputs, axis=1)]
 
     def get_numpy_array(self, example):
         attr_only = []
-        for col in self.training_data.attr_cols:
+        for col in self.attr_cols:
             attr_only.append(example[col])
-        return np.array(attr_only), example[self.training_data.class_col]
+        return np.array(attr_only), example[self.class_col]
 
     # This method returns the output activation layer of a single input example.
     def run(self, example):
@@ -0,0 +1,321 @@
+# server.py
+# A local inference server for trained networks. Other local services connect over a Unix socket or a localhost TCP
+# port and send requests as newline delimited JSON (one object per line):
+# - {"id": <any>, "example": [<attribute values>]} asks for the prediction of one example. The response is
+#   {"id": <the same id>, "prediction": <class or estimate>, "outputs": [<output activations>]}, or
+#   {"id": <the same id>, "error": <message>} if the example cannot be run. The responses are standard JSON, so any
+#   prediction or output that is not a finite number (such as NaN) is sent as null.
+# - {"id": <any>, "stats": true} asks for the server's latency and throughput counters (see 'Stats.get_summary').
+# A connection can send any number of requests without waiting for their responses, which may come back in a different
+# order, so each response carries the id of its request.
+#
+# Running the network on one example at a time is dominated by Python overhead, so concurrent requests (from any
+# connection) are collected into micro batches that are run with a single vectorized forward pass ('predict_batch').
+# A micro batch is run as soon as it has max_batch_size examples, or max_wait seconds after its first example arrived,
+# whichever comes first. The networks are loaded frozen from model files (see model_file.py), so several server
+# processes can share the memory of the same weights.
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+import numpy as np
+import src.networks.model_file as model_file
+from src.networks.mfnn import MFNN
+from src.networks.rbfnn import RBFNN
+
+# The default most examples run in one micro batch.
+DEFAULT_MAX_BATCH_SIZE = 64
+
+# The default longest time (in seconds) the first example of a micro batch waits for others to join it.
+DEFAULT_MAX_WAIT = .002
+
+# The default localhost address the server listens on, when it doesn't listen on a Unix socket.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# The number of most recent request latencies the latency percentiles are found from.
+LATENCY_WINDOW = 10000
+
+# The latency percentiles reported by the stats.
+LATENCY_PERCENTILES = (50, 90, 99)
+
+# The longest request line a connection can send, in bytes.
+MAX_LINE_LENGTH = 2 ** 20
+
+# The network class that loads each type of model file.
+NETWORK_CLASSES = {'mfnn': MFNN, 'rbfnn': RBFNN}
+
+
+# Loads the frozen network saved in a model file, whichever type of network it is. The type is found from the file's
+# header alone, so the file's arrays are only mapped once, by the network's own 'load'.
+def load_network(file_name):
+    model_type = model_file.get_model_type(file_name)
+    if model_type not in NETWORK_CLASSES:
+        raise ValueError(file_name + " holds an unknown type of model: " + str(model_type))
+    return NETWORK_CLASSES[model_type].load(file_name)
+
+
+# Returns the number of inputs (attribute values per example) of a network.
+def get_num_inputs(network):
+    return network.layer_size[0] if isinstance(network, MFNN) else network.num_inputs
+
+
+# Converts a numpy value (or a plain value) to one that can be written as standard JSON. Floats that are not finite
+# become None, since standard JSON has no NaN or infinity.
+def to_json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# The latency and throughput counters of a server. The latency of a request is the time from when it was read to when
+# its response was ready, which includes the time it waited for its micro batch.
+class Stats:
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_batches = 0
+        self.total_latency = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    # Records the run of a micro batch.
+    def add_batch(self):
+        self.num_batches += 1
+
+    # Records a request answered with the given latency (in seconds).
+    def add_request(self, latency):
+        self.num_requests += 1
+        self.total_latency += latency
+        self.latencies.append(latency)
+
+    # Records a request that could not be run.
+    def add_error(self):
+        self.num_errors += 1
+
+    # Returns a dictionary of the counters: the number of requests, errors, and micro batches, the average micro batch
+    # size, the throughput (requests per second since the server started), and the mean and percentile latencies (in
+    # milliseconds) of the most recent LATENCY_WINDOW requests.
+    def get_summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        summary = {'requests': self.num_requests, 'errors': self.num_errors, 'batches': self.num_batches,
+                   'mean_batch_size': self.num_requests / self.num_batches if self.num_batches else 0,
+                   'throughput': self.num_requests / elapsed if elapsed > 0 else 0,
+                   'mean_latency_ms': 1000 * self.total_latency / self.num_requests if self.num_requests else 0}
+        latencies = np.array(self.latencies)
+        for percentile in LATENCY_PERCENTILES:
+            value = 1000 * np.percentile(latencies, percentile) if len(latencies) else 0
+            summary['p' + str(percentile) + '_latency_ms'] = float(value)
+        return summary
+
+
+# Collects the examples of concurrent requests into micro batches, and runs each micro batch through the network.
+class MicroBatcher:
+
+    # Creates a batcher for a network (an MFNN or RBFNN), which runs micro batches of up to max_batch_size examples, and
+    # waits at most max_wait seconds for a micro batch to fill up.
+    def __init__(self, network, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, stats=None):
+        self.network = network
+        self.num_inputs = get_num_inputs(network)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = Stats() if stats is None else stats
+        # Each queued item is an (example, future, arrival time) tuple.
+        self.queue = asyncio.Queue()
+        # The examples of a micro batch are copied into this buffer, in the network's float type.
+        self.batch = np.empty((max_batch_size, self.num_inputs), dtype=network.dtype)
+        self.task = None
+
+    # Starts running micro batches in the background.
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    # Stops running micro batches.
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    # Returns the (@0) output activations and (@1) prediction of an example (a list of attribute values), once the
+    # micro batch it joins has been run. Raises a ValueError if the example has the wrong number of values.
+    async def predict(self, example):
+        example = np.asarray(example, dtype=self.network.dtype)
+        if example.shape != (self.num_inputs,):
+            raise ValueError("An example must be a list of " + str(self.num_inputs) + " numbers")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((example, future, time.perf_counter()))
+        return await future
+
+    # Runs micro batches for as long as the server runs. Each micro batch starts with the next queued example, and takes
+    # every example that is queued before it is full or its wait is over.
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    items.append(self.queue.get_nowait())
+            self.run_batch(items)
+
+    # Runs a micro batch of queued items through the network in one forward pass, and sets the result of each item's
+    # future.
+    def run_batch(self, items):
+        batch = self.batch[:len(items)]
+        for i, (example, future, arrival_time) in enumerate(items):
+            batch[i] = example
+        try:
+            outputs, predictions = self.network.predict_batch(batch)
+        except Exception as error:
+            # The requests of the micro batch fail, but the server keeps running.
+            for example, future, arrival_time in items:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.stats.add_batch()
+        finish_time = time.perf_counter()
+        for i, (example, future, arrival_time) in enumerate(items):
+            # A request whose connection closed while it waited has a cancelled future.
+            if not future.done():
+                future.set_result((outputs[i], predictions[i]))
+                self.stats.add_request(finish_time - arrival_time)
+
+
+# Serves the predictions of a network to local connections (see the top of this file for the protocol).
+class InferenceServer:
+
+    # Creates a server for a network (an MFNN or RBFNN). See MicroBatcher for max_batch_size and max_wait.
+    def __init__(self, network, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+        self.stats = Stats()
+        self.batcher = MicroBatcher(network, max_batch_size, max_wait, self.stats)
+        self.server = None
+
+    # Starts listening on a Unix socket at socket_path if it is given, and otherwise on a TCP port of the host.
+    async def start(self, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.batcher.start()
+        if socket_path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, socket_path, limit=MAX_LINE_LENGTH)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_LENGTH)
+
+    # Serves connections until the server is stopped (or the task running this is cancelled).
+    async def serve_forever(self):
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    # Stops listening for connections and running micro batches.
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        await self.batcher.stop()
+
+    # Reads the requests of a connection, one per line. Each request is answered in its own task, so the requests of a
+    # connection can join the same micro batch.
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # The line was too long, or the connection was lost.
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.get_running_loop().create_task(self.handle_request(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    # Answers a single request line, writing its response line to the connection. Every request gets a response, and a
+    # request that fails for any reason gets an error response (and is counted as an error).
+    async def handle_request(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object")
+            request_id = request.get('id')
+            if request.get('stats'):
+                response = {'id': request_id, 'stats': self.stats.get_summary()}
+            elif 'example' in request:
+                outputs, prediction = await self.batcher.predict(request['example'])
+                response = {'id': request_id, 'prediction': to_json_value(prediction),
+                            'outputs': [to_json_value(output) for output in outputs]}
+            else:
+                raise ValueError("A request must have an 'example' or 'stats'")
+        except (ValueError, TypeError) as error:
+            # The request itself was invalid.
+            self.stats.add_error()
+            response = {'id': request_id, 'error': str(error)}
+        except Exception as error:
+            # Running the request's micro batch failed.
+            self.stats.add_error()
+            response = {'id': request_id, 'error': type(error).__name__ + ": " + str(error)}
+        try:
+            text = json.dumps(response, allow_nan=False)
+        except ValueError:
+            # The request's id (such as NaN) cannot be written as standard JSON.
+            text = json.dumps({'id': None, 'error': "The request id is not valid JSON"})
+        if not writer.is_closing():
+            writer.write(text.encode("utf-8") + b"\n")
+            await writer.drain()
+
+
+# Serves the network saved in a model file until the process is interrupted.
+async def serve(model_file_name, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT):
+    server = InferenceServer(load_network(model_file_name), max_batch_size, max_wait)
+    await server.start(socket_path, host, port)
+    await server.serve_forever()
+
+
+# Reads the server's options from the command line, and serves the model they name.
+def main():
+    parser = argparse.ArgumentParser(description="Serve the predictions of a saved network.")
+    parser.add_argument("model", help="the model file of the network (see MFNN.save and RBFNN.save)")
+    parser.add_argument("--socket", help="the path of a Unix socket to listen on, instead of a TCP port")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT * 1000)
+    args = parser.parse_args()
+    if args.max_batch_size < 1 or not math.isfinite(args.max_wait_ms) or args.max_wait_ms < 0:
+        parser.error("the max batch size must be positive, and the max wait must not be negative")
+    try:
+        asyncio.run(serve(args.model, args.socket, args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
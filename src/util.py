@@ -3,7 +3,39 @@
 # algorithms from last assignment that find the centers for the RBFNN.
 
 import csv
+import json
+import math
 import operator as op
+import os
+import struct
+import numpy as np
+
+# The float types that the networks and center algorithms can compute in.
+FLOAT_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# The float type used for computation by any network or center algorithm that isn't given its own. Sums that need the
+# accuracy (such as metrics and the least squares fit) are always accumulated in float64.
+float_dtype = np.dtype(np.float64)
+
+
+# Returns the float type used for computation when a model isn't given its own.
+def get_float_dtype():
+    return float_dtype
+
+
+# Sets the float type used for computation when a model isn't given its own, which must be float32 or float64. Only
+# models created afterwards (in this process) are affected.
+def set_float_dtype(dtype):
+    global float_dtype
+    float_dtype = resolve_float_dtype(dtype)
+
+
+# Returns the float type a model should compute in, given the type it was created with (None to use the global one).
+def resolve_float_dtype(dtype=None):
+    dtype = float_dtype if dtype is None else np.dtype(dtype)
+    if dtype not in FLOAT_DTYPES:
+        raise ValueError("Unsupported float type: " + str(dtype))
+    return dtype
 
 
 # Calculates the class distribution of a 2D list of data. The distribution is stored in a dictionary that maps each
@@ -30,6 +62,57 @@ def get_highest_class(classes:dict) -> str:
     return max(classes.items(), key=op.itemgetter(1))[0]
 
 
+# Calculates the squared euclidean distance between every row of the matrix 'a' and every row of the matrix 'b'. Returns
+# a matrix where the value at [i, j] is the squared distance between a[i] and b[j]. This avoids the python loop in
+# DataSet.distance by expanding |a - b|^2 into |a|^2 + |b|^2 - 2ab, which is mostly a single matrix product.
+def squared_distances(a, b):
+    squared = np.sum(a ** 2, axis=1)[:, np.newaxis] + np.sum(b ** 2, axis=1)[np.newaxis, :] - 2 * np.dot(a, b.T)
+    # Rounding error can make the distance between (nearly) identical rows slightly negative.
+    return np.maximum(squared, 0)
+
+
+# The number of rows compared against all other rows at once by 'max_distance'.
+MAX_DISTANCE_BLOCK_SIZE = 1024
+
+# The number of farthest point sweeps done by 'approximate_max_distance'.
+MAX_DISTANCE_SWEEPS = 4
+
+
+# Returns the exact maximum euclidean distance between any two rows of the matrix. Each block of rows is compared against
+# itself and all of the rows after it, so only the upper triangle of the distance matrix is calculated, and at most
+# MAX_DISTANCE_BLOCK_SIZE rows of it are held in memory at once.
+def max_distance(matrix, block_size=MAX_DISTANCE_BLOCK_SIZE):
+    max_squared = 0
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        max_squared = max(max_squared, float(np.max(squared_distances(block, matrix[start:]))))
+    return math.sqrt(max_squared)
+
+
+# Estimates the maximum euclidean distance between any two rows of the matrix using farthest point sweeps: starting
+# from the first row, we repeatedly move to the row farthest from the current one. Each sweep takes a single pass over
+# the rows. Returns (@0) the largest distance seen, which is a lower bound on the maximum distance, and (@1) an upper
+# bound on the maximum distance. Every row is within the distance r of a swept row p (where r is the distance from p to
+# the row farthest from it), so no two rows can be more than 2r apart. This means the estimate is always at least half
+# of the true maximum, and the gap between the bounds shows how much more it could be.
+def approximate_max_distance(matrix, sweeps=MAX_DISTANCE_SWEEPS):
+    if len(matrix) < 2:
+        return 0, 0
+    lower_bound = 0
+    upper_bound = float("inf")
+    current = 0
+    for sweep in range(sweeps):
+        distances = np.sqrt(squared_distances(matrix[current:current + 1], matrix)[0])
+        farthest = int(np.argmax(distances))
+        lower_bound = max(lower_bound, float(distances[farthest]))
+        upper_bound = min(upper_bound, 2 * float(distances[farthest]))
+        # A row that is farthest from its own farthest row will not lead the sweeps anywhere new.
+        if farthest == current:
+            break
+        current = farthest
+    return lower_bound, upper_bound
+
+
 # Creates a 2D list from a file.
 def read_file(filename):
     with open(filename) as csvfile:
@@ -50,4 +133,83 @@ def count_frequency(data):
                 freq[item] += 1
             else:
                 freq[item] = 1
-        return freq
\ No newline at end of file
+        return freq
+
+# The binary file format used to store arrays (such as data sets) so they can be loaded without parsing any text. A file
+# is laid out as:
+# - BINARY_MAGIC (8 bytes), which marks the file as one of ours.
+# - The format version and the length of the header, as little endian 32 bit unsigned ints.
+# - The header, as UTF-8 JSON. It holds the caller's metadata ('meta') and the dtype, shape and offset of each array.
+# - The data of each array, in C order. Each array starts at a multiple of BINARY_ALIGNMENT bytes from the start of the
+#   file, so it can be memory mapped directly.
+BINARY_MAGIC = b"MLNNBIN\0"
+BINARY_VERSION = 1
+BINARY_ALIGNMENT = 64
+
+
+# Returns the smallest multiple of BINARY_ALIGNMENT that is at least 'offset'.
+def align_offset(offset):
+    return -(-offset // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+# Saves the metadata (anything that can be stored as JSON) and the named numpy arrays to a binary file. The file is
+# written to a temporary file first which then replaces the file, so it is never left half written.
+def save_binary(file_name, meta, arrays):
+    array_specs = {}
+    # The offsets of the arrays are from the start of the data (the first aligned offset after the header), since the
+    # length of the header depends on them.
+    offset = 0
+    for name, array in arrays.items():
+        if array.dtype == object:
+            raise ValueError("Cannot save the object array '" + name + "' to a binary file")
+        array_specs[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = align_offset(offset + array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': array_specs}).encode("utf-8")
+    data_start = align_offset(len(BINARY_MAGIC) + 8 + len(header))
+
+    temp_file_name = file_name + ".tmp-" + str(os.getpid())
+    with open(temp_file_name, "wb") as file:
+        file.write(BINARY_MAGIC)
+        file.write(struct.pack("<II", BINARY_VERSION, len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.write(b"\0" * (data_start + array_specs[name]['offset'] - file.tell()))
+            file.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temp_file_name, file_name)
+
+
+# Reads the header of a binary file saved by 'save_binary' from an open file. Returns (@0) the header and (@1) the
+# offset of the start of the array data. Raises a ValueError if the file is not in the binary format, or is from an
+# unsupported version.
+def read_binary_header(file, file_name):
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError(file_name + " is not a binary data file")
+    version, header_length = struct.unpack("<II", file.read(8))
+    if version != BINARY_VERSION:
+        raise ValueError(file_name + " has unsupported binary format version " + str(version))
+    header = json.loads(file.read(header_length).decode("utf-8"))
+    return header, align_offset(len(BINARY_MAGIC) + 8 + header_length)
+
+
+# Returns the metadata of a binary file saved by 'save_binary', reading only its header (none of the arrays are mapped).
+def load_binary_meta(file_name):
+    with open(file_name, "rb") as file:
+        return read_binary_header(file, file_name)[0]['meta']
+
+
+# Loads a binary file saved by 'save_binary'. Returns (@0) the metadata and (@1) a dictionary of the named arrays, which
+# are memory mapped in the given mode ("c", copy on write, by default: the arrays can be changed without changing the
+# file). Raises a ValueError if the file is not in the binary format, or is from an unsupported version.
+def load_binary(file_name, mode="c"):
+    with open(file_name, "rb") as file:
+        header, data_start = read_binary_header(file, file_name)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if math.prod(shape) == 0:
+            # Empty arrays cannot be memory mapped.
+            arrays[name] = np.empty(shape, dtype=spec['dtype'])
+        else:
+            arrays[name] = np.memmap(file_name, dtype=spec['dtype'], mode=mode, offset=data_start + spec['offset'],
+                                     shape=shape)
+    return header['meta'], arrays
@@ -0,0 +1,104 @@
+# conftest.py
+# The fixtures shared by the tests: small data sets made from seeded random numbers, the networks made from them, and
+# arrays for the binary file format.
+# The data set and network fixtures are factories, so each test can make the ones it needs.
+
+import numpy as np
+import pytest
+from src.data.data_set import DataSet
+from src.networks.mfnn import MFNN
+from src.networks.rbfnn import RBFNN, LEAST_SQUARES
+
+# The class values of the classification data sets.
+CLASSES = ['a', 'b', 'c']
+
+
+# Returns a data set of num_rows examples with num_attrs attributes, which are drawn from normal distributions with the
+# given means (loc) and standard deviations (scale). The class of each example depends on how many standard deviations
+# its first attribute is from the mean: the classes split that range into equal parts. For a regression data set
+# (classes=None) the class is a smooth function of the attributes instead. Each of the extra_columns is a function of
+# the row index, whose values are put in front of the attributes, so the attributes start at column len(extra_columns)
+# and the class is the last column.
+def build_data_set(num_rows=60, num_attrs=3, classes=CLASSES, seed=0, loc=0, scale=1, extra_columns=()):
+    rng = np.random.default_rng(seed)
+    standard = rng.normal(size=(num_rows, num_attrs))
+    attrs = loc + scale * standard
+    if classes is None:
+        targets = (np.sin(standard[:, 0]) + .1 * standard[:, -1]).tolist()
+    else:
+        thresholds = np.arange(1, len(classes)) / len(classes) * 2 - 1
+        targets = [classes[i] for i in np.searchsorted(thresholds, standard[:, 0])]
+    rows = [[column(i) for column in extra_columns] + attrs[i].tolist() + [targets[i]] for i in range(num_rows)]
+    first_attr = len(extra_columns)
+    return DataSet(rows, list(range(first_attr, first_attr + num_attrs)), first_attr + num_attrs)
+
+
+# Returns a data set of num_rows examples in normally distributed blobs around the given centers (one per row). The
+# examples cycle through the blobs, so example i is in blob i % len(centers), and its class is the index of its blob.
+def build_blobs(centers, num_rows, seed=0):
+    centers = np.asarray(centers, dtype=float)
+    blobs = np.arange(num_rows) % len(centers)
+    attrs = np.random.default_rng(seed).normal(size=(num_rows, centers.shape[1])) + centers[blobs]
+    num_attrs = centers.shape[1]
+    return DataSet([attr.tolist() + [int(blob)] for attr, blob in zip(attrs, blobs)], list(range(num_attrs)), num_attrs)
+
+
+# Returns an MFNN for the data set (which is also its validation data) with the given hidden layer sizes, and one
+# output per class (or a single output for regression). The weights are drawn after seeding numpy's global generator.
+def build_mfnn(data_set, hidden=(5,), classes=CLASSES, learning_rate=.5, mini_batch_size=8, **kwargs):
+    np.random.seed(0)
+    layer_size = [len(data_set.attr_cols)] + list(hidden) + [1 if classes is None else len(classes)]
+    return MFNN(data_set, data_set, layer_size, learning_rate, 0, 1, classes, mini_batch_size, **kwargs)
+
+
+# Returns an RBFNN for the data set (which is also its validation data), whose centers are every center_step-th
+# example. The weights are drawn after seeding numpy's global generator.
+def build_rbfnn(data_set, center_step=5, classes=CLASSES, learning_rate=.5, **kwargs):
+    np.random.seed(0)
+    return RBFNN(data_set.subset(slice(0, None, center_step)), data_set, data_set, len(data_set.attr_cols),
+                 learning_rate, 1, classes, **kwargs)
+
+
+# Returns arrays with different dtypes and shapes, including an empty array and one that is not C ordered.
+def build_arrays():
+    rng = np.random.default_rng(0)
+    return {'weights': rng.normal(size=(5, 7)), 'labels': np.arange(13, dtype=np.int32),
+            'halves': rng.normal(size=(3, 2, 4)).astype(np.float32), 'empty': np.empty((0, 3)),
+            'transposed': rng.normal(size=(4, 6)).T}
+
+
+@pytest.fixture
+def make_data_set():
+    return build_data_set
+
+
+@pytest.fixture
+def make_blobs():
+    return build_blobs
+
+
+@pytest.fixture
+def make_mfnn():
+    return build_mfnn
+
+
+@pytest.fixture
+def make_rbfnn():
+    return build_rbfnn
+
+
+@pytest.fixture
+def make_arrays():
+    return build_arrays
+
+
+# A trained classification MFNN and RBFNN, and the data set they were trained on. The data set's first column is an
+# id rather than an attribute, so running a network on a whole example has to pick out the attribute columns.
+@pytest.fixture
+def networks():
+    data_set = build_data_set(extra_columns=(float,))
+    mfnn = build_mfnn(data_set)
+    mfnn.train_mini_batch(data_set.get_attr_matrix()[:8], np.eye(3)[[0, 1, 2, 0, 1, 2, 0, 1]])
+    rbfnn = build_rbfnn(data_set, fit_mode=LEAST_SQUARES)
+    rbfnn.train()
+    return mfnn, rbfnn, data_set
@@ -0,0 +1,106 @@
+# test_center.py
+# Tests saving the folds of the center algorithms on a pool of workers: every fold is saved and recorded in the
+# manifest, and a rerun skips the saved folds but redoes any whose files were cut short or removed. Also tests that a
+# fold made with centers from the center cache is the same as one made by finding them.
+
+import functools
+import os
+import pytest
+import src.centers.center as center
+from src.centers.center_cache import CenterCache
+
+# The algorithms run on the test data set.
+ALGORITHMS = [center.K_MEANS, center.PAM]
+
+
+# Points the center module at the data set (named "tiny"), and at a directory of folds and a center cache under the
+# given directory, and returns the directory of folds.
+def use_directory(monkeypatch, directory, data_set):
+    rbf_data_dir = directory / "rbf-data"
+    rbf_data_dir.mkdir()
+    monkeypatch.setattr(center, "RBF_DATA_DIR", str(rbf_data_dir))
+    monkeypatch.setattr(center, "CenterCache", functools.partial(CenterCache, str(directory / "cache")))
+    monkeypatch.setattr(center, "DATA_SETS", {"tiny": (lambda file_name: data_set, "tiny.data")})
+    monkeypatch.setattr(center, "ALGORITHM_DATA_SETS", {alg_name: ["tiny"] for alg_name in ALGORITHMS})
+    monkeypatch.setattr(center, "loaded_data_sets", {})
+    return rbf_data_dir
+
+
+# Returns the contents of every file in the directory, by name.
+def read_files(directory):
+    return {file_name: (directory / file_name).read_bytes() for file_name in os.listdir(directory)}
+
+
+@pytest.fixture
+def saved(tmp_path, monkeypatch, make_data_set):
+    rbf_data_dir = use_directory(monkeypatch, tmp_path, make_data_set())
+    center.save_centers(ALGORITHMS, num_workers=2)
+    return rbf_data_dir
+
+
+def test_every_fold_is_saved_and_recorded(saved, tmp_path, monkeypatch, make_data_set):
+    manifest = center.load_manifest(str(saved))
+    assert len(manifest) == len(ALGORITHMS) * center.NUM_FOLDS
+    for alg_name in ALGORITHMS:
+        for fold_i in range(center.NUM_FOLDS):
+            assert center.is_fold_complete(center.get_fold_file_name("tiny", alg_name, fold_i))
+    # The workers save the same folds as a single process does.
+    single_dir = tmp_path / "single"
+    single_dir.mkdir()
+    use_directory(monkeypatch, single_dir, make_data_set())
+    center.save_centers(ALGORITHMS, num_workers=1)
+    assert read_files(single_dir / "rbf-data") == read_files(saved)
+
+
+def test_rerun_skips_saved_folds(saved, monkeypatch, capsys):
+    files = read_files(saved)
+    capsys.readouterr()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a saved fold was made again")
+    monkeypatch.setattr(center, "make_fold", fail)
+    center.save_centers(ALGORITHMS, num_workers=1)
+    assert "20/20 folds are already saved" in capsys.readouterr().out
+    assert read_files(saved) == files
+
+
+def test_rerun_redoes_cut_short_and_missing_folds(saved, capsys):
+    files = read_files(saved)
+    # Cut a train file short at the end of a line, so it still looks like a whole file, and remove a centers file.
+    cut_file_name = center.get_fold_file_name("tiny", center.K_MEANS, 3) + "-train.txt"
+    with open(cut_file_name) as file:
+        lines = file.readlines()
+    with open(cut_file_name, "w") as file:
+        file.writelines(lines[:-1])
+    removed_fold = center.get_fold_file_name("tiny", center.PAM, 7)
+    os.remove(removed_fold + "-centers.txt")
+    assert not center.is_fold_complete(cut_file_name[:-len("-train.txt")])
+    assert not center.is_fold_complete(removed_fold)
+    capsys.readouterr()
+    center.save_centers(ALGORITHMS, num_workers=2)
+    output = capsys.readouterr().out
+    assert "18/20 folds are already saved" in output
+    assert "2/2 tiny-" in output
+    assert read_files(saved) == files
+
+
+@pytest.mark.parametrize("alg_name", [center.EDITED_KNN, center.K_MEANS, center.PAM])
+def test_cached_centers_make_the_same_fold(tmp_path, monkeypatch, make_data_set, alg_name):
+    # The first column holds strings that look like numbers, which have to come back from the cache as strings for the
+    # centers to be found in (and removed from) the training data.
+    data_set = make_data_set(extra_columns=(lambda i: str(float(i % 4)),))
+    use_directory(monkeypatch, tmp_path, data_set)
+    cache = CenterCache(str(tmp_path / "cache"))
+    missed = center.make_fold(alg_name, "tiny", 2, cache)
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+    def fail():
+        raise AssertionError("the centers were found again")
+    monkeypatch.setattr(center, "find_center_rows", lambda *args: fail())
+    hit = center.make_fold(alg_name, "tiny", 2, cache)
+    for missed_part, hit_part in zip(missed, hit):
+        assert hit_part.get_data() == missed_part.get_data()
+    if alg_name != center.K_MEANS:
+        # Every center was removed from the training data.
+        test, train, centers = hit
+        assert train.get_len() + centers.get_len() + test.get_len() == data_set.get_len()
@@ -0,0 +1,26 @@
+# test_center_cache.py
+# Tests that the center cache gives back exactly the center sets stored in it, and only for the same input.
+
+from src.centers.center_cache import CenterCache
+
+
+def test_hit_returns_the_stored_rows(tmp_path, make_data_set):
+    cache = CenterCache(str(tmp_path))
+    rows = [["0.0", 1.5, None, 3, "M"], ["1", -0.1 / 3, 1e-300, 0, "None"]]
+    calls = []
+    training_data = make_data_set()
+    missed = cache.get_centers(training_data, "pam", {'k': 2}, lambda: calls.append(1) or rows)
+    hit = cache.get_centers(training_data, "pam", {'k': 2}, lambda: calls.append(1) or rows)
+    assert len(calls) == 1
+    assert missed == hit == rows
+    assert [[type(value) for value in row] for row in hit] == [[type(value) for value in row] for row in rows]
+
+
+def test_different_inputs_miss(tmp_path, make_data_set):
+    cache = CenterCache(str(tmp_path))
+    training_data = make_data_set()
+    cache.get_centers(training_data, "pam", {'k': 2}, lambda: [[1.0]])
+    assert cache.get(cache.get_key(training_data, "pam", {'k': 3})) is None
+    assert cache.get(cache.get_key(training_data, "kmeans", {'k': 2})) is None
+    assert cache.get(cache.get_key(make_data_set(seed=1), "pam", {'k': 2})) is None
+
@@ -0,0 +1,68 @@
+# test_data_set.py
+# Tests the columnar storage of DataSet, and that subsets, partitions, and folds behave like independent data sets.
+
+import math
+import numpy as np
+
+
+def test_columns_are_packed_into_features(make_data_set):
+    data_set = make_data_set(20, 2)
+    assert data_set.features.shape == (20, 2)
+    assert np.shares_memory(data_set.get_column(0), data_set.features)
+    row = data_set.data[3]
+    assert row[:2] == tuple(data_set.features[3].tolist())
+    assert row[2] == data_set.get_class_array()[3]
+
+
+def test_partitions_start_as_views(make_data_set):
+    data_set = make_data_set(20, 2)
+    first, second = data_set.partition(.5)
+    assert np.shares_memory(first.features, data_set.features)
+    assert first.get_len() == 10 and second.get_len() == 10
+    assert second.data[0] == data_set.data[10]
+
+
+def test_normalizing_a_partition_does_not_change_the_data_set(make_data_set):
+    data_set = make_data_set(20, 2)
+    rows = list(data_set.data)
+    features = data_set.features.copy()
+    first, second = data_set.partition(.5)
+    first.normalize_z_score([0, 1])
+    assert np.array_equal(data_set.features, features)
+    assert data_set.data == rows
+    assert second.data == rows[10:]
+    assert not np.shares_memory(first.features, data_set.features)
+    # The partition itself is normalized.
+    assert abs(np.mean(first.get_column(0))) < 1e-12
+
+
+def test_changing_a_fold_part_does_not_change_the_data_set(make_data_set):
+    data_set = make_data_set(20, 2)
+    column = data_set.get_column(0).tolist()
+    max_distance = data_set.get_max_distance()
+    fold = data_set.validation_folds(4)[1]
+    test = fold['test']
+    assert np.shares_memory(test.features, data_set.features)
+    test.set_column(0, np.zeros(test.get_len()))
+    test.convert_str_attribute(1, {})
+    assert data_set.get_column(0).tolist() == column
+    assert data_set.get_max_distance() == max_distance
+    assert test.get_column(0).tolist() == [0.0] * test.get_len()
+
+
+def test_subset_with_indices_copies(make_data_set):
+    data_set = make_data_set(20, 2)
+    subset = data_set.subset(np.array([3, 1, 2]))
+    assert not np.shares_memory(subset.features, data_set.features)
+    assert subset.data == [data_set.data[3], data_set.data[1], data_set.data[2]]
+
+
+def test_stratified_folds_balance_classes(make_data_set):
+    data_set = make_data_set(40, 2)
+    classes = data_set.get_class_array().tolist()
+    for fold in data_set.validation_folds(5, stratified=True):
+        test_classes = fold['test'].get_class_array().tolist()
+        # Each class is split as evenly as it can be between the folds.
+        for cls in set(classes):
+            assert math.floor(classes.count(cls) / 5) <= test_classes.count(cls) <= math.ceil(classes.count(cls) / 5)
+        assert fold['train'].get_len() + fold['test'].get_len() == 40
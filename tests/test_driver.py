@@ -0,0 +1,107 @@
+# test_driver.py
+# Tests that the driver's cross validation runs can be repeated exactly, in one process or on a pool of workers, that
+# the MFNN jobs share their data set with the workers rather than holding copies of it, and that RBFNN experiments
+# whose folds cannot be loaded are skipped.
+
+import pickle
+import random
+import numpy as np
+import pytest
+import src.centers.center as center
+import src.driver as driver
+
+
+# A job that returns the first random numbers of its worker, so the output shows how the job was seeded.
+def draw_random_numbers(fold_test_rows):
+    return fold_test_rows + random.random() + np.random.random()
+
+
+# Loads a data set the way the driver does (shuffling it) after seeding, and returns the experiments of its folds along
+# with the seed used.
+def get_experiments(make_data_set, seed):
+    seed = driver.seed_random(seed)
+    data_set = make_data_set(50, 2)
+    data_set.shuffle()
+    folds = data_set.validation_folds(5, stratified=True)
+    jobs = [(draw_random_numbers, (float(np.sum(fold['test'].get_attr_matrix())),)) for fold in folds]
+    return [{'lines': ["Random"], 'metric': "Number", 'jobs': jobs}], seed
+
+
+def test_seed_random_repeats_the_folds(make_data_set):
+    seed = driver.seed_random()
+    first = make_data_set(50, 2)
+    first.shuffle()
+    driver.seed_random(seed)
+    second = make_data_set(50, 2)
+    second.shuffle()
+    assert first.data == second.data
+    assert np.array_equal(first.get_fold_assignment(5, True), second.get_fold_assignment(5, True))
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_runs_with_the_same_seed_print_the_same_results(make_data_set, capsys, num_workers):
+    outputs = []
+    for run in range(2):
+        experiments, seed = get_experiments(make_data_set, 7)
+        driver.run_experiments(experiments, num_workers, seed)
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1]
+    experiments, seed = get_experiments(make_data_set, 8)
+    driver.run_experiments(experiments, num_workers, seed)
+    assert capsys.readouterr().out != outputs[0]
+
+
+# Stands in for get_rbf_data, with abalone's folds incomplete and every other data set having no folds.
+def get_rbf_data_without_abalone(data_set_name, data_opener, generate_missing=False):
+    if data_set_name.startswith("abalone-"):
+        raise ValueError("The files of fold 0 of " + data_set_name + " are missing or incomplete")
+    return []
+
+
+@pytest.mark.parametrize("center_alg_name", [center.EDITED_KNN, center.K_MEANS, center.PAM])
+def test_experiments_with_incomplete_folds_are_skipped(monkeypatch, capsys, center_alg_name):
+    monkeypatch.setattr(driver, "get_rbf_data", get_rbf_data_without_abalone)
+    experiments = driver.get_rbfnn_classification_experiments(center_alg_name)
+    assert [experiment['lines'][0] for experiment in experiments] == ["car-" + center_alg_name,
+                                                                      "segmentation-" + center_alg_name]
+    assert capsys.readouterr().out == ("Skipping abalone-" + center_alg_name + ": The files of fold 0 of abalone-"
+                                       + center_alg_name + " are missing or incomplete\n")
+    assert len(driver.get_rbfnn_regression_experiments(center_alg_name)) == len(
+        center.ALGORITHM_DATA_SETS[center_alg_name]) - 3
+
+
+# A job that stands in for train_mfnn_fold, and returns a summary of its fold.
+def summarize_fold(fold, *args):
+    return float(np.sum(fold['test'].get_attr_matrix())) + 1000 * fold['train'].get_len()
+
+
+# Returns the MFNN experiments on a data set, with the jobs summarizing their folds instead of training networks.
+def get_summary_experiments(data_set):
+    experiments = driver.get_mfnn_experiments(data_set, ['a', 'b', 'c'], 3, .5, 0, 1, 4)
+    for experiment in experiments:
+        experiment['jobs'] = [(summarize_fold, args) for function, args in experiment['jobs']]
+    return experiments
+
+
+def test_mfnn_jobs_only_hold_their_fold_index(make_data_set):
+    data_set = make_data_set(2000, 5)
+    experiments = driver.get_mfnn_experiments(data_set, ['a', 'b', 'c'], 3, .5, 0, 1, 4)
+    assert len(experiments) == 3 and all(len(experiment['jobs']) == 10 for experiment in experiments)
+    for experiment in experiments:
+        for function, args in experiment['jobs']:
+            assert isinstance(args[0], driver.SharedFold)
+            assert len(pickle.dumps((function, args))) < len(pickle.dumps(data_set)) / 50
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_shared_folds_are_the_data_set_folds(make_data_set, capsys, num_workers):
+    data_set = make_data_set(200, 3)
+    driver.run_experiments(get_summary_experiments(data_set), num_workers, 0)
+    output = capsys.readouterr().out
+    folds = data_set.validation_folds(10, stratified=True)
+    expected = [summarize_fold(fold) for fold in folds]
+    assert output.count("Fold: ") == 30
+    for fold_i, summary in enumerate(expected):
+        assert output.count("Fold: " + str(fold_i + 1) + " - Accuracy: " + str(summary) + "\n") == 3
+    # The data set is no longer held once the run is over.
+    assert driver.worker_data_sets == {}
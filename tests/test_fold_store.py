@@ -0,0 +1,72 @@
+# test_fold_store.py
+# Tests that folds saved to binary fold files load back as the same data sets, and that only text folds that were
+# saved completely are converted.
+
+import os
+import shutil
+import numpy as np
+import src.centers.center as center
+import src.data.data_set as d
+import src.data.fold_store as fold_store
+
+# The text fold copied from /rbf-data/ by the conversion test.
+TEXT_FOLD = "car-kmeans-fold-0"
+
+
+# Returns a data set whose examples are (name, weight, x, y, class): a text column and a numeric column that are
+# neither attributes nor the class.
+def get_data_set(make_data_set):
+    return make_data_set(30, 2, extra_columns=(lambda i: "row" + str(i), float))
+
+
+# Checks that each data set of the loaded fold is the same as the one in the saved fold.
+def assert_same_fold(loaded, fold):
+    assert sorted(loaded) == sorted(fold)
+    for part in fold:
+        assert loaded[part].data == fold[part].data
+        assert loaded[part].attr_cols == fold[part].attr_cols and loaded[part].class_col == fold[part].class_col
+        assert np.array_equal(loaded[part].get_attr_matrix(), fold[part].get_attr_matrix())
+        assert loaded[part].get_class_array().tolist() == fold[part].get_class_array().tolist()
+
+
+def test_fold_round_trip(tmp_path, make_data_set):
+    data_set = get_data_set(make_data_set)
+    fold = {'train': data_set.subset(slice(0, 20)), 'test': data_set.subset(slice(20, 30)),
+            'center': data_set.subset([0, 5, 10])}
+    file_name = fold_store.get_fold_file_name("rows-kmeans", 3, str(tmp_path))
+    assert file_name.endswith("rows-kmeans-fold-3" + fold_store.FOLD_FILE_EXTENSION)
+    fold_store.save_fold(file_name, fold)
+    assert_same_fold(fold_store.load_fold(file_name), fold)
+
+
+def test_loaded_folds_can_be_changed_without_changing_the_file(tmp_path, make_data_set):
+    data_set = get_data_set(make_data_set)
+    fold = {'train': data_set, 'test': data_set.subset(slice(0, 5)), 'center': data_set.subset(slice(0, 3))}
+    file_name = str(tmp_path / "rows.fold")
+    fold_store.save_fold(file_name, fold)
+    loaded = fold_store.load_fold(file_name)
+    loaded['train'].normalize_z_score([2, 3])
+    assert np.array_equal(fold_store.load_fold(file_name)['train'].get_attr_matrix(), data_set.get_attr_matrix())
+
+
+def test_only_complete_text_folds_are_converted(tmp_path):
+    # Copy a saved fold, along with a copy whose train file was cut short after it was recorded in the manifest.
+    cut_fold = TEXT_FOLD.replace("fold-0", "fold-1")
+    for suffix in center.FOLD_SUFFIXES:
+        shutil.copy(os.path.join(center.RBF_DATA_DIR, TEXT_FOLD + suffix), tmp_path / (TEXT_FOLD + suffix))
+        shutil.copy(os.path.join(center.RBF_DATA_DIR, TEXT_FOLD + suffix), tmp_path / (cut_fold + suffix))
+    manifest = {name: center.get_fold_sizes(str(tmp_path / name)) for name in (TEXT_FOLD, cut_fold)}
+    center.save_manifest(manifest, str(tmp_path))
+    with open(tmp_path / (cut_fold + "-train.txt")) as file:
+        lines = file.readlines()
+    with open(tmp_path / (cut_fold + "-train.txt"), "w") as file:
+        file.writelines(lines[:-1])
+    written = fold_store.convert_text_folds(str(tmp_path))
+    assert written == [str(tmp_path / (TEXT_FOLD + fold_store.FOLD_FILE_EXTENSION))]
+    loaded = fold_store.load_fold(written[0])
+    for part, suffix in fold_store.FOLD_PARTS.items():
+        # The text files are shuffled when they are opened, so the rows can be in a different order.
+        text_data = d.get_car_data(str(tmp_path / (TEXT_FOLD + suffix)), False)
+        assert sorted(loaded[part].data, key=repr) == sorted(text_data.data, key=repr)
+    # Folds that are already converted are skipped.
+    assert fold_store.convert_text_folds(str(tmp_path)) == []
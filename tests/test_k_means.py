@@ -0,0 +1,71 @@
+# test_k_means.py
+# Tests that K-Means with Hamerly's bounds gives the same clusters as plain Lloyd iterations, and the chunking of mini
+# batch K-Means.
+
+import numpy as np
+import src.centers.k_means as k_means
+import src.centers.mini_batch_k_means as mini_batch_k_means
+from src.centers.k_means import KMeans
+from src.centers.mini_batch_k_means import MiniBatchKMeans
+
+# The centers of the blobs the test data sets are drawn from, which are close enough for the blobs to overlap a little.
+CENTERS = [(0, 0, 0), (4, 0, 0), (0, 4, 0), (2, 2, 4)]
+
+
+# Returns the centroids found by Lloyd's algorithm (comparing every observation with every centroid in each iteration)
+# from the given starting centroids, using the same stopping rule as KMeans.
+def lloyd(observations, centroids, k):
+    distortion = None
+    while True:
+        distances = np.sqrt(np.sum((observations[:, np.newaxis] - centroids) ** 2, axis=2))
+        assignments = np.argmin(distances, axis=1)
+        new_centroids = centroids.copy()
+        for i in range(k):
+            if np.any(assignments == i):
+                new_centroids[i] = observations[assignments == i].mean(axis=0)
+        new_distortion = np.sum(np.sqrt(np.sum((observations - new_centroids[assignments]) ** 2, axis=1)))
+        centroids = new_centroids
+        change = None if distortion is None else abs((new_distortion - distortion) / distortion)
+        if change is not None and change < k_means.DISTORTION_CHANGE_CUTOFF:
+            return centroids, new_distortion
+        distortion = new_distortion
+
+
+def test_hamerly_matches_lloyd(make_blobs):
+    data_set = make_blobs(CENTERS, 400)
+    for seed in range(5):
+        np.random.seed(seed)
+        kmeans = KMeans(data_set, 6, dtype=np.float64)
+        np.random.seed(seed)
+        start = kmeans.generate_random_centroids()
+        centroids, distortion = lloyd(data_set.get_attr_matrix(), start, 6)
+        np.testing.assert_allclose(kmeans.centroid_matrix, centroids, rtol=1e-9, atol=1e-9)
+        assert np.isclose(kmeans.distortion, distortion, rtol=1e-9)
+
+
+def test_chunk_size_fits_the_budget():
+    num_attrs, k, batch_size = 10, 50, 256
+    batch_bytes = 4 * batch_size * (num_attrs + k)
+    chunk_size = mini_batch_k_means.get_chunk_size(batch_bytes + 8 * num_attrs * 100, num_attrs, k, batch_size,
+                                                   np.float32, np.float64)
+    assert chunk_size == 100
+    # A budget too small for even one observation still gives chunks of one.
+    assert mini_batch_k_means.get_chunk_size(0, num_attrs, k) == 1
+
+
+def test_chunking_does_not_change_the_centroids(make_blobs):
+    data_set = make_blobs(CENTERS, 400)
+    matrix = data_set.get_attr_matrix()
+    whole = MiniBatchKMeans(lambda: [matrix], 4, batch_size=50, dtype=np.float64)
+    # Chunks that are a multiple of the batch size give the same mini batches.
+    chunked = MiniBatchKMeans(lambda: data_set.iter_attr_chunks(100), 4, batch_size=50, dtype=np.float64)
+    assert np.array_equal(whole.centroids, chunked.centroids)
+    assert whole.distortion == chunked.distortion
+    rows = whole.get_centroid_rows(data_set.attr_cols, data_set.num_cols)
+    assert len(rows) == 4 and rows[0][3] is None
+
+
+def test_from_data_set_streams_the_data_set(make_blobs):
+    kmeans = MiniBatchKMeans.from_data_set(make_blobs(CENTERS, 400), 4, dtype=np.float32)
+    assert kmeans.centroids.dtype == np.float32
+    assert kmeans.centroids.shape == (4, 3)
@@ -0,0 +1,97 @@
+# test_mfnn.py
+# Tests the MFNN's batch forward and backward passes against a direct, example by example calculation, including
+# batches of different sizes run through the same workspace.
+
+import numpy as np
+import pytest
+from src.networks.mfnn import BIAS_ACTIVATION
+
+CLASSES = ['a', 'b', 'c']
+
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-z))
+
+
+# Returns the activations of each layer for a single example, with the bias activation appended to every layer except
+# the output layer.
+def reference_feed_forward(weights, example, regression):
+    activations = [np.append(example, BIAS_ACTIVATION)]
+    for i, weight in enumerate(weights):
+        output = np.dot(weight, activations[-1])
+        if not (regression and i == len(weights) - 1):
+            output = sigmoid(output)
+        activations.append(output if i == len(weights) - 1 else np.append(output, BIAS_ACTIVATION))
+    return activations
+
+
+# Returns the gradient of the squared error for a single example, one matrix per weight matrix.
+def reference_back_propagation(weights, example, expected, regression):
+    activations = reference_feed_forward(weights, example, regression)
+    delta = activations[-1] - expected
+    if not regression:
+        delta = delta * activations[-1] * (1 - activations[-1])
+    gradients = [np.outer(delta, activations[-2])]
+    for i in range(len(weights) - 1, 0, -1):
+        hidden = activations[i][:-1]
+        delta = np.dot(weights[i][:, :-1].T, delta) * hidden * (1 - hidden)
+        gradients.insert(0, np.outer(delta, activations[i - 1]))
+    return gradients
+
+
+# Returns an MFNN with two hidden layers for a data set of seven examples, along with the examples and their expected
+# outputs (one per row), which are the batch the tests run.
+def get_network_and_batch(make_data_set, make_mfnn, regression):
+    classes = None if regression else CLASSES
+    data_set = make_data_set(7, 4, classes=classes)
+    mfnn = make_mfnn(data_set, hidden=(5, 3), classes=classes, learning_rate=.3, mini_batch_size=7, dtype=np.float64)
+    expected = np.array([mfnn.get_class_array(cls) for cls in data_set.get_class_array().tolist()], dtype=float)
+    return mfnn, data_set.get_attr_matrix(), expected
+
+
+@pytest.mark.parametrize("regression", [False, True])
+def test_batch_matches_reference(make_data_set, make_mfnn, regression):
+    mfnn, examples, expected = get_network_and_batch(make_data_set, make_mfnn, regression)
+    weights = [weight.copy() for weight in mfnn.weights]
+    activations = mfnn.get_batch_activation(examples)
+    references = [reference_feed_forward(weights, example, regression) for example in examples]
+    for layer_i, activation in enumerate(activations):
+        np.testing.assert_allclose(activation, [reference[layer_i] for reference in references], rtol=1e-12)
+    gradients = mfnn.batch_back_propagation(examples, expected)
+    reference_gradients = [reference_back_propagation(weights, example, target, regression)
+                           for example, target in zip(examples, expected)]
+    for layer_i, gradient in enumerate(gradients):
+        np.testing.assert_allclose(gradient, sum(reference[layer_i] for reference in reference_gradients), rtol=1e-10,
+                                   atol=1e-14)
+
+
+def test_workspace_is_reused_for_smaller_batches(make_data_set, make_mfnn):
+    mfnn, examples, expected = get_network_and_batch(make_data_set, make_mfnn, False)
+    weights = [weight.copy() for weight in mfnn.weights]
+    storage = mfnn.workspace.activation_storage
+    for num_rows in (7, 3, 1, 5):
+        outputs, predictions = mfnn.predict_batch(examples[:num_rows])
+        reference = [reference_feed_forward(weights, example, False)[-1] for example in examples[:num_rows]]
+        np.testing.assert_allclose(outputs, reference, rtol=1e-12)
+        assert predictions.tolist() == [CLASSES[i] for i in np.argmax(reference, axis=1)]
+    # None of the batches were larger than the mini batch size, so the buffers were never reallocated.
+    assert all(a is b for a, b in zip(mfnn.workspace.activation_storage, storage))
+    np.testing.assert_allclose(mfnn.run(examples[2]), reference_feed_forward(weights, examples[2], False)[-1],
+                               rtol=1e-12)
+    # A larger batch grows the workspace.
+    batch = np.concatenate([examples, examples[::-1]])
+    outputs, predictions = mfnn.predict_batch(batch)
+    assert mfnn.workspace.capacity == len(batch)
+    np.testing.assert_allclose(outputs, [reference_feed_forward(weights, example, False)[-1] for example in batch],
+                               rtol=1e-12)
+
+
+def test_train_mini_batch_takes_an_averaged_step(make_data_set, make_mfnn):
+    mfnn, examples, expected = get_network_and_batch(make_data_set, make_mfnn, False)
+    weights = [weight.copy() for weight in mfnn.weights]
+    reference_gradients = [reference_back_propagation(weights, example, target, False)
+                           for example, target in zip(examples, expected)]
+    mfnn.train_mini_batch(examples, expected)
+    for layer_i, weight in enumerate(mfnn.weights):
+        gradient = sum(reference[layer_i] for reference in reference_gradients) / len(examples)
+        np.testing.assert_allclose(weight, weights[layer_i] - .3 * gradient, rtol=1e-10, atol=1e-14)
@@ -0,0 +1,79 @@
+# test_model_file.py
+# Tests saving networks to model files and running the frozen networks loaded from them.
+
+import numpy as np
+import pytest
+import src.networks.model_file as model_file
+from src.networks.mfnn import MFNN
+from src.networks.rbfnn import RBFNN
+
+
+@pytest.mark.parametrize("network_i", [0, 1])
+def test_loaded_network_predicts_the_same(tmp_path, networks, network_i):
+    network, data_set = networks[network_i], networks[2]
+    file_name = str(tmp_path / "model.bin")
+    network.save(file_name)
+    loaded = type(network).load(file_name)
+    examples = data_set.get_attr_matrix()
+    outputs, predictions = network.predict_batch(examples)
+    loaded_outputs, loaded_predictions = loaded.predict_batch(examples)
+    assert np.array_equal(outputs, loaded_outputs)
+    assert np.array_equal(predictions, loaded_predictions)
+    assert loaded.dtype == network.dtype
+
+
+def test_loaded_mfnn_runs_single_examples(tmp_path, networks):
+    mfnn, rbfnn, data_set = networks
+    mfnn.save(str(tmp_path / "mfnn.bin"))
+    loaded = MFNN.load(str(tmp_path / "mfnn.bin"))
+    example = data_set.get_attr_matrix()[0]
+    assert np.array_equal(loaded.run(example), mfnn.run(example))
+
+
+def test_loaded_rbfnn_runs_single_examples(tmp_path, networks):
+    mfnn, rbfnn, data_set = networks
+    rbfnn.save(str(tmp_path / "rbfnn.bin"))
+    loaded = RBFNN.load(str(tmp_path / "rbfnn.bin"))
+    assert loaded.training_data is None
+    assert loaded.std_dev == rbfnn.std_dev
+    # The saved weights are C ordered while the fit weights may not be, so the products can differ in the last bit.
+    for example in data_set.data[:5]:
+        np.testing.assert_allclose(loaded.run(example), rbfnn.run(example), rtol=1e-12)
+
+
+def test_loaded_networks_are_frozen(tmp_path, networks):
+    for network in networks[:2]:
+        file_name = str(tmp_path / "model.bin")
+        network.save(file_name)
+        loaded = type(network).load(file_name)
+        with pytest.raises(ValueError):
+            loaded.train()
+        # The weights are memory mapped read only.
+        weights = loaded.weights[0] if isinstance(loaded, MFNN) else loaded.weights
+        assert not weights.flags.writeable
+
+
+def test_regression_mfnn_round_trip(tmp_path, make_data_set, make_mfnn):
+    data_set = make_data_set(classes=None)
+    mfnn = make_mfnn(data_set, hidden=(4,), classes=None)
+    mfnn.save(str(tmp_path / "mfnn.bin"))
+    loaded = MFNN.load(str(tmp_path / "mfnn.bin"))
+    assert loaded.is_regression()
+    examples = data_set.get_attr_matrix()
+    assert np.array_equal(loaded.predict_batch(examples)[1], mfnn.predict_batch(examples)[1])
+
+
+def test_load_checks_model_type(tmp_path, networks):
+    networks[1].save(str(tmp_path / "rbfnn.bin"))
+    assert model_file.get_model_type(str(tmp_path / "rbfnn.bin")) == "rbfnn"
+    with pytest.raises(ValueError):
+        MFNN.load(str(tmp_path / "rbfnn.bin"))
+
+
+def test_model_type_is_read_from_the_header_alone(tmp_path, networks, monkeypatch):
+    networks[0].save(str(tmp_path / "mfnn.bin"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("an array was memory mapped")
+    monkeypatch.setattr(np, "memmap", fail)
+    assert model_file.get_model_type(str(tmp_path / "mfnn.bin")) == "mfnn"
@@ -0,0 +1,66 @@
+# test_neighbor_index.py
+# Tests that the neighbor indexes find the same neighbors as a direct search, and that Edited-KNN gives the same result
+# with either index.
+
+import numpy as np
+import pytest
+from src.centers import neighbor_index
+from src.centers.edited_knn import EditedKNN
+
+INDEX_TYPES = [neighbor_index.BRUTE_FORCE, neighbor_index.KD_TREE]
+
+
+# Returns the distances and indices of the k nearest points to each query found by sorting every distance, in the same
+# format as the indexes' queries.
+def direct_query(points, queries, k, active, exclude=None):
+    distances = np.sqrt(np.sum((queries[:, np.newaxis] - points) ** 2, axis=2))
+    distances[:, ~active] = np.inf
+    if exclude is not None:
+        distances[np.arange(len(queries)), exclude] = np.inf
+    indices = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    nearest = np.take_along_axis(distances, indices, axis=1)
+    indices[np.isinf(nearest)] = -1
+    return nearest, indices
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_query_matches_direct_search(index_type):
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(300, 4))
+    queries = rng.normal(size=(50, 4))
+    index = neighbor_index.make_index(points, index_type)
+    distances, indices = index.query(queries, 7)
+    expected_distances, expected_indices = direct_query(points, queries, 7, np.ones(300, dtype=bool))
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-9, atol=1e-9)
+    assert np.array_equal(indices, expected_indices)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_removed_and_excluded_points_are_skipped(index_type):
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(120, 3))
+    index = neighbor_index.make_index(points, index_type)
+    removed = rng.choice(120, 40, replace=False)
+    index.remove(removed)
+    active = np.ones(120, dtype=bool)
+    active[removed] = False
+    exclude = np.arange(120)
+    distances, indices = index.query(points, 5, exclude)
+    expected_distances, expected_indices = direct_query(points, points, 5, active, exclude)
+    assert np.array_equal(indices, expected_indices)
+    assert not np.isin(indices, removed).any()
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_fewer_points_than_k(index_type):
+    points = np.arange(6, dtype=float).reshape(3, 2)
+    distances, indices = neighbor_index.make_index(points, index_type).query(points[:1], 5)
+    assert indices[0].tolist() == [0, 1, 2, -1, -1]
+    assert np.isinf(distances[0, 3:]).all()
+
+
+def test_edited_knn_is_the_same_with_either_index(make_data_set):
+    data_set = make_data_set(200, 3, classes=[0, 1], seed=2)
+    edited = [EditedKNN(data_set, 5, index_type).training_data.get_data() for index_type in INDEX_TYPES]
+    assert edited[0] == edited[1]
+    assert 0 < len(edited[0]) < 200
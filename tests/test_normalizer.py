@@ -0,0 +1,63 @@
+# test_normalizer.py
+# Tests that the streaming normalizer finds the same statistics however the data is split up, and that it normalizes
+# other data sets without changing them.
+
+import numpy as np
+from src.data.normalizer import Normalizer
+
+# The means and standard deviations of the attributes, which are on very different scales. The last attribute is
+# constant.
+LOC = [5, -3, 100, 7]
+SCALE = [1, 10, .01, 0]
+
+
+def test_fit_matches_direct_statistics(make_data_set):
+    matrix = make_data_set(500, 4, loc=LOC, scale=SCALE).get_attr_matrix()
+    normalizer = Normalizer.fit(matrix)
+    assert normalizer.count == len(matrix)
+    np.testing.assert_allclose(normalizer.mean, matrix.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(normalizer.m2, np.sum((matrix - matrix.mean(axis=0)) ** 2, axis=0), rtol=1e-10,
+                               atol=1e-10)
+
+
+def test_chunked_updates_and_merges_match_a_single_fit(make_data_set):
+    matrix = make_data_set(500, 4, loc=LOC, scale=SCALE).get_attr_matrix()
+    whole = Normalizer.fit(matrix)
+    chunked = Normalizer(4)
+    for start in range(0, len(matrix), 37):
+        chunked.update(matrix[start:start + 37])
+    merged = Normalizer.fit(matrix[:123])
+    merged.merge(Normalizer.fit(matrix[123:]))
+    merged.merge(Normalizer(4))
+    for normalizer in (chunked, merged):
+        assert normalizer.count == whole.count
+        np.testing.assert_allclose(normalizer.mean, whole.mean, rtol=1e-12)
+        np.testing.assert_allclose(normalizer.m2, whole.m2, rtol=1e-9, atol=1e-12)
+
+
+def test_transform_uses_the_fit_statistics(make_data_set):
+    matrix = make_data_set(500, 4, loc=LOC, scale=SCALE).get_attr_matrix()
+    normalizer = Normalizer.fit(matrix[:300])
+    transformed = normalizer.transform(matrix[300:])
+    expected = (matrix[300:, :3] - matrix[:300, :3].mean(axis=0)) / normalizer.get_scale()[:3]
+    np.testing.assert_allclose(transformed[:, :3], expected, rtol=1e-10)
+    # The constant attribute has no spread, so it is normalized to zeros.
+    assert np.array_equal(transformed[:, 3], np.zeros(200))
+
+
+def test_transform_data_set_leaves_the_data_set_unchanged(make_data_set):
+    data_set = make_data_set(20, 4, loc=LOC, scale=SCALE)
+    matrix = data_set.get_attr_matrix().copy()
+    train, test = data_set.partition(.5)
+    normalizer = Normalizer.fit_data_set(train, chunk_size=3)
+    normalized = normalizer.transform_data_set(test)
+    assert np.array_equal(test.get_attr_matrix(), matrix[10:])
+    np.testing.assert_allclose(normalized.get_attr_matrix(), normalizer.transform(matrix[10:]))
+    assert normalized.get_class_array().tolist() == test.get_class_array().tolist()
+
+
+def test_normalize_z_score_matches_normalizer(make_data_set):
+    data_set = make_data_set(20, 4, loc=LOC, scale=SCALE)
+    matrix = data_set.get_attr_matrix().copy()
+    data_set.normalize_z_score([0, 1, 2, 3])
+    np.testing.assert_allclose(data_set.get_attr_matrix(), Normalizer.fit(matrix).transform(matrix))
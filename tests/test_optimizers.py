@@ -0,0 +1,102 @@
+# test_optimizers.py
+# Tests the optimizers against direct implementations of their update rules, and that both networks build the optimizer
+# they are given.
+
+import math
+import numpy as np
+import pytest
+import src.networks.optimizers as optimizers
+
+LEARNING_RATE = .1
+MOMENTUM = .9
+
+
+# Returns the weights after each of the given optimizer's updates with a fixed series of gradients, along with the
+# series of gradients.
+def run_optimizer(optimizer, num_steps=5):
+    rng = np.random.default_rng(0)
+    weights = rng.normal(size=(3, 4))
+    gradients = [rng.normal(size=(3, 4)) for step in range(num_steps)]
+    history = []
+    for gradient in gradients:
+        # The optimizers overwrite the gradients, so they are given copies.
+        optimizer.step([weights], [gradient.copy()])
+        history.append(weights.copy())
+    return history, gradients
+
+
+# Returns the weights after each update of a direct implementation of an update rule, which maps (weights, gradient,
+# state, step number) to the new weights.
+def run_reference(update, num_steps=5):
+    rng = np.random.default_rng(0)
+    weights = rng.normal(size=(3, 4))
+    gradients = [rng.normal(size=(3, 4)) for step in range(num_steps)]
+    state = {}
+    history = []
+    for step, gradient in enumerate(gradients, 1):
+        weights = update(weights, gradient, state, step)
+        history.append(weights.copy())
+    return history
+
+
+def sgd_update(weights, gradient, state, step):
+    return weights - LEARNING_RATE * gradient
+
+
+def momentum_update(weights, gradient, state, step):
+    state['v'] = MOMENTUM * state.get('v', 0) + gradient
+    return weights - LEARNING_RATE * state['v']
+
+
+def nesterov_update(weights, gradient, state, step):
+    state['v'] = MOMENTUM * state.get('v', 0) + gradient
+    return weights - LEARNING_RATE * (gradient + MOMENTUM * state['v'])
+
+
+def rmsprop_update(weights, gradient, state, step):
+    decay = optimizers.RMSPROP_DECAY
+    state['s'] = decay * state.get('s', 0) + (1 - decay) * gradient ** 2
+    return weights - LEARNING_RATE * gradient / (np.sqrt(state['s']) + optimizers.EPSILON)
+
+
+def adam_update(weights, gradient, state, step):
+    beta1, beta2 = optimizers.ADAM_BETA1, optimizers.ADAM_BETA2
+    state['m'] = beta1 * state.get('m', 0) + (1 - beta1) * gradient
+    state['s'] = beta2 * state.get('s', 0) + (1 - beta2) * gradient ** 2
+    m_hat = state['m'] / (1 - beta1 ** step)
+    s_hat = state['s'] / (1 - beta2 ** step)
+    return weights - LEARNING_RATE * m_hat / (np.sqrt(s_hat) + optimizers.EPSILON)
+
+
+@pytest.mark.parametrize("name, momentum, update", [
+    (optimizers.SGD, 0, sgd_update),
+    (optimizers.SGD, MOMENTUM, momentum_update),
+    (optimizers.NESTEROV, MOMENTUM, nesterov_update),
+    (optimizers.RMSPROP, 0, rmsprop_update),
+    (optimizers.ADAM, 0, adam_update),
+])
+def test_optimizer_matches_update_rule(name, momentum, update):
+    history, gradients = run_optimizer(optimizers.get_optimizer(name, LEARNING_RATE, momentum))
+    for weights, expected in zip(history, run_reference(update)):
+        np.testing.assert_allclose(weights, expected, rtol=1e-12)
+
+
+def test_reset_forgets_state():
+    optimizer = optimizers.get_optimizer(optimizers.ADAM, LEARNING_RATE)
+    run_optimizer(optimizer)
+    optimizer.reset()
+    assert optimizer.state is None and optimizer.num_steps == 0
+    assert math.isclose(run_optimizer(optimizer)[0][0][0, 0], run_reference(adam_update)[0][0, 0], rel_tol=1e-12)
+
+
+def test_nesterov_needs_momentum():
+    with pytest.raises(ValueError):
+        optimizers.get_optimizer(optimizers.NESTEROV, LEARNING_RATE)
+    with pytest.raises(ValueError):
+        optimizers.get_optimizer("unknown", LEARNING_RATE)
+
+
+def test_rbfnn_uses_its_momentum(make_data_set, make_rbfnn):
+    rbfnn = make_rbfnn(make_data_set(12, 2), center_step=3, learning_rate=LEARNING_RATE, optimizer=optimizers.NESTEROV,
+                       momentum=MOMENTUM)
+    assert rbfnn.optimizer.nesterov and rbfnn.optimizer.momentum == MOMENTUM
@@ -0,0 +1,84 @@
+# test_pam_nn.py
+# Tests that FasterPAM finds medoids that no single swap can improve, in serial, in parallel, and with CLARA sampling.
+
+import itertools
+import random
+import numpy as np
+import pytest
+from src.centers.pam_nn import PamNN, DistanceMatrix, CLARA
+
+# The centers of three well separated blobs, so that the best medoids are one from each blob.
+CENTERS = [(0, 0), (10, 0), (0, 10)]
+
+
+# Returns the total deviation of the points (rows of a matrix) from their closest medoid.
+def total_deviation(points, medoids):
+    distances = np.sqrt(np.sum((points[:, np.newaxis] - points[medoids]) ** 2, axis=2))
+    return np.sum(np.min(distances, axis=1))
+
+
+# Returns the indices of the given medoid rows in the data set.
+def get_medoid_indices(data_set, medoids):
+    return [data_set.data.index(medoid) for medoid in medoids]
+
+
+def test_fast_pam_is_a_local_optimum(make_blobs):
+    random.seed(0)
+    data_set = make_blobs(CENTERS, 90)
+    pam = PamNN(data_set, 3, dtype=np.float64)
+    points = data_set.get_attr_matrix()
+    medoids = get_medoid_indices(data_set, pam.medoids)
+    deviation = total_deviation(points, medoids)
+    assert np.isclose(pam.distortion, deviation)
+    for medoid_i, candidate in itertools.product(range(3), range(len(points))):
+        swapped = list(medoids)
+        swapped[medoid_i] = candidate
+        assert total_deviation(points, swapped) >= deviation - 1e-6
+    # Each blob gets one medoid.
+    assert sorted(i % 3 for i in medoids) == [0, 1, 2]
+    assert sum(len(cluster) for cluster in pam.clusters) == len(points) - 3
+
+
+def test_parallel_swaps_find_a_local_optimum(make_blobs):
+    random.seed(0)
+    data_set = make_blobs(CENTERS, 90)
+    pam = PamNN(data_set, 3, num_workers=2, dtype=np.float64)
+    medoids = get_medoid_indices(data_set, pam.medoids)
+    assert sorted(i % 3 for i in medoids) == [0, 1, 2]
+
+
+def test_clara_finds_medoids_from_the_data(make_blobs):
+    random.seed(0)
+    data_set = make_blobs(CENTERS, 90)
+    pam = PamNN(data_set, 3, sampling=CLARA, num_samples=3, sample_size=30, dtype=np.float64)
+    medoids = get_medoid_indices(data_set, pam.medoids)
+    assert sorted(i % 3 for i in medoids) == [0, 1, 2]
+    assert np.isclose(pam.distortion, total_deviation(data_set.get_attr_matrix(), medoids))
+
+
+def test_distance_matrix_is_symmetric_with_or_without_cache():
+    points = np.random.default_rng(1).normal(size=(20, 3))
+    cached = DistanceMatrix(points)
+    uncached = DistanceMatrix(points, max_bytes=0)
+    rows = np.arange(20)
+    expected = np.sqrt(np.sum((points[:, np.newaxis] - points) ** 2, axis=2))
+    for distances in (cached, uncached):
+        matrix = distances.get(rows, rows)
+        np.testing.assert_allclose(matrix, expected, rtol=1e-6, atol=1e-6)
+        assert np.array_equal(matrix, matrix.T)
+
+
+@pytest.mark.parametrize("options", [{}, {'num_workers': 2}, {'sampling': CLARA, 'num_samples': 2, 'sample_size': 30}])
+def test_a_single_medoid_is_the_most_central_point(make_blobs, options):
+    random.seed(0)
+    data_set = make_blobs(CENTERS, 90)
+    pam = PamNN(data_set, 1, dtype=np.float64, **options)
+    points = data_set.get_attr_matrix()
+    medoids = get_medoid_indices(data_set, pam.medoids)
+    if 'sampling' in options:
+        assert np.isclose(pam.distortion, total_deviation(points, medoids))
+    else:
+        deviations = [total_deviation(points, [i]) for i in range(len(points))]
+        assert medoids == [int(np.argmin(deviations))]
+        assert np.isclose(pam.distortion, min(deviations))
+    assert len(pam.clusters) == 1 and len(pam.clusters[0]) == len(points) - 1
@@ -0,0 +1,70 @@
+# test_rbfnn.py
+# Tests the RBFNN's hidden layer activations and its least squares fit against direct numpy calculations.
+
+import math
+import numpy as np
+import pytest
+import src.networks.rbfnn as rbfnn_module
+from src.networks.rbfnn import LEAST_SQUARES
+
+
+# Returns the gaussian activation of every center for every example of the network's training data.
+def reference_activation(network):
+    examples = network.training_data.get_attr_matrix()
+    centers = network.receptors.get_attr_matrix()
+    distances = np.sqrt(np.sum((examples[:, np.newaxis] - centers) ** 2, axis=2))
+    return np.exp(-distances ** 2 / (2 * network.std_dev ** 2))
+
+
+def test_activation_matches_reference(make_data_set, make_rbfnn, monkeypatch):
+    # Small chunks make the activation matrix be built from several pieces.
+    monkeypatch.setattr(rbfnn_module, "ACTIVATION_CHUNK_SIZE", 7)
+    network = make_rbfnn(make_data_set(80, 2), dtype=np.float64)
+    centers = network.receptors.get_attr_matrix()
+    max_distance = max(np.linalg.norm(a - b) for a in centers for b in centers)
+    assert math.isclose(network.std_dev, max_distance / math.sqrt(2 * len(centers)), rel_tol=1e-9)
+    activation = network.get_data_activation(network.training_data)
+    np.testing.assert_allclose(activation, reference_activation(network), rtol=1e-9, atol=1e-300)
+    # The matrix is kept, so running the data set again doesn't calculate it again.
+    assert network.get_data_activation(network.training_data) is activation
+
+
+def test_cached_activations_give_the_same_predictions(make_data_set, make_rbfnn):
+    data_set = make_data_set(80, 2)
+    network = make_rbfnn(data_set, dtype=np.float64)
+    outputs, predictions = network.predict_activation(network.get_data_activation(data_set))
+    batch_outputs, batch_predictions = network.predict_batch(data_set.get_attr_matrix())
+    assert np.array_equal(outputs, batch_outputs)
+    assert np.array_equal(predictions, batch_predictions)
+    expected = [network.get_class_value(network.run(example)) for example in data_set.data]
+    assert predictions.tolist() == expected
+
+
+@pytest.mark.parametrize("classes", [['a', 'b', 'c'], None])
+def test_least_squares_matches_ridge_regression(make_data_set, make_rbfnn, classes, monkeypatch):
+    # Small chunks make the fit accumulate its sums over several chunks.
+    monkeypatch.setattr(rbfnn_module, "ACTIVATION_CHUNK_SIZE", 7)
+    network = make_rbfnn(make_data_set(80, 2, classes=classes), classes=classes, fit_mode=LEAST_SQUARES,
+                         regularization=.05, dtype=np.float64)
+    network.train()
+    hidden = reference_activation(network)
+    targets = network.training_data.get_class_array().tolist()
+    expected = np.array([network.get_class_array(target) for target in targets], dtype=float)
+    # Ridge regression is the least squares solution of the activations stacked on a scaled identity matrix.
+    ridge = .05 * np.trace(hidden.T @ hidden) / hidden.shape[1]
+    stacked = np.vstack([hidden, math.sqrt(ridge) * np.eye(hidden.shape[1])])
+    stacked_expected = np.vstack([expected, np.zeros((hidden.shape[1], expected.shape[1]))])
+    weights = np.linalg.lstsq(stacked, stacked_expected, rcond=None)[0].T
+    np.testing.assert_allclose(network.weights, weights, rtol=1e-6, atol=1e-9)
+
+
+def test_least_squares_fits_the_training_data(make_data_set, make_rbfnn):
+    network = make_rbfnn(make_data_set(80, 2, classes=None), classes=None, fit_mode=LEAST_SQUARES,
+                         regularization=1e-8, dtype=np.float64)
+    network.train()
+    hidden = reference_activation(network)
+    expected = network.training_data.get_class_array().astype(float)
+    weights = np.linalg.lstsq(hidden, expected, rcond=None)[0]
+    outputs, predictions = network.predict_batch(network.training_data.get_attr_matrix())
+    # With almost no regularization, the fit is as good as the unregularized least squares solution.
+    assert np.sum((predictions - expected) ** 2) <= np.sum((hidden @ weights - expected) ** 2) * 1.01 + 1e-9
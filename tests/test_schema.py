@@ -0,0 +1,110 @@
+# test_schema.py
+# Tests that parsing files with schemas gives the same rows as the loader that read every file as rows of strings and
+# converted them column by column, whether the file is read as one chunk or several.
+
+import os
+import numpy as np
+import pytest
+import src.centers.center as center
+import src.data.data_set as d
+import src.data.schema as schema
+import src.util as util
+from src.data.data_set import DataSet
+
+# Each data set file along with its schema.
+DATA_FILES = [("abalone.data", schema.ABALONE_SCHEMA), ("car.data", schema.CAR_SCHEMA),
+              ("forestfires.data", schema.FOREST_FIRES_SCHEMA), ("machine.data", schema.MACHINE_SCHEMA),
+              ("segmentation.data", schema.SEGMENTATION_SCHEMA), ("winequality.data", schema.WINE_SCHEMA)]
+
+# The schema of the small files written by the tests: a categorical attribute, a string column that is neither an
+# attribute nor the class, a float attribute that can be missing, and a float class.
+TEST_SCHEMA = schema.Schema([0, 2], 3, float_cols=[0, 2, 3], value_maps={0: {'low': 0, 'high': 2}}, header_rows=2)
+
+# The lines of a small file, which has header rows, empty lines, values that are not in the value map, missing values,
+# strings that look like numbers, and a row that is shorter than the others.
+TEST_LINES = ["x,name,y,class", "units,,,", "", "low,a,1.5,0", "high,0.0,-2,1", "", "3,None,None,2", "low,b,4e-3,3",
+              "high,7", "low,c,None,5", "2.5,1e3,8,6"]
+
+
+# Loads a file the way data sets were loaded before schemas: the file is read as rows of strings, the header is
+# removed, and then each categorical column is mapped and each float column converted.
+def load_old(file_name, data_schema):
+    data_set = DataSet(util.read_file(file_name), data_schema.attr_cols, data_schema.class_col, file_name)
+    data_set.remove_header(data_schema.header_rows)
+    for col, value_map in data_schema.value_maps.items():
+        data_set.convert_str_attribute(col, value_map)
+    data_set.convert_to_float(sorted(data_schema.float_cols))
+    return data_set
+
+
+# Loads a file with its schema, after concatenating the chunks it is read in.
+def load_chunked(file_name, data_schema, chunk_size):
+    columns, num_rows = data_schema.read_columns(file_name, chunk_size)
+    return DataSet.from_columns(columns, num_rows, data_schema.attr_cols, data_schema.class_col, file_name)
+
+
+# Returns the rows of the data set, with the type of each value.
+def typed_rows(data_set):
+    return [[(type(value), value) for value in row] for row in data_set.data]
+
+
+@pytest.fixture
+def test_file(tmp_path):
+    file_name = str(tmp_path / "test.data")
+    with open(file_name, "w") as file:
+        file.write("\n".join(TEST_LINES) + "\n")
+    return file_name
+
+
+@pytest.mark.parametrize("chunk_size", [schema.DEFAULT_CHUNK_SIZE, 1, 2, 3])
+def test_parsed_rows_match_the_old_loader(test_file, chunk_size):
+    # Missing values are kept as they were read, and the values missing from the short row are None.
+    expected = [(0.0, 'a', 1.5, 0.0), (2.0, '0.0', -2.0, 1.0), (3.0, 'None', 'None', 2.0), (0.0, 'b', .004, 3.0),
+                (2.0, '7', None, None), (0.0, 'c', 'None', 5.0), (2.5, '1e3', 8.0, 6.0)]
+    loaded = load_chunked(test_file, TEST_SCHEMA, chunk_size)
+    assert loaded.data == expected
+    assert typed_rows(loaded) == typed_rows(load_old(test_file, TEST_SCHEMA))
+
+
+def test_float_columns_without_missing_values_are_float_arrays(test_file):
+    columns, num_rows = TEST_SCHEMA.read_columns(test_file)
+    assert num_rows == 7
+    assert columns[0].dtype == float
+    # The string column keeps its values as strings, even those that look like numbers, and the float columns with
+    # missing values stay object arrays.
+    assert columns[1].dtype == object and columns[1].tolist() == ['a', '0.0', 'None', 'b', '7', 'c', '1e3']
+    assert columns[2].dtype == object and columns[3].dtype == object
+
+
+def test_chunks_are_streamed(test_file):
+    chunks = list(d.load_data_set_chunks(test_file, TEST_SCHEMA, chunk_size=3))
+    assert [chunk.get_len() for chunk in chunks] == [3, 3, 1]
+    assert [row for chunk in chunks for row in chunk.data] == load_old(test_file, TEST_SCHEMA).data
+
+
+def test_ignored_columns_are_kept_as_read(tmp_path):
+    # Only the attribute and class columns are converted; the others (like machine's vendor and model names, and its
+    # last column) keep the strings they were read as.
+    file_name = str(tmp_path / "ignored.data")
+    with open(file_name, "w") as file:
+        file.write("v1,m1,1,2,3\nv2,m2,4,5,6\n")
+    ignored_schema = schema.Schema([2, 3], 4, float_cols=[2, 3, 4])
+    assert load_chunked(file_name, ignored_schema, 1).data == [('v1', 'm1', 1.0, 2.0, 3.0), ('v2', 'm2', 4.0, 5.0, 6.0)]
+
+
+@pytest.mark.parametrize("file_name, data_schema", DATA_FILES)
+def test_data_files_match_the_old_loader(file_name, data_schema):
+    file_name = os.path.join(center.DATA_DIR, file_name)
+    expected = typed_rows(load_old(file_name, data_schema))
+    assert typed_rows(d.load_data_set(file_name, data_schema)) == expected
+    assert typed_rows(load_chunked(file_name, data_schema, 1000)) == expected
+
+
+# The fold files saved for the RBFNN are read with the same schemas, header rows included.
+@pytest.mark.parametrize("name, data_schema", [("forestfires-kmeans-fold-0-train.txt", schema.FOREST_FIRES_SCHEMA),
+                                               ("segmentation-eknn-fold-0-centers.txt", schema.SEGMENTATION_SCHEMA)])
+def test_fold_files_match_the_old_loader(name, data_schema):
+    file_name = os.path.join(center.RBF_DATA_DIR, name)
+    loaded = d.load_data_set(file_name, data_schema)
+    assert typed_rows(loaded) == typed_rows(load_old(file_name, data_schema))
+    assert np.array_equal(loaded.get_attr_matrix(), load_old(file_name, data_schema).get_attr_matrix())
@@ -0,0 +1,72 @@
+# test_server.py
+# Tests the inference server's protocol, micro batching, and error handling over a Unix socket.
+
+import asyncio
+import json
+import numpy as np
+import pytest
+import src.server as server
+
+
+# A saved (untrained) classification MFNN with two inputs, loaded from the file it was saved to.
+@pytest.fixture
+def network(tmp_path, make_data_set, make_mfnn):
+    file_name = str(tmp_path / "mfnn.bin")
+    make_mfnn(make_data_set(10, 2), hidden=(3,)).save(file_name)
+    return server.load_network(file_name)
+
+
+# Starts a server for the network, sends the request lines over one connection, and returns the response to each line
+# (in the order of the requests) along with the server's stats.
+async def exchange(network, socket_path, lines, max_batch_size=8, max_wait=.05):
+    inference_server = server.InferenceServer(network, max_batch_size, max_wait)
+    await inference_server.start(socket_path)
+    try:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write("".join(line + "\n" for line in lines).encode())
+        responses = [json.loads(await reader.readline(), parse_constant=lambda name: name) for line in lines]
+        writer.close()
+    finally:
+        await inference_server.stop()
+    return responses, inference_server.stats.get_summary()
+
+
+def test_predictions_match_predict_batch(tmp_path, network):
+    examples = np.random.default_rng(0).normal(size=(20, 2))
+    lines = [json.dumps({'id': i, 'example': example.tolist()}) for i, example in enumerate(examples)]
+    responses, stats = asyncio.run(exchange(network, str(tmp_path / "socket"), lines))
+    outputs, predictions = network.predict_batch(examples)
+    by_id = {response['id']: response for response in responses}
+    assert sorted(by_id) == list(range(20))
+    for i in range(20):
+        assert by_id[i]['prediction'] == predictions[i]
+        np.testing.assert_allclose(by_id[i]['outputs'], outputs[i], rtol=1e-12)
+    # The requests arrived together, so they were run in micro batches of (up to) eight.
+    assert stats['requests'] == 20 and stats['batches'] == 3
+
+
+def test_invalid_requests_get_errors(tmp_path, network):
+    lines = ['not json', '[1, 2]', '{"id": 1}', '{"id": 2, "example": [1]}', '{"id": 3, "example": [1, "x"]}',
+             '{"id": 4, "stats": true}']
+    responses, stats = asyncio.run(exchange(network, str(tmp_path / "socket"), lines))
+    errors = [response for response in responses if 'error' in response]
+    assert sorted(str(response['id']) for response in errors) == ['1', '2', '3', 'None', 'None']
+    assert [response['stats']['errors'] for response in responses if 'stats' in response] == [5]
+
+
+def test_failed_batches_get_errors(tmp_path, network):
+
+    def fail(examples):
+        raise FloatingPointError("overflow")
+    network.predict_batch = fail
+    responses, stats = asyncio.run(exchange(network, str(tmp_path / "socket"), ['{"id": 1, "example": [1, 2]}']))
+    assert responses == [{'id': 1, 'error': "FloatingPointError: overflow"}]
+    assert stats['errors'] == 1
+
+
+def test_non_finite_values_are_null(tmp_path, network):
+    responses, stats = asyncio.run(exchange(network, str(tmp_path / "socket"), ['{"id": 1, "example": [NaN, 2]}']))
+    # Any NaN in the response would have been parsed as the string "NaN".
+    assert responses[0]['outputs'] == [None, None, None]
+    assert server.to_json_value(np.float32(np.inf)) is None
+    assert server.to_json_value(np.float32(.5)) == .5
@@ -0,0 +1,87 @@
+# test_util.py
+# Tests the shared utility functions, including the binary file format used by model and fold files.
+
+import numpy as np
+import pytest
+import src.util as util
+
+
+def test_binary_round_trip(tmp_path, make_arrays):
+    file_name = str(tmp_path / "arrays.bin")
+    arrays = make_arrays()
+    meta = {'name': "test", 'sizes': [1, 2, 3], 'nested': {'a': None}}
+    util.save_binary(file_name, meta, arrays)
+    loaded_meta, loaded = util.load_binary(file_name)
+    assert loaded_meta == meta
+    assert util.load_binary_meta(file_name) == meta
+    assert sorted(loaded) == sorted(arrays)
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        assert np.array_equal(loaded[name], array)
+
+
+def test_binary_arrays_are_aligned(tmp_path, make_arrays):
+    file_name = str(tmp_path / "arrays.bin")
+    util.save_binary(file_name, {}, make_arrays())
+    meta, loaded = util.load_binary(file_name)
+    for name, array in loaded.items():
+        if isinstance(array, np.memmap):
+            assert array.offset % util.BINARY_ALIGNMENT == 0
+
+
+def test_binary_load_modes(tmp_path):
+    file_name = str(tmp_path / "arrays.bin")
+    util.save_binary(file_name, {}, {'weights': np.ones(4)})
+    meta, arrays = util.load_binary(file_name, mode="r")
+    assert not arrays['weights'].flags.writeable
+    # Copy on write arrays can be changed without changing the file.
+    meta, arrays = util.load_binary(file_name)
+    arrays['weights'][:] = 2
+    assert np.array_equal(util.load_binary(file_name)[1]['weights'], np.ones(4))
+
+
+def test_binary_rejects_other_files(tmp_path):
+    file_name = str(tmp_path / "text.txt")
+    with open(file_name, "w") as file:
+        file.write("1,2,3\n4,5,6\n")
+    with pytest.raises(ValueError):
+        util.load_binary(file_name)
+    with pytest.raises(ValueError):
+        util.load_binary_meta(file_name)
+    with pytest.raises(ValueError):
+        util.save_binary(str(tmp_path / "objects.bin"), {}, {'objects': np.array(["a", None], dtype=object)})
+
+def test_squared_distances_match_direct_distances(make_data_set):
+    a = make_data_set(30, 4).get_attr_matrix()
+    b = make_data_set(12, 4, seed=1).get_attr_matrix()
+    expected = np.sum((a[:, np.newaxis] - b) ** 2, axis=2)
+    np.testing.assert_allclose(util.squared_distances(a, b), expected, rtol=1e-9, atol=1e-12)
+    # Rounding can't make the squared distance of a row to itself negative.
+    assert np.all(util.squared_distances(a, a) >= 0)
+
+
+# Returns the maximum distance between any two rows of the matrix, found by comparing every pair of rows.
+def brute_force_max_distance(matrix):
+    return max(np.linalg.norm(a - b) for a in matrix for b in matrix)
+
+
+def test_max_distance_matches_brute_force(make_data_set):
+    matrix = make_data_set(50, 3).get_attr_matrix()
+    expected = brute_force_max_distance(matrix)
+    # Small blocks make the search cover the upper triangle in several pieces.
+    for block_size in (7, 50, util.MAX_DISTANCE_BLOCK_SIZE):
+        assert np.isclose(util.max_distance(matrix, block_size), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_approximate_max_distance_bounds_the_true_distance(make_data_set, seed):
+    data_set = make_data_set(40, 1 + seed % 4, seed=seed, scale=[1, 5, .1, 2][:1 + seed % 4])
+    matrix = data_set.get_attr_matrix()
+    expected = brute_force_max_distance(matrix)
+    for sweeps in (1, 2, util.MAX_DISTANCE_SWEEPS):
+        lower_bound, upper_bound = util.approximate_max_distance(matrix, sweeps)
+        assert lower_bound <= expected * (1 + 1e-9)
+        assert expected <= upper_bound * (1 + 1e-9)
+        assert upper_bound <= 2 * lower_bound * (1 + 1e-9)
+    assert data_set.get_max_distance(exact=False) == util.approximate_max_distance(matrix)[0]
+    assert util.approximate_max_distance(matrix[:1]) == (0, 0)